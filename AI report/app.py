@@ -1,27 +1,203 @@
 # app.py - Enhanced Audit-Focused Version
 import streamlit as st
 from summarizer import (
-    extract_text_from_pdf, 
     extract_text_from_txt, 
-    chunk_text, 
-    summarize_chunk_gemini, 
-    aggregate_summaries,
-    extract_financial_metrics,
-    analyze_audit_findings,
-    generate_compliance_checklist,
-    categorize_risk_levels,
-    generate_audit_executive_summary,
-    format_audit_report_comprehensive,
-    format_audit_json_report,
-    format_audit_markdown_report,
+    iter_pdf_pages,
+    join_pages,
+    DEFAULT_CHUNK_TOKENS,
+    get_cache_stats,
+    get_client,
+    set_client,
     # Legacy functions for backward compatibility
     format_summary_as_text,
     format_summary_as_json,
     format_summary_as_markdown
 )
-import tempfile
+from figure_index import FigureIndex
+from chunk_export import chunk_rows, jsonl_bytes, parquet_available, parquet_bytes
+from report import REPORT_FORMATS, bundle_bytes, preview_report, report_bytes, report_from_results, report_stem
+from incremental import document_series_id
+from jobs import ACTIVE_STATUSES, DONE, FAILED, job_manager_from_env
+from pdf_backends import AUTO, available_backends, default_backend_name
+from uploads import PDF_TYPE, remove_stale_uploads, shared_extraction, spool_upload, touch, upload_dir
 import os
+import hashlib
+import json
+import time
 from datetime import datetime
+from functools import partial
+from typing import Optional
+
+# Number of analysis results kept per browser session
+MAX_STORED_RESULTS = 5
+
+# Rows shown in the figure query table
+MAX_FIGURE_ROWS = 500
+
+# Job IDs kept in the page URL so a new session can find them again
+MAX_URL_JOBS = 10
+
+# How often a running job's progress is refreshed, in seconds
+JOB_POLL_SECONDS = 1.0
+
+# Characters per page of the document viewer for TXT files (PDFs use their own pages)
+VIEWER_PAGE_CHARS = 5000
+
+JOB_STATUS_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌"}
+
+
+def compute_result_key(file_sha256: str, options: dict) -> str:
+    """Hash of the uploaded document's SHA-256 plus the options that affect its analysis."""
+    digest = hashlib.sha256(file_sha256.encode("ascii"))
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def extract_uploaded_text(path: str, file_type: str, pdf_backend: Optional[str] = None) -> tuple:
+    """
+    Extract the text of a spooled upload (see uploads.SpooledUpload), reading
+    PDFs with ``pdf_backend`` (see pdf_backends; default: the PDF_BACKEND setting).
+
+    Returns ``(text, page_offsets)``; page offsets are empty for TXT files.
+    """
+    if file_type == PDF_TYPE:
+        return join_pages(iter_pdf_pages(path, backend=pdf_backend))
+    return extract_text_from_txt(path), []
+
+
+def get_figure_index(results: dict):
+    """Index of the result's extracted figures, built on first use and kept with the result."""
+    if results.get("figures") is None:
+        return None
+    if "figure_index" not in results:
+        results["figure_index"] = FigureIndex(results["figures"], results["text"])
+    return results["figure_index"]
+
+
+def get_audit_report(results: dict, filename: str):
+    """Report model of the result, built once per file name and kept with the result."""
+    report = results.get("audit_report")
+    if report is None or report.filename != filename:
+        report = results["audit_report"] = report_from_results(filename, results)
+    return report
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_client():
+    """One Gemini client per server process, shared by every session and rerun."""
+    return get_client()
+
+
+def extract_uploaded_text_shared(path: str, file_type: str, pdf_backend: Optional[str] = None) -> tuple:
+    """
+    extract_uploaded_text, shared across sessions (see uploads.shared_extraction).
+    Runs in job workers, so it must not use Streamlit caching.
+    """
+    return shared_extraction((path, file_type, pdf_backend),
+                             partial(extract_uploaded_text, path, file_type, pdf_backend))
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    """One background job pool per server process; jobs outlive the session that started them."""
+    return job_manager_from_env()
+
+
+@st.cache_resource(show_spinner=False)
+def get_upload_dir() -> str:
+    """
+    Where uploads are spooled; uploads unused for a day are removed once per
+    server start, unless a stored job refers to them.
+    """
+    remove_stale_uploads(keep=get_job_manager().store.document_paths())
+    return upload_dir()
+
+
+def get_spooled_upload(uploaded_file):
+    """
+    The upload spooled to disk and hashed, once per uploaded file in a session.
+    Reruns reuse the spooled copy instead of hashing or copying the upload again.
+    """
+    spooled = st.session_state.setdefault("spooled_uploads", {})
+    key = getattr(uploaded_file, "file_id", None)
+    upload = spooled.get(key) if key else None
+    if upload is None or not touch(upload):
+        upload = spool_upload(uploaded_file, uploaded_file.name, uploaded_file.type, get_upload_dir())
+        if key:
+            spooled.clear()  # only the current upload is needed
+            spooled[key] = upload
+    return upload
+
+
+def get_job_document(job_id: str):
+    """A job's spooled upload, or None once the file has been removed."""
+    return get_job_manager().store.get_document(job_id)
+
+
+def viewer_pages(results: dict) -> list:
+    """
+    ``(start, end, label)`` of each page of the result's text: PDF pages, or
+    blocks of about VIEWER_PAGE_CHARS ending at a line break for TXT files.
+    Kept with the result.
+    """
+    if "viewer_pages" in results:
+        return results["viewer_pages"]
+    text = results["text"]
+    page_offsets = results.get("page_offsets") or []
+    pages = []
+    if page_offsets:
+        starts = [offset for offset, _ in page_offsets] + [len(text)]
+        pages = [(starts[i], starts[i + 1], f"Page {number}") for i, (_, number) in enumerate(page_offsets)]
+    else:
+        start = 0
+        while start < len(text):
+            end = min(start + VIEWER_PAGE_CHARS, len(text))
+            if end < len(text):
+                line_break = text.rfind("\n", start + VIEWER_PAGE_CHARS // 2, end)
+                end = line_break + 1 if line_break != -1 else end
+            pages.append((start, end, f"Part {len(pages) + 1}"))
+            start = end
+    results["viewer_pages"] = pages
+    return pages
+
+
+@st.fragment
+def show_document_text(results: dict, result_key: str):
+    """One page of the extracted text at a time, so only that page is sent to the browser."""
+    text = results["text"]
+    pages = viewer_pages(results)
+    if not pages:
+        st.info("No text was extracted from this document.")
+        return
+    page = st.number_input(f"Page (1-{len(pages)}):", min_value=1, max_value=len(pages), value=1, step=1,
+                           key=f"viewer_page_{result_key}")
+    start, end, label = pages[page - 1]
+    st.caption(f"{label} · characters {start:,}-{end:,} of {len(text):,}")
+    st.text_area(f"Extracted text, {label.lower()}:", text[start:end], height=300)
+
+
+def option_index(choices: list, value) -> int:
+    """Position of ``value`` in a selectbox's choices, or the first choice."""
+    return choices.index(value) if value in choices else 0
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job_id: str):
+    """Live status of a queued or running job; reruns the page once it finishes."""
+    job = get_job_manager().store.get(job_id)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        st.rerun()
+    st.progress(min(job["progress"], 1.0))
+    if job["status"] == "queued":
+        st.text("⏳ Waiting for a free worker...")
+    else:
+        st.text(f"{job['message']} ({time.time() - job['started_at']:.0f}s)")
+    if job["partial_text"]:
+        st.markdown(f"**{job['partial_label']}**")
+        st.markdown(job["partial_text"])
+    st.caption("🔄 This analysis runs in the background. You can change options, start other analyses "
+               "or reload the page; it keeps running.")
+
 
 # Page configuration
 st.set_page_config(
@@ -330,31 +506,73 @@ document.addEventListener('keydown', function(event) {
 </script>
 """, unsafe_allow_html=True)
 
+# Background jobs started from this browser. Their IDs are also kept in the page
+# URL, so after a reload or a dropped connection the new session finds them again.
+job_manager = get_job_manager()
+session_jobs = st.session_state.setdefault("jobs", {})  # result key -> job ID
+url_job_ids = st.query_params.get_all("job")
+for job in job_manager.store.get_many([job_id for job_id in url_job_ids if job_id not in session_jobs.values()]):
+    session_jobs.setdefault(job["result_key"], job["job_id"])
+
+browser_jobs = job_manager.store.get_many(list(session_jobs.values()))
+if browser_jobs:
+    st.sidebar.markdown("### 🗂️ Background Jobs")
+    for job in reversed(browser_jobs):
+        job_col, open_col = st.sidebar.columns([4, 1])
+        status = job["status"] if job["status"] != "running" else f"{job['progress'] * 100:.0f}%"
+        job_col.text(f"{JOB_STATUS_ICONS.get(job['status'], '')} {job['filename']} ({status})")
+        if open_col.button("Open", key=f"open_job_{job['job_id']}", help="Show this job's document and results"):
+            # A new uploader key clears the current upload so the job's document is shown
+            st.session_state["open_job"] = job["job_id"]
+            st.session_state["upload_generation"] = st.session_state.get("upload_generation", 0) + 1
+
 # Main interface
 uploaded_file = st.file_uploader(
-    "📄 Upload your audit report (PDF or TXT)", 
+    "📄 Upload your audit report (PDF or TXT)",
     type=["pdf", "txt"],
-    help="Supports financial audit reports, compliance reviews, internal audit reports, and risk assessments"
+    help="Supports financial audit reports, compliance reviews, internal audit reports, and risk assessments",
+    key=f"upload_{st.session_state.get('upload_generation', 0)}"
 )
 
+# Without an upload, show the job opened from the sidebar or the latest one in the URL
+restored_job = None
+if uploaded_file is None:
+    open_job_id = st.session_state.get("open_job") or (url_job_ids[-1] if url_job_ids else None)
+    restored_job = job_manager.store.get(open_job_id) if open_job_id else None
+    if restored_job is not None:
+        uploaded_file = get_job_document(open_job_id)
+        if uploaded_file is None:
+            st.warning(f"⚠️ The upload of background job **{restored_job['filename']}** is no longer available. "
+                       f"Please upload the file again.")
+            restored_job = None
+defaults = restored_job["options"] if restored_job else {}
+
 if uploaded_file is not None:
     file_type = uploaded_file.type
-    st.success(f"✅ File uploaded: **{uploaded_file.name}**")
-    
+    if restored_job is not None:
+        st.success(f"✅ Showing background job for **{uploaded_file.name}** "
+                   f"(started {datetime.fromtimestamp(restored_job['created_at']).strftime('%Y-%m-%d %H:%M')})")
+    else:
+        st.success(f"✅ File uploaded: **{uploaded_file.name}**")
+
     # Enhanced options with audit focus
     col1, col2, col3 = st.columns(3)
     
     with col1:
+        summary_styles = ["audit-focused", "executive", "detailed", "compliance-focused", "concise", "bullet-points"]
         summary_style = st.selectbox(
             "📊 Summary Style:",
-            ["audit-focused", "executive", "detailed", "compliance-focused", "concise", "bullet-points"],
+            summary_styles,
+            index=option_index(summary_styles, defaults.get("summary_style")),
             help="Choose the most appropriate style for your audience"
         )
     
     with col2:
+        analysis_types = ["comprehensive-audit", "basic-summary", "financial-focus", "compliance-review"]
         analysis_type = st.selectbox(
             "🔍 Analysis Type:",
-            ["comprehensive-audit", "basic-summary", "financial-focus", "compliance-review"],
+            analysis_types,
+            index=option_index(analysis_types, defaults.get("analysis_type")),
             help="Comprehensive audit provides full analysis with financial metrics and risk assessment"
         )
     
@@ -372,28 +590,28 @@ if uploaded_file is not None:
     with col1:
         enable_financial_analysis = st.checkbox(
             "💰 Financial Metrics", 
-            value=True if analysis_type == "comprehensive-audit" else False,
+            value=defaults.get("financial_analysis", analysis_type == "comprehensive-audit"),
             help="Extract financial figures, ratios, and percentages"
         )
     
     with col2:
         enable_risk_assessment = st.checkbox(
             "⚠️ Risk Categorization", 
-            value=True if analysis_type == "comprehensive-audit" else False,
+            value=defaults.get("risk_assessment", analysis_type == "comprehensive-audit"),
             help="Categorize findings by risk level"
         )
     
     with col3:
         enable_compliance_check = st.checkbox(
             "✅ Compliance Checklist", 
-            value=True if analysis_type == "comprehensive-audit" else False,
+            value=defaults.get("compliance_check", analysis_type == "comprehensive-audit"),
             help="Generate compliance assessment and action items"
         )
     
     with col4:
         enable_audit_trail = st.checkbox(
             "📋 Audit Trail", 
-            value=True if analysis_type == "comprehensive-audit" else False,
+            value=defaults.get("audit_trail", analysis_type == "comprehensive-audit"),
             help="Document processing methodology and validation notes"
         )
     
@@ -404,356 +622,470 @@ if uploaded_file is not None:
         help="Process your audit report with AI-powered analysis"
     )
 
+    chunk_sizes = [DEFAULT_CHUNK_TOKENS, 8000, 16000, "auto"]
+    chunk_size = st.sidebar.selectbox(
+        "🧩 Chunk Size (tokens):",
+        chunk_sizes,
+        index=option_index(chunk_sizes, defaults.get("chunk_size")),
+        help="Larger chunks mean fewer API calls; 'auto' uses the largest size the model's context allows"
+    )
+
+    enable_fused_analysis = st.sidebar.checkbox(
+        "⚡ Fused Analysis (single request)",
+        value=defaults.get("fused_analysis", True),
+        help="Get findings, risk levels, compliance and executive summary from one structured Gemini request"
+    )
+
+    enable_boilerplate_removal = st.sidebar.checkbox(
+        "🧹 Remove repeated boilerplate",
+        value=defaults.get("remove_boilerplate", True),
+        help="Drop headers, footers and disclaimers repeated across pages, and summarize near-identical sections once"
+    )
+
+    enable_incremental = st.sidebar.checkbox(
+        "🔁 Reuse work from earlier versions",
+        value=defaults.get("incremental", True),
+        help="Only re-analyze the parts of the report that changed since an earlier upload of the same document"
+    )
+    pdf_backend_choices = [AUTO] + available_backends()
+    pdf_backend = st.sidebar.selectbox(
+        "📄 PDF Text Extraction:",
+        pdf_backend_choices,
+        index=option_index(pdf_backend_choices, defaults.get("pdf_backend", default_backend_name())),
+        disabled=file_type != PDF_TYPE,
+        help="'auto' samples a few pages and uses the fastest library whose text is complete; "
+             "pdfplumber keeps the layout most faithfully, pypdf is much faster"
+    )
+    document_id = st.sidebar.text_input(
+        "📚 Document series:",
+        value=restored_job["document_id"] if restored_job else document_series_id(uploaded_file.name),
+        disabled=not enable_incremental,
+        help="Uploads with the same series name are compared with each other, e.g. successive drafts of one report"
+    )
+
+    # Only these options change the analysis; export format just re-renders stored results
+    analysis_options = {
+        "summary_style": summary_style,
+        "analysis_type": analysis_type,
+        "chunk_size": chunk_size,
+        "fused_analysis": enable_fused_analysis,
+        "incremental": enable_incremental,
+        "remove_boilerplate": enable_boilerplate_removal,
+        "pdf_backend": pdf_backend,
+        "financial_analysis": enable_financial_analysis,
+        "risk_assessment": enable_risk_assessment,
+        "compliance_check": enable_compliance_check,
+        "audit_trail": enable_audit_trail
+    }
+    # Spooled to disk and hashed in blocks; nothing below copies the upload into memory again
+    upload = uploaded_file if restored_job is not None else get_spooled_upload(uploaded_file)
+    result_key = compute_result_key(upload.sha256, analysis_options)
+    stored_results = st.session_state.setdefault("audit_results", {})
+
+    share_extraction = st.sidebar.checkbox(
+        "♻️ Share extracted text across sessions",
+        value=True,
+        help="Reuse text extracted from identical uploads in other browser sessions"
+    )
+
     if process_btn:
-        with st.spinner("🔄 Processing audit report and generating comprehensive analysis..."):
-            # Save uploaded file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf" if file_type == "application/pdf" else ".txt") as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
-
-            # Extract text
-            if file_type == "application/pdf":
-                text = extract_text_from_pdf(tmp_path)
-            elif file_type == "text/plain":
-                text = extract_text_from_txt(tmp_path)
-            else:
-                st.error("❌ Unsupported file type!")
-                text = None
+        try:
+            set_client(get_shared_client())
+        except RuntimeError as e:
+            st.error(f"❌ {str(e)}")
+            st.stop()
 
-            os.unlink(tmp_path)
+        if file_type not in ("application/pdf", "text/plain"):
+            st.error("❌ Unsupported file type!")
+        else:
+            # Extraction and every pipeline stage run in the job's worker; see jobs.JobManager
+            job_id = job_manager.submit(
+                upload, analysis_options, result_key,
+                document_id.strip() or document_series_id(uploaded_file.name),
+                extract=partial(extract_uploaded_text_shared if share_extraction else extract_uploaded_text,
+                                pdf_backend=pdf_backend)
+            )
+            session_jobs[result_key] = job_id
+            stored_results.pop(result_key, None)
+            st.query_params["job"] = [known for known in url_job_ids if known != job_id][-(MAX_URL_JOBS - 1):] + [job_id]
 
-            if text:
-                # Initialize analysis containers
-                financial_metrics = {}
-                audit_analysis = {}
-                compliance_checklist = {}
-                risk_categorization = {}
-                
-                # Display original text in expandable section
-                with st.expander("📄 Original Document Text", expanded=False):
-                    st.text_area("Extracted text from your audit report:", text, height=300)
-
-                # Progress tracking
-                progress_container = st.container()
-                with progress_container:
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-
-                # Step 1: Financial Analysis (if enabled)
-                if enable_financial_analysis:
-                    status_text.text("💰 Analyzing financial metrics...")
-                    financial_metrics = extract_financial_metrics(text)
-                    progress_bar.progress(0.2)
-
-                # Step 2: Text chunking and summarization
-                status_text.text("📝 Processing document chunks...")
-                chunks = chunk_text(text)
-                summaries = []
-                
-                chunk_progress_start = 0.2 if enable_financial_analysis else 0.0
-                chunk_progress_range = 0.4
-                
-                for i, chunk in enumerate(chunks):
-                    chunk_progress = chunk_progress_start + (chunk_progress_range * (i + 1) / len(chunks))
-                    status_text.text(f"📝 Processing chunk {i+1} of {len(chunks)}...")
-                    
-                    # Use audit-focused summarization if analysis type is audit-related
-                    audit_focus = analysis_type in ["comprehensive-audit", "financial-focus", "compliance-review"]
-                    summary_chunk = summarize_chunk_gemini(chunk, style=summary_style, audit_focus=audit_focus)
-                    summaries.append(summary_chunk)
-                    progress_bar.progress(min(chunk_progress, 1.0))
-
-                # Step 3: Audit-specific analysis (if enabled)
-                if enable_risk_assessment or analysis_type == "comprehensive-audit":
-                    status_text.text("⚠️ Performing risk assessment...")
-                    audit_analysis = analyze_audit_findings(text)
-                    if enable_risk_assessment:
-                        risk_categorization = categorize_risk_levels(audit_analysis.get('analysis', ''))
-                    progress_bar.progress(0.7)
-
-                if enable_compliance_check or analysis_type == "compliance-review":
-                    status_text.text("✅ Generating compliance checklist...")
-                    compliance_checklist = generate_compliance_checklist(text)
-                    progress_bar.progress(0.8)
-
-                # Step 4: Generate final summary
-                status_text.text("📊 Generating final summary...")
-                if analysis_type == "comprehensive-audit" or summary_style == "executive":
-                    final_summary = generate_audit_executive_summary(text, financial_metrics, audit_analysis)
-                else:
-                    final_summary = aggregate_summaries(summaries)
-                progress_bar.progress(0.9)
-
-                # Clear progress indicators
-                status_text.empty()
-                progress_bar.progress(1.0)
-                st.success("✅ Analysis completed successfully!")
-                
-                # Display results in organized tabs
-                tab1, tab2, tab3, tab4, tab5 = st.tabs([
-                    "📊 Executive Summary", 
-                    "💰 Financial Analysis", 
-                    "🎯 Audit Findings", 
-                    "✅ Compliance", 
-                    "📑 Detailed Chunks"
-                ])
-
-                with tab1:
-                    st.subheader("📊 Executive Summary")
-                    st.text_area("Final Summary:", final_summary, height=400, key="final_summary")
-                    
-                    # Key metrics display
-                    if financial_metrics:
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Financial Figures Found", len(financial_metrics.get('financial_figures', [])))
-                        with col2:
-                            st.metric("Percentages Extracted", len(financial_metrics.get('percentages', [])))
-                        with col3:
-                            st.metric("Document Sections", len(chunks))
-
-                with tab2:
-                    st.subheader("💰 Financial Analysis")
-                    if financial_metrics and enable_financial_analysis:
-                        if financial_metrics.get('financial_figures'):
-                            st.write("**💵 Key Financial Figures:**")
-                            for fig in financial_metrics['financial_figures'][:10]:
-                                st.write(f"• {fig}")
-                        
-                        if financial_metrics.get('percentages'):
-                            st.write("**📊 Percentages Found:**")
-                            for pct in financial_metrics['percentages'][:10]:
-                                st.write(f"• {pct}")
-                        
-                        if financial_metrics.get('ratios'):
-                            st.write("**⚖️ Ratios Identified:**")
-                            for ratio in financial_metrics['ratios'][:5]:
-                                st.write(f"• {ratio}")
-                    else:
-                        st.info("💡 Enable Financial Metrics analysis to see detailed financial data extraction")
-
-                with tab3:
-                    st.subheader("🎯 Audit Findings & Risk Assessment")
-                    if audit_analysis and enable_risk_assessment:
-                        st.text_area("Audit Analysis:", audit_analysis.get('analysis', 'No analysis performed'), height=300)
-                        
-                        if risk_categorization:
-                            st.subheader("⚠️ Risk Categorization")
-                            st.text_area("Risk Assessment:", risk_categorization.get('risk_categorization', ''), height=200)
-                    else:
-                        st.info("💡 Enable Risk Categorization to see detailed audit findings analysis")
+    job_id = session_jobs.get(result_key)
+    if result_key not in stored_results and job_id is not None:
+        job = job_manager.store.get(job_id)
+        if job is not None and job["status"] == DONE:
+            stored_results[result_key] = job_manager.store.get_result(job_id)
+            # Keep only the most recent results so long sessions don't grow without bound
+            while len(stored_results) > MAX_STORED_RESULTS:
+                stored_results.pop(next(iter(stored_results)))
+            st.success("✅ Analysis completed successfully!")
+        elif job is not None and job["status"] == FAILED:
+            st.error(f"❌ {job['error']}")
+        elif job is not None:
+            show_job_progress(job_id)
 
-                with tab4:
-                    st.subheader("✅ Compliance Assessment")
-                    if compliance_checklist and enable_compliance_check:
-                        st.text_area("Compliance Checklist:", compliance_checklist.get('checklist', 'No checklist generated'), height=350)
-                    else:
-                        st.info("💡 Enable Compliance Checklist to see regulatory compliance assessment")
-
-                with tab5:
-                    st.subheader("📑 Detailed Section Analysis")
-                    if summaries:
-                        for i, summary in enumerate(summaries):
-                            with st.expander(f"Section {i+1} Summary", expanded=False):
-                                st.text_area(f"Analysis of section {i+1}:", summary, height=200, key=f"chunk_{i}")
-                    else:
-                        st.info("No chunk summaries available")
+    results = stored_results.get(result_key)
+    if results is not None:
+        text = results["text"]
+        chunk_count = results["chunk_count"]
+        summaries = results["summaries"]
+        final_summary = results["final_summary"]
+        financial_metrics = results["financial_metrics"]
+        audit_analysis = results["audit_analysis"]
+        compliance_checklist = results["compliance_checklist"]
+        risk_categorization = results["risk_categorization"]
+
+        # Display original text in expandable section
+        with st.expander("📄 Original Document Text", expanded=False):
+            show_document_text(results, result_key)
+
+        # Display results in organized tabs
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+            "📊 Executive Summary", 
+            "💰 Financial Analysis", 
+            "🎯 Audit Findings", 
+            "✅ Compliance", 
+            "📑 Detailed Chunks"
+        ])
+
+        with tab1:
+            st.subheader("📊 Executive Summary")
+            st.text_area("Final Summary:", final_summary, height=400, key="final_summary")
+            
+            # Key metrics display
+            if financial_metrics:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Financial Figures Found", financial_metrics.get('figure_counts', {}).get(
+                        'money', len(financial_metrics.get('financial_figures', []))))
+                with col2:
+                    st.metric("Percentages Extracted", financial_metrics.get('figure_counts', {}).get(
+                        'percentage', len(financial_metrics.get('percentages', []))))
+                with col3:
+                    st.metric("Document Sections", chunk_count)
+
+        with tab2:
+            st.subheader("💰 Financial Analysis")
+            if financial_metrics and enable_financial_analysis:
+                figure_counts = financial_metrics.get('figure_counts', {})
+                if figure_counts:
+                    st.caption(
+                        f"Found {figure_counts.get('money', 0):,} monetary values, "
+                        f"{figure_counts.get('percentage', 0):,} percentages and "
+                        f"{figure_counts.get('ratio', 0):,} ratios"
+                    )
 
-                # Enhanced Download Section
-                st.markdown("---")
-                st.subheader("📥 Download Professional Reports")
+                category_columns = st.columns(4)
+                for column, category in zip(category_columns, ["revenue", "expenses", "assets", "liabilities"]):
+                    with column:
+                        st.write(f"**{category.title()}:**")
+                        for fig in financial_metrics.get(category, [])[:5] or ["None identified"]:
+                            st.write(f"• {fig}")
+
+                if financial_metrics.get('financial_figures'):
+                    st.write("**💵 Key Financial Figures:**")
+                    for fig in financial_metrics['financial_figures'][:10]:
+                        st.write(f"• {fig}")
                 
-                # Generate download content based on format
-                base_filename = uploaded_file.name.rsplit('.', 1)[0]
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                if financial_metrics.get('percentages'):
+                    st.write("**📊 Percentages Found:**")
+                    for pct in financial_metrics['percentages'][:10]:
+                        st.write(f"• {pct}")
                 
-                if download_format == "comprehensive":
-                    download_content = format_audit_report_comprehensive(
-                        uploaded_file.name, text, final_summary, financial_metrics, 
-                        audit_analysis, compliance_checklist, summaries
+                if financial_metrics.get('ratios'):
+                    st.write("**⚖️ Ratios Identified:**")
+                    for ratio in financial_metrics['ratios'][:5]:
+                        st.write(f"• {ratio}")
+
+                figure_index = get_figure_index(results)
+                if figure_index is not None and len(figure_index.table):
+                    st.markdown("---")
+                    st.write("**🔎 Query Figures:**")
+                    qcol1, qcol2, qcol3 = st.columns(3)
+                    with qcol1:
+                        query_kind = st.selectbox("Type", ["all", "money", "percentage", "ratio"], key="figure_query_kind")
+                        query_category = st.selectbox(
+                            "Category", ["all", "revenue", "expenses", "assets", "liabilities", "other"],
+                            key="figure_query_category"
+                        )
+                    with qcol2:
+                        query_min = st.number_input("Minimum value", value=None, key="figure_query_min",
+                                                    help="Inclusive; e.g. 1000000 for amounts of $1M or more")
+                        query_max = st.number_input("Maximum value", value=None, key="figure_query_max")
+                    with qcol3:
+                        query_near = st.text_input("Near words", key="figure_query_near",
+                                                   help="Words within a sentence or so of the figure, e.g. impairment")
+                        first_page, last_page = figure_index.page_span()
+                        query_pages = None
+                        if 0 < first_page < last_page:
+                            selected_pages = st.slider("Pages", first_page, last_page, (first_page, last_page),
+                                                       key="figure_query_pages")
+                            if selected_pages != (first_page, last_page):
+                                query_pages = selected_pages
+
+                    query_start = time.perf_counter()
+                    matching_ids = figure_index.query(
+                        kind=None if query_kind == "all" else query_kind,
+                        category=None if query_category == "all" else query_category,
+                        min_value=query_min,
+                        max_value=query_max,
+                        pages=query_pages,
+                        near=query_near,
                     )
-                    download_filename = f"{base_filename}_comprehensive_audit_report_{timestamp}.txt"
-                    mime_type = "text/plain"
+                    query_ms = (time.perf_counter() - query_start) * 1000
+                    st.caption(f"{len(matching_ids):,} of {len(figure_index.table):,} figures match "
+                               f"({query_ms:.1f} ms)")
+                    if matching_ids:
+                        st.dataframe(figure_index.rows(matching_ids[:MAX_FIGURE_ROWS]), hide_index=True)
+            else:
+                st.info("💡 Enable Financial Metrics analysis to see detailed financial data extraction")
+
+        with tab3:
+            st.subheader("🎯 Audit Findings & Risk Assessment")
+            if audit_analysis and enable_risk_assessment:
+                st.text_area("Audit Analysis:", audit_analysis.get('analysis', 'No analysis performed'), height=300)
+                
+                if risk_categorization:
+                    st.subheader("⚠️ Risk Categorization")
+                    st.text_area("Risk Assessment:", risk_categorization.get('risk_categorization', ''), height=200)
+            else:
+                st.info("💡 Enable Risk Categorization to see detailed audit findings analysis")
+
+        with tab4:
+            st.subheader("✅ Compliance Assessment")
+            if compliance_checklist and enable_compliance_check:
+                st.text_area("Compliance Checklist:", compliance_checklist.get('checklist', 'No checklist generated'), height=350)
+            else:
+                st.info("💡 Enable Compliance Checklist to see regulatory compliance assessment")
+
+        with tab5:
+            st.subheader("📑 Detailed Section Analysis")
+            if summaries:
+                for i, summary in enumerate(summaries):
+                    with st.expander(f"Section {i+1} Summary", expanded=False):
+                        st.text_area(f"Analysis of section {i+1}:", summary, height=200, key=f"chunk_{i}")
+            else:
+                st.info("No chunk summaries available")
+
+        # Enhanced Download Section
+        st.markdown("---")
+        st.subheader("📥 Download Professional Reports")
+
+        # One report model per result: every format shares its timestamp and statistics
+        report = get_audit_report(results, uploaded_file.name)
+        base_filename = report_stem(report)
+        timestamp = report.generated_at.strftime("%Y%m%d_%H%M%S")
+
+        def download_name(fmt: str) -> str:
+            _, suffix, _ = REPORT_FORMATS[fmt]
+            stem, extension = suffix.rsplit(".", 1)
+            return f"{base_filename}{stem}_{timestamp}.{extension}"
+
+        download_filename = download_name(download_format)
+        mime_type = REPORT_FORMATS[download_format][2]
+
+        # Download buttons with enhanced layout. Reports are rendered only when their
+        # button is clicked, streamed through a spooled temporary file
+        col1, col2, col3, col4, col5 = st.columns(5)
+        
+        with col1:
+            st.download_button(
+                label=f"📊 Download {download_format.title()}",
+                data=lambda: report_bytes(report, download_format),
+                file_name=download_filename,
+                mime=mime_type,
+                type="primary",
+                help=f"Download complete {download_format} analysis report"
+            )
+        
+        with col2:
+            # Executive summary only
+            executive_filename = f"{base_filename}_executive_only_{timestamp}.txt"
+            st.download_button(
+                label="👔 Executive Summary",
+                data=final_summary,
+                file_name=executive_filename,
+                mime="text/plain",
+                help="Download only the executive summary"
+            )
+        
+        with col3:
+            # Financial metrics only (if available)
+            if financial_metrics and enable_financial_analysis:
+                st.download_button(
+                    label="💰 Financial Report",
+                    data=lambda: report_bytes(report, "financial-metrics"),
+                    file_name=download_name("financial-metrics"),
+                    mime="text/plain",
+                    help="Download financial metrics analysis only"
+                )
+            else:
+                st.info("💡 Enable Financial Analysis")
+
+        with col4:
+            # Compliance report (if available)
+            if compliance_checklist and enable_compliance_check:
+                st.download_button(
+                    label="✅ Compliance Report",
+                    data=lambda: report_bytes(report, "compliance"),
+                    file_name=download_name("compliance"),
+                    mime="text/plain",
+                    help="Download compliance assessment only"
+                )
+            else:
+                st.info("💡 Enable Compliance Check")
+
+        with col5:
+            # Every format is rendered from the same report model
+            st.download_button(
+                label="🗜️ All Formats (ZIP)",
+                data=lambda: bundle_bytes(report),
+                file_name=f"{base_filename}_audit_reports_{timestamp}.zip",
+                mime="application/zip",
+                help="Download every report format in one archive"
+            )
+
+        # Advanced options
+        with st.expander("🔧 Advanced Export Options", expanded=False):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                if st.button("📋 Generate All Formats"):
+                    st.info("Generating preview of all available formats...")
                     
-                elif download_format == "json":
-                    download_content = format_audit_json_report(
-                        uploaded_file.name, text, final_summary, financial_metrics,
-                        audit_analysis, compliance_checklist, summaries
-                    )
-                    download_filename = f"{base_filename}_audit_analysis_{timestamp}.json"
-                    mime_type = "application/json"
+                    # Show format previews
+                    format_tabs = st.tabs(["📊 Comprehensive", "💾 JSON", "📝 Markdown"])
                     
-                elif download_format == "markdown":
-                    download_content = format_audit_markdown_report(
-                        uploaded_file.name, text, final_summary, financial_metrics,
-                        audit_analysis, compliance_checklist, summaries
-                    )
-                    download_filename = f"{base_filename}_audit_report_{timestamp}.md"
-                    mime_type = "text/markdown"
+                    with format_tabs[0]:
+                        comprehensive_preview = preview_report(report, "comprehensive", 2000)
+                        st.text_area("Comprehensive Report Preview:", comprehensive_preview + "...", height=300)
                     
-                elif download_format == "executive-summary":
-                    download_content = f"""
-EXECUTIVE AUDIT SUMMARY
-{uploaded_file.name}
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-{final_summary}
-
-Key Statistics:
-- Document Length: {len(text):,} characters
-- Summary Length: {len(final_summary):,} characters  
-- Compression Ratio: {len(final_summary)/len(text)*100:.1f}%
-- Sections Analyzed: {len(summaries)}
-"""
-                    download_filename = f"{base_filename}_executive_summary_{timestamp}.txt"
-                    mime_type = "text/plain"
-
-                # Download buttons with enhanced layout
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.download_button(
-                        label=f"📊 Download {download_format.title()}",
-                        data=download_content,
-                        file_name=download_filename,
-                        mime=mime_type,
-                        type="primary",
-                        help=f"Download complete {download_format} analysis report"
-                    )
-                
-                with col2:
-                    # Executive summary only
-                    executive_filename = f"{base_filename}_executive_only_{timestamp}.txt"
+                    with format_tabs[1]:
+                        json_preview = preview_report(report, "json", 2000)
+                        st.code(json_preview + "...", language="json")
+                    
+                    with format_tabs[2]:
+                        md_preview = preview_report(report, "markdown", 2000)
+                        st.markdown("**Markdown Preview:**")
+                        st.markdown(md_preview + "...")
+            
+            with col2:
+                # Audit trail documentation
+                if enable_audit_trail:
+                    st.markdown("**🔍 Audit Trail Information:**")
+                    st.json({
+                        "processing_timestamp": report.iso_timestamp,
+                        "ai_model": report.model,
+                        "analysis_type": analysis_type,
+                        "features_enabled": {
+                            "financial_analysis": enable_financial_analysis,
+                            "risk_assessment": enable_risk_assessment,
+                            "compliance_check": enable_compliance_check,
+                            "audit_trail": enable_audit_trail
+                        },
+                        "document_stats": {
+                            "original_length": report.stats.original_length,
+                            "chunks_processed": chunk_count,
+                            "summary_length": report.stats.summary_length
+                        }
+                    })
+
+            # One row per chunk for loading into a warehouse; built when a button is clicked
+            if results.get("chunk_stats"):
+                st.markdown("**🧩 Per-Chunk Export:**")
+
+                def export_rows() -> list:
+                    return chunk_rows(results, uploaded_file.name, upload.sha256,
+                                      report.generated_at)
+
+                chunk_col1, chunk_col2 = st.columns(2)
+                with chunk_col1:
                     st.download_button(
-                        label="👔 Executive Summary",
-                        data=final_summary,
-                        file_name=executive_filename,
-                        mime="text/plain",
-                        help="Download only the executive summary"
+                        label="📄 Chunks (JSON Lines)",
+                        data=lambda: jsonl_bytes(export_rows()),
+                        file_name=f"{base_filename}_chunks_{timestamp}.jsonl",
+                        mime="application/jsonl",
+                        help="One JSON object per chunk: pages, tokens, summary, figures and risk label"
                     )
-                
-                with col3:
-                    # Financial metrics only (if available)
-                    if financial_metrics and enable_financial_analysis:
-                        financial_content = f"""
-FINANCIAL METRICS REPORT
-{uploaded_file.name}
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-Financial Figures: {', '.join(financial_metrics.get('financial_figures', []))}
-Percentages: {', '.join(financial_metrics.get('percentages', []))}
-Ratios: {', '.join(financial_metrics.get('ratios', []))}
-"""
-                        financial_filename = f"{base_filename}_financial_metrics_{timestamp}.txt"
-                        st.download_button(
-                            label="💰 Financial Report",
-                            data=financial_content,
-                            file_name=financial_filename,
-                            mime="text/plain",
-                            help="Download financial metrics analysis only"
-                        )
-                    else:
-                        st.info("💡 Enable Financial Analysis")
-
-                with col4:
-                    # Compliance report (if available)
-                    if compliance_checklist and enable_compliance_check:
-                        compliance_content = f"""
-COMPLIANCE ASSESSMENT REPORT
-{uploaded_file.name}
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-{compliance_checklist.get('checklist', 'No compliance assessment available')}
-"""
-                        compliance_filename = f"{base_filename}_compliance_report_{timestamp}.txt"
+                with chunk_col2:
+                    if parquet_available():
                         st.download_button(
-                            label="✅ Compliance Report",
-                            data=compliance_content,
-                            file_name=compliance_filename,
-                            mime="text/plain",
-                            help="Download compliance assessment only"
+                            label="🧱 Chunks (Parquet)",
+                            data=lambda: parquet_bytes(export_rows()),
+                            file_name=f"{base_filename}_chunks_{timestamp}.parquet",
+                            mime="application/vnd.apache.parquet",
+                            help="The same rows as a columnar Parquet file"
                         )
                     else:
-                        st.info("💡 Enable Compliance Check")
+                        st.info("💡 Install pyarrow for Parquet export")
+
+        # Enhanced sidebar statistics
+        st.sidebar.markdown("### 📊 Analysis Statistics")
+        st.sidebar.metric("📄 Original Length", f"{len(text):,} chars")
+        st.sidebar.metric("📝 Summary Length", f"{len(final_summary):,} chars")
+        st.sidebar.metric("📊 Compression Ratio", f"{len(final_summary)/len(text)*100:.1f}%")
+        st.sidebar.metric("🧩 Sections Processed", chunk_count)
+        
+        if financial_metrics:
+            st.sidebar.metric("💰 Financial Figures", financial_metrics.get('figure_counts', {}).get(
+                'money', len(financial_metrics.get('financial_figures', []))))
+        
+        # Processing summary
+        st.sidebar.markdown("### ⚙️ Processing Summary")
+        processing_info = {
+            "AI Model": "Gemini-2.5-Flash",
+            "Analysis Type": analysis_type,
+            "Summary Style": summary_style,
+            "Features Used": f"{sum([enable_financial_analysis, enable_risk_assessment, enable_compliance_check, enable_audit_trail])}/4"
+        }
+        cache_stats = get_cache_stats()
+        if cache_stats["enabled"]:
+            processing_info["Response Cache"] = f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+        
+        for key, value in processing_info.items():
+            st.sidebar.text(f"{key}: {value}")
+
+        processing_metrics = results.get("processing_metrics")
+        if processing_metrics:
+            totals = processing_metrics["totals"]
+            st.sidebar.markdown("**⏱️ Stage Breakdown**")
+            st.sidebar.text(f"LLM calls: {totals['llm_calls']} ({totals['cache_hits']} cached, "
+                            f"{totals['retries']} retries)")
+            st.sidebar.text(f"Tokens: {totals['input_tokens']:,} in / {totals['output_tokens']:,} out")
+            st.sidebar.text(f"Estimated cost: ${totals['cost_usd']:.4f}")
+            for stage_name, row in processing_metrics["stages"].items():
+                line = f"{stage_name}: {row['wall_seconds']:.2f}s"
+                if row["llm_calls"] or row["cache_hits"]:
+                    line += (f", {row['llm_calls']} calls, {row['input_tokens']:,}/{row['output_tokens']:,} tok, "
+                             f"{row['retries']} retries, {row['cache_hits']} cached")
+                st.sidebar.text(line)
+
+        dedup = results.get("dedup_report")
+        if dedup:
+            st.sidebar.markdown("**🧹 Boilerplate Removal**")
+            st.sidebar.text(f"Tokens saved: {dedup['tokens_saved']:,}")
+            st.sidebar.text(f"Repeated lines: {dedup['boilerplate_lines']} "
+                            f"({dedup['boilerplate_occurrences_removed']} copies, "
+                            f"{dedup['boilerplate_tokens_saved']:,} tokens)")
+            st.sidebar.text(f"Near-duplicate chunks: {dedup['duplicate_chunks']} "
+                            f"({dedup['duplicate_tokens_saved']:,} tokens)")
+            if dedup["removed_lines"]:
+                with st.sidebar.expander("Removed lines"):
+                    for line in dedup["removed_lines"]:
+                        st.text(line)
+
+        reuse_report = results.get("reuse_report")
+        if reuse_report:
+            st.sidebar.markdown(f"**🔁 Reuse ({reuse_report['document_id']} v{reuse_report['version']})**")
+            st.sidebar.text(f"Chunks reused: {reuse_report['chunks_reused']}/{reuse_report['chunks_total']}")
+            st.sidebar.text(f"Tokens reused: {reuse_report['tokens_reused']:,}/{reuse_report['tokens_total']:,}")
+            st.sidebar.text(f"Stages reused: {', '.join(reuse_report['stages_reused']) or 'none'}")
+            st.sidebar.text(f"Stages recomputed: {', '.join(reuse_report['stages_recomputed']) or 'none'}")
+            if reuse_report["previous_version"] is not None:
+                st.sidebar.text(
+                    f"vs v{reuse_report['previous_version']}: {reuse_report['chunks_unchanged']} unchanged, "
+                    f"{reuse_report['chunks_added']} added, {reuse_report['chunks_removed']} removed"
+                )
 
-                # Advanced options
-                with st.expander("🔧 Advanced Export Options", expanded=False):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        if st.button("📋 Generate All Formats"):
-                            st.info("Generating preview of all available formats...")
-                            
-                            # Show format previews
-                            format_tabs = st.tabs(["📊 Comprehensive", "💾 JSON", "📝 Markdown"])
-                            
-                            with format_tabs[0]:
-                                comprehensive_preview = format_audit_report_comprehensive(
-                                    uploaded_file.name, text[:1000] + "...", final_summary[:500] + "...", 
-                                    financial_metrics, audit_analysis, compliance_checklist, summaries[:2]
-                                )
-                                st.text_area("Comprehensive Report Preview:", comprehensive_preview[:2000] + "...", height=300)
-                            
-                            with format_tabs[1]:
-                                json_preview = format_audit_json_report(
-                                    uploaded_file.name, text[:500], final_summary[:300], 
-                                    financial_metrics, audit_analysis, compliance_checklist, summaries[:2]
-                                )
-                                st.code(json_preview[:2000] + "...", language="json")
-                            
-                            with format_tabs[2]:
-                                md_preview = format_audit_markdown_report(
-                                    uploaded_file.name, text[:500], final_summary[:300],
-                                    financial_metrics, audit_analysis, compliance_checklist, summaries[:2]
-                                )
-                                st.markdown("**Markdown Preview:**")
-                                st.markdown(md_preview[:2000] + "...")
-                    
-                    with col2:
-                        # Audit trail documentation
-                        if enable_audit_trail:
-                            st.markdown("**🔍 Audit Trail Information:**")
-                            st.json({
-                                "processing_timestamp": datetime.now().isoformat(),
-                                "ai_model": "Gemini-2.5-Flash",
-                                "analysis_type": analysis_type,
-                                "features_enabled": {
-                                    "financial_analysis": enable_financial_analysis,
-                                    "risk_assessment": enable_risk_assessment,
-                                    "compliance_check": enable_compliance_check,
-                                    "audit_trail": enable_audit_trail
-                                },
-                                "document_stats": {
-                                    "original_length": len(text),
-                                    "chunks_processed": len(chunks),
-                                    "summary_length": len(final_summary)
-                                }
-                            })
-
-                # Enhanced sidebar statistics
-                st.sidebar.markdown("### 📊 Analysis Statistics")
-                st.sidebar.metric("📄 Original Length", f"{len(text):,} chars")
-                st.sidebar.metric("📝 Summary Length", f"{len(final_summary):,} chars")
-                st.sidebar.metric("📊 Compression Ratio", f"{len(final_summary)/len(text)*100:.1f}%")
-                st.sidebar.metric("🧩 Sections Processed", len(chunks))
-                
-                if financial_metrics:
-                    st.sidebar.metric("💰 Financial Figures", len(financial_metrics.get('financial_figures', [])))
-                
-                # Processing summary
-                st.sidebar.markdown("### ⚙️ Processing Summary")
-                processing_info = {
-                    "AI Model": "Gemini-2.5-Flash",
-                    "Analysis Type": analysis_type,
-                    "Summary Style": summary_style,
-                    "Features Used": f"{sum([enable_financial_analysis, enable_risk_assessment, enable_compliance_check, enable_audit_trail])}/4"
-                }
-                
-                for key, value in processing_info.items():
-                    st.sidebar.text(f"{key}: {value}")
-                
-            else:
-                st.error("❌ No text could be extracted from the file. Please ensure your document contains readable text.")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,387 @@
+# batch.py - headless batch runner for audit reports
+#
+# Usage (from the "AI report" directory):
+#     python batch.py reports/ --output-dir out/
+#     python batch.py "archive/2025-Q4/**/*.pdf" --output-dir out/ --formats json markdown
+#     python batch.py reports/ --output-dir out/ --chunk-formats jsonl parquet
+#
+# Re-running the same command resumes: documents already recorded as done in
+# out/batch_manifest.jsonl (same content hash and options, reports and chunk rows
+# present) are skipped.
+# Documents whose model calls failed are recorded as partial and retried.
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from chunk_export import CHUNK_FORMATS, chunk_output_path, chunk_rows, parquet_available, write_chunk_file
+from incremental import document_series_id, failed_results
+from pdf_backends import AUTO, available_backends, default_backend_name
+from pipeline import run_audit_pipeline
+from report import REPORT_FORMATS, report_from_results, write_report
+from tracing import span
+from summarizer import (
+    DEFAULT_CHUNK_TOKENS,
+    extract_text_from_txt,
+    get_cache_stats,
+    get_client,
+    get_governor,
+    iter_pdf_pages,
+    join_pages,
+)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+MANIFEST_NAME = "batch_manifest.jsonl"
+
+# Formats written when --formats is not given; any of report.REPORT_FORMATS can be requested
+DEFAULT_FORMATS = ["comprehensive", "json", "markdown"]
+
+
+# -----------------------------
+# Inputs
+# -----------------------------
+
+def discover_inputs(patterns: List[str]) -> List[str]:
+    """Expand directories (recursively) and glob patterns into a sorted list of PDF/TXT paths."""
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                found.update(os.path.join(root, name) for name in names)
+        else:
+            found.update(glob.glob(pattern, recursive=True))
+    return sorted(os.path.abspath(path) for path in found
+                  if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS))
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def options_key(options: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def extract_document(path: str, pdf_backend: Optional[str] = None) -> Tuple[str, List[Tuple[int, int]], float]:
+    """Worker-process entry point: ``(text, page_offsets, seconds)``; page_offsets is empty for TXT."""
+    start = time.perf_counter()
+    if path.lower().endswith(".pdf"):
+        # The batch already spreads documents over processes, so each PDF is read sequentially
+        text, page_offsets = join_pages(iter_pdf_pages(path, max_workers=1, backend=pdf_backend))
+        return text, page_offsets, time.perf_counter() - start
+    return extract_text_from_txt(path), [], time.perf_counter() - start
+
+
+# -----------------------------
+# Resume manifest
+# -----------------------------
+
+class BatchManifest:
+    """
+    Append-only JSON-lines log of finished documents.
+
+    Each record is flushed and fsynced as soon as a document completes, so a
+    crash loses at most the documents that were still in progress.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def completed(self, options_hash: str) -> Dict[str, Dict[str, Any]]:
+        """Latest successful record per content hash for these options."""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partial line from an interrupted write
+                if record.get("options_key") != options_hash:
+                    continue
+                if record.get("status") == "done":
+                    done[record["sha256"]] = record
+                else:
+                    done.pop(record.get("sha256"), None)
+        return done
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, sort_keys=True) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# -----------------------------
+# Per-document work
+# -----------------------------
+
+def write_atomic(path: str, write: Callable[[BinaryIO], Any]) -> None:
+    """
+    Write via a temporary file so an interrupted run never leaves a truncated
+    report; ``write`` receives the file, opened for binary writing.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def analyze_document(job: Dict[str, Any], text: str, page_offsets: List[Tuple[int, int]],
+                     options: Dict[str, Any], formats: List[str]) -> Dict[str, Any]:
+    """
+    Run the analysis pipeline on extracted text and write the requested reports
+    and chunk row files; everything is on disk before the manifest records the document.
+    """
+    start = time.perf_counter()
+    filename = os.path.basename(job["source"])
+    with span("batch_document", **{"file.name": filename, "file.sha256": job["sha256"]}):
+        results = run_audit_pipeline(text, options, page_offsets=page_offsets,
+                                     document_id=document_series_id(filename))
+        # One report model for every format, each streamed straight to its file
+        report = report_from_results(filename, results)
+        for fmt in formats:
+            write_atomic(job["outputs"][fmt], lambda f: write_report(report, fmt, f))
+        rows = chunk_rows(results, filename, job["sha256"], report.generated_at) if job["chunk_outputs"] else []
+        for fmt, path in job["chunk_outputs"].items():
+            write_chunk_file(path, fmt, rows)
+    return {
+        "chunk_rows": len(rows),
+        "failed_results": failed_results(results),
+        "chunks": results["chunk_count"],
+        "analysis_seconds": round(time.perf_counter() - start, 3),
+        "stage_timings": results["stage_timings"],
+        "llm_usage": results["processing_metrics"]["totals"],
+        "reuse_report": results["reuse_report"],
+        "dedup_report": results["dedup_report"],
+    }
+
+
+def plan_jobs(paths: List[str], output_dir: str, formats: List[str], chunk_formats: List[str] = (),
+              options_hash: str = "") -> List[Dict[str, Any]]:
+    """
+    Hash each input and assign output paths; documents sharing a name get a
+    hash suffix. Chunk row files are named by content hash and ``options_hash``.
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    jobs = []
+    for path, stem in zip(paths, stems):
+        digest = file_sha256(path)
+        name = stem if stems.count(stem) == 1 else f"{stem}_{digest[:8]}"
+        jobs.append({
+            "source": path,
+            "sha256": digest,
+            "outputs": {fmt: os.path.join(output_dir, name + REPORT_FORMATS[fmt][1]) for fmt in formats},
+            "chunk_outputs": {fmt: chunk_output_path(output_dir, fmt, digest, options_hash) for fmt in chunk_formats},
+        })
+    return jobs
+
+
+# -----------------------------
+# Batch driver
+# -----------------------------
+
+def run_batch(jobs: List[Dict[str, Any]], options: Dict[str, Any], formats: List[str], manifest: BatchManifest,
+              extract_workers: int, documents_in_flight: int) -> List[Dict[str, Any]]:
+    """
+    Extract documents on a process pool and analyze them on a thread pool.
+
+    At most ``documents_in_flight`` documents are in LLM stages at once (each
+    still fans out its chunk requests, all under the shared request governor),
+    and extraction only runs ahead by ``extract_workers`` documents so extracted
+    text does not pile up in memory.
+    """
+    options_hash = options_key(options)
+    records = []
+    queue = deque(jobs)
+    extracting, analyzing = {}, {}
+    max_ahead = extract_workers + documents_in_flight
+
+    def finish(job: Dict[str, Any], status: str, **fields) -> None:
+        record = {"source": job["source"], "sha256": job["sha256"], "options_key": options_hash,
+                  "status": status, "outputs": job["outputs"], "chunk_outputs": job["chunk_outputs"],
+                  "finished_at": datetime.now().isoformat(timespec="seconds"), **fields}
+        manifest.record(record)
+        records.append(record)
+        position = f"[{len(records)}/{len(jobs)}]"
+        if status == "done":
+            pages = f"{record['pages']} pages, " if record.get("pages") else ""
+            print(f"{position} ✅ {os.path.basename(job['source'])}: {pages}{record['chunks']} chunks, "
+                  f"{record['extract_seconds'] + record['analysis_seconds']:.1f}s")
+        elif status == "partial":
+            print(f"{position} ⚠️ {os.path.basename(job['source'])}: {record['error']}")
+        else:
+            print(f"{position} ❌ {os.path.basename(job['source'])}: {record['error']}")
+
+    with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=documents_in_flight) as analysis_pool:
+        while queue or extracting or analyzing:
+            while queue and len(extracting) < extract_workers and len(extracting) + len(analyzing) < max_ahead:
+                job = queue.popleft()
+                extracting[extract_pool.submit(extract_document, job["source"], options.get("pdf_backend"))] = job
+
+            done, _ = wait(list(extracting) + list(analyzing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in extracting:
+                    job = extracting.pop(future)
+                    try:
+                        text, page_offsets, seconds = future.result()
+                    except Exception as e:
+                        finish(job, "failed", error=f"Error extracting text: {str(e)}")
+                        continue
+                    job.update(pages=len(page_offsets) or None, characters=len(text), extract_seconds=round(seconds, 3))
+                    analyzing[analysis_pool.submit(analyze_document, job, text, page_offsets, options, formats)] = job
+                else:
+                    job = analyzing.pop(future)
+                    try:
+                        analysis = future.result()
+                    except Exception as e:
+                        finish(job, "failed", error=f"Error in AI analysis: {str(e)}")
+                        continue
+                    fields = dict(pages=job["pages"], characters=job["characters"],
+                                  extract_seconds=job["extract_seconds"], **analysis)
+                    failed = analysis["failed_results"]
+                    if failed:
+                        # Reports are written, but a partial document is not done and is retried on resume
+                        finish(job, "partial", error=f"{len(failed)} model calls failed: {', '.join(failed[:5])}"
+                                                     f"{', ...' if len(failed) > 5 else ''}", **fields)
+                    else:
+                        finish(job, "done", **fields)
+    return records
+
+
+def print_report(records: List[Dict[str, Any]], skipped: int, wall_seconds: float) -> None:
+    done = [r for r in records if r["status"] == "done"]
+    partial = sum(r["status"] == "partial" for r in records)
+    failed = len(records) - len(done) - partial
+    pages = sum(r.get("pages") or 0 for r in done)
+    characters = sum(r["characters"] for r in done)
+    chunks = sum(r["chunks"] for r in done)
+    stage_totals: Dict[str, float] = {}
+    for record in done:
+        for stage, seconds in record["stage_timings"].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+    print("\n📊 Batch Summary")
+    print(f"  Documents: {len(done)} processed, {skipped} skipped (already done), {partial} partial "
+          f"(retried on the next run), {failed} failed")
+    print(f"  Wall time: {wall_seconds:.1f}s")
+    if done and wall_seconds > 0:
+        print(f"  Throughput: {len(done) / wall_seconds * 60:.1f} documents/min, {pages / wall_seconds:.1f} pages/s, "
+              f"{characters / wall_seconds:,.0f} chars/s")
+        print(f"  Content: {pages:,} pages, {characters:,} characters, {chunks:,} chunks")
+        print(f"  Extraction (summed over workers): {sum(r['extract_seconds'] for r in done):.1f}s")
+        print(f"  Analysis (summed over documents): {sum(r['analysis_seconds'] for r in done):.1f}s")
+        for stage, seconds in sorted(stage_totals.items(), key=lambda item: -item[1]):
+            print(f"    {stage:<22}{seconds:>9.1f}s")
+    governor = get_governor().stats()
+    print(f"  LLM requests: {governor['requests']} ({governor['retries']} retries, "
+          f"{governor['throttled']} rate-limited, {governor['failed']} failed)")
+    cache = get_cache_stats()
+    if cache.get("enabled"):
+        print(f"  Response cache: {cache['hits']} hits, {cache['misses']} misses")
+    usage = [r["llm_usage"] for r in done if r.get("llm_usage")]
+    if usage:
+        print(f"  Tokens: {sum(u['input_tokens'] for u in usage):,} in / {sum(u['output_tokens'] for u in usage):,} out, "
+              f"estimated cost ${sum(u['cost_usd'] for u in usage):.4f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarize a directory of audit reports without the web UI")
+    parser.add_argument("inputs", nargs="+", help="PDF/TXT files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="batch_output", help="where reports and the manifest go")
+    parser.add_argument("--formats", nargs="+", choices=list(REPORT_FORMATS), default=DEFAULT_FORMATS)
+    parser.add_argument("--chunk-formats", nargs="+", choices=CHUNK_FORMATS, default=[],
+                        help="also write one row per chunk to chunks_jsonl/ and/or chunks_parquet/, a file per document")
+    parser.add_argument("--summary-style", default="audit-focused",
+                        choices=["audit-focused", "executive", "detailed", "compliance-focused", "concise",
+                                 "bullet-points"])
+    parser.add_argument("--analysis-type", default="comprehensive-audit",
+                        choices=["comprehensive-audit", "basic-summary", "financial-focus", "compliance-review"])
+    parser.add_argument("--chunk-size", default=str(DEFAULT_CHUNK_TOKENS),
+                        help="chunk size in tokens, or 'auto'")
+    parser.add_argument("--no-fused", dest="fused", action="store_false",
+                        help="use separate requests instead of the single fused analysis request")
+    parser.add_argument("--keep-boilerplate", dest="remove_boilerplate", action="store_false",
+                        help="send repeated headers, footers and near-duplicate sections to the model as they are")
+    parser.add_argument("--no-incremental", dest="incremental", action="store_false",
+                        help="analyze every document in full instead of reusing work from earlier versions")
+    parser.add_argument("--pdf-backend", default=default_backend_name(), choices=[AUTO] + available_backends(),
+                        help="PDF text extraction library; 'auto' picks one per document (default: PDF_BACKEND or auto)")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 1,
+                        help="processes extracting text")
+    parser.add_argument("--documents", type=int, default=4, help="documents in LLM stages at the same time")
+    parser.add_argument("--force", action="store_true", help="reprocess documents the manifest marks as done")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    comprehensive = args.analysis_type == "comprehensive-audit"
+    options = {
+        "summary_style": args.summary_style,
+        "analysis_type": args.analysis_type,
+        "chunk_size": args.chunk_size if args.chunk_size == "auto" else int(args.chunk_size),
+        "fused_analysis": args.fused,
+        "incremental": args.incremental,
+        "remove_boilerplate": args.remove_boilerplate,
+        "pdf_backend": args.pdf_backend,
+        "financial_analysis": comprehensive,
+        "risk_assessment": comprehensive,
+        "compliance_check": comprehensive,
+        "audit_trail": comprehensive,
+    }
+
+    if "parquet" in args.chunk_formats and not parquet_available():
+        print("--chunk-formats parquet needs pyarrow. Install it with `pip install pyarrow`.", file=sys.stderr)
+        return 2
+
+    paths = discover_inputs(args.inputs)
+    if not paths:
+        print("No PDF or TXT files matched the given inputs.", file=sys.stderr)
+        return 2
+    try:
+        get_client()
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = BatchManifest(os.path.join(args.output_dir, MANIFEST_NAME))
+    jobs = plan_jobs(paths, args.output_dir, args.formats, args.chunk_formats, options_key(options))
+    completed: Set[str] = set() if args.force else set(manifest.completed(options_key(options)))
+    # Asking for a chunk format a document was not exported in reprocesses it
+    pending = [job for job in jobs
+               if job["sha256"] not in completed
+               or not all(map(os.path.exists, [*job["outputs"].values(), *job["chunk_outputs"].values()]))]
+    skipped = len(jobs) - len(pending)
+    print(f"📄 {len(jobs)} documents found, {skipped} already done, {len(pending)} to process")
+
+    start = time.perf_counter()
+    records = run_batch(pending, options, args.formats, manifest,
+                        extract_workers=max(1, args.extract_workers), documents_in_flight=max(1, args.documents))
+    print_report(records, skipped, time.perf_counter() - start)
+    if args.chunk_formats:
+        rows = sum(r.get("chunk_rows", 0) for r in records)
+        directories = sorted({os.path.dirname(path) for job in jobs for path in job["chunk_outputs"].values()})
+        print(f"  Chunk rows: {rows:,} written to {', '.join(directories)}")
+    return 1 if any(r["status"] != "done" for r in records) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
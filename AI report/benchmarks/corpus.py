@@ -0,0 +1,111 @@
+# corpus.py - deterministic synthetic audit reports for benchmarks
+import random
+from typing import List
+
+COMPANY = "Northwind Holdings plc"
+HEADER = f"{COMPANY} - Independent Auditor's Report for the year ended 31 December 2025"
+FOOTER = "Confidential - prepared for the Audit Committee. Page {page} of {total}"
+
+_AREAS = ["revenue recognition", "inventory valuation", "IT general controls", "procurement",
+          "payroll", "treasury", "lease accounting", "goodwill impairment", "related party transactions",
+          "segregation of duties", "financial close", "tax provisions"]
+_SECTIONS = ["Basis for Opinion", "Key Audit Matters", "Internal Control over Financial Reporting",
+             "Findings and Recommendations", "Management Response", "Financial Highlights",
+             "Compliance with Regulations", "Going Concern", "Other Information"]
+_TEMPLATES = [
+    "Revenue from {area} was ${amount:,} million, {direction} {pct}% compared with the prior year.",
+    "We identified a {severity} deficiency in {area}, where approvals were not evidenced for {count} of {total} samples.",
+    "Management has agreed to remediate the {area} findings by {month} 2026 and assigned an owner.",
+    "The current ratio was {ratio_a}:{ratio_b} at year end, against a covenant minimum of 1.2:1.",
+    "Operating expenses increased to ${amount:,} thousand, driven by {area} costs of {pct}% above budget.",
+    "Total assets of ${big:,} include goodwill of ${amount:,} million subject to annual impairment testing.",
+    "Liabilities were reduced by ${amount:,} million following settlement of the {area} dispute.",
+    "Our testing of {area} covered {pct}% of transactions by value with no exceptions noted.",
+    "The company complied with SOX Section 404 and ISA 315 requirements except as noted for {area}.",
+    "An impairment charge of (${amount:,} million) was recognised on the {area} cash-generating unit.",
+]
+_MONTHS = ["March", "June", "September", "December"]
+
+
+def _sentence(rng: random.Random) -> str:
+    return rng.choice(_TEMPLATES).format(
+        area=rng.choice(_AREAS), amount=rng.randint(1, 950), big=rng.randint(10_000_000, 900_000_000),
+        pct=round(rng.uniform(0.5, 45.0), 1), direction=rng.choice(["an increase of", "a decrease of"]),
+        severity=rng.choice(["significant", "moderate", "minor"]), count=rng.randint(1, 9),
+        total=rng.randint(25, 60), month=rng.choice(_MONTHS),
+        ratio_a=round(rng.uniform(0.8, 2.5), 2), ratio_b=1,
+    )
+
+
+def _wrap(text: str, width: int = 95) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def synthetic_pages(page_count: int, seed: int = 42, lines_per_page: int = 52) -> List[List[str]]:
+    """Pages of audit-report text, each a list of lines with a running header and footer."""
+    rng = random.Random(seed)
+    pages = []
+    for number in range(1, page_count + 1):
+        lines = [HEADER, ""]
+        if number % 4 == 1:
+            lines += [f"{(number // 4) + 1}. {rng.choice(_SECTIONS)}", ""]
+        if number % 5 == 3:
+            lines += ["Account                      FY2025        FY2024"]
+            for area in rng.sample(_AREAS, 4):
+                lines.append(f"{area.title():<28} {rng.randint(100, 9999):>8,}   ({rng.randint(100, 9999):,})")
+            lines.append("")
+        while len(lines) < lines_per_page - 2:
+            paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(2, 5)))
+            lines += _wrap(paragraph) + [""]
+        lines = lines[:lines_per_page - 2] + ["", FOOTER.format(page=number, total=page_count)]
+        pages.append(lines)
+    return pages
+
+
+def synthetic_text(page_count: int, seed: int = 42) -> str:
+    return "\n".join("\n".join(lines) for lines in synthetic_pages(page_count, seed)) + "\n"
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Write a minimal text-only PDF (Helvetica, one content stream per page)."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for lines in pages:
+        body = "BT /F1 9 Tf 13 TL 50 760 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{kid} 0 R" for kid in kids).encode(), len(kids))
+
+    with open(path, "wb") as pdf:
+        pdf.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(pdf.tell())
+            pdf.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = pdf.tell()
+        pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            pdf.write(b"%010d 00000 n \n" % offset)
+        pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
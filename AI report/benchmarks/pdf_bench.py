@@ -0,0 +1,86 @@
+# pdf_bench.py - pages per second of each PDF extraction backend, and what auto picks
+#
+# Runs on synthetic audit PDFs from corpus.py and on any PDFs given on the command line.
+#
+# Usage (from the "AI report" directory):
+#     python benchmarks/pdf_bench.py [--pages 10 100] [--repeat 3]
+#     python benchmarks/pdf_bench.py reports/annual_2025.pdf --json pdf_results.json
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_backends
+from corpus import synthetic_pages, write_pdf
+from summarizer import iter_pdf_pages, join_pages
+
+
+def time_extraction(path: str, backend: str, repeat: int) -> Dict[str, Any]:
+    """Median time of a sequential extraction of every page with ``backend``."""
+    timings = []
+    text, page_offsets = "", []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text, page_offsets = join_pages(iter_pdf_pages(path, max_workers=1, backend=backend))
+        timings.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(timings), "characters": len(text), "text_pages": len(page_offsets)}
+
+
+def bench_pdf(path: str, backends: List[str], repeat: int) -> Dict[str, Any]:
+    page_count = pdf_backends.get_backend(backends[0]).page_count(path)
+    rows = {}
+    for backend in backends + [pdf_backends.AUTO]:
+        row = time_extraction(path, backend, repeat)
+        row["pages_per_s"] = round(page_count / row["seconds"], 1) if row["seconds"] else None
+        row["seconds"] = round(row["seconds"], 4)
+        rows[backend] = row
+
+    start = time.perf_counter()
+    choice = pdf_backends.choose_backend(path, candidates=backends)
+    rows[pdf_backends.AUTO].update(choice=choice.name, reason=choice.reason,
+                                   decision_ms=round((time.perf_counter() - start) * 1000, 1))
+    return {"pages": page_count, "backends": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction throughput per backend")
+    parser.add_argument("pdfs", nargs="*", help="extra PDFs to measure")
+    parser.add_argument("--pages", type=int, nargs="*", default=[10, 100], help="synthetic document sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed extractions per backend")
+    parser.add_argument("--seed", type=int, default=42, help="corpus seed")
+    parser.add_argument("--backends", nargs="+", default=pdf_backends.available_backends(),
+                        help="backends to compare (default: every installed one)")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = []
+        for page_count in args.pages:
+            path = os.path.join(workdir, f"synthetic_{page_count}.pdf")
+            write_pdf(path, synthetic_pages(page_count, seed=args.seed))
+            paths.append(path)
+        for path in paths + args.pdfs:
+            name = os.path.basename(path)
+            report = results[name] = bench_pdf(path, args.backends, args.repeat)
+            print(f"\n{name} ({report['pages']} pages)")
+            print(f"  {'backend':<14}{'seconds':>10}{'pages/s':>10}{'chars':>12}")
+            for backend, row in report["backends"].items():
+                print(f"  {backend:<14}{row['seconds']:>10.3f}{row['pages_per_s']:>10}{row['characters']:>12,}")
+            auto = report["backends"][pdf_backends.AUTO]
+            print(f"  auto picks {auto['choice']} ({auto['reason']}); deciding took {auto['decision_ms']:.0f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
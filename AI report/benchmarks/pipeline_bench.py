@@ -0,0 +1,179 @@
+# pipeline_bench.py - per-stage throughput, latency and memory on a synthetic audit corpus
+#
+# Runs entirely offline: LLM calls go to the deterministic fake backend and the
+# response cache is disabled, so numbers are comparable between runs.
+#
+# Usage (from the "AI report" directory):
+#     python benchmarks/pipeline_bench.py [--pages 10 100 1000] [--repeat 3]
+#     python benchmarks/pipeline_bench.py --json results.json
+#     python benchmarks/pipeline_bench.py --baseline results.json --tolerance 0.2
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+os.environ["LLM_CACHE_ENABLED"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import summarizer
+from report import build_report, write_report
+from corpus import synthetic_pages, write_pdf
+from fake_gemini import FakeGeminiClient
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def measure(fn: Callable[[], Any], repeat: int, memory: bool) -> Dict[str, Any]:
+    """Time ``fn`` ``repeat`` times; peak Python heap comes from one extra traced run."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"result": result, "timings": timings, "peak_bytes": peak}
+
+
+def report_args(text: str, summaries: List[str], metrics: Dict[str, Any]) -> tuple:
+    final_summary = summarizer.aggregate_summaries(summaries)
+    analysis = {"analysis": summaries[0] if summaries else ""}
+    checklist = {"checklist": summaries[-1] if summaries else ""}
+    return ("benchmark.pdf", text, final_summary, metrics, analysis, checklist, summaries)
+
+
+def format_all(text: str, summaries: List[str], metrics: Dict[str, Any]) -> List[str]:
+    args = report_args(text, summaries, metrics)
+    return [
+        summarizer.format_audit_report_comprehensive(*args),
+        summarizer.format_audit_json_report(*args),
+        summarizer.format_audit_markdown_report(*args),
+    ]
+
+
+def stream_all(text: str, summaries: List[str], metrics: Dict[str, Any]) -> int:
+    """Write the same three reports through the streaming renderers; returns the bytes written."""
+    report = build_report(*report_args(text, summaries, metrics))
+    with open(os.devnull, "wb") as sink:
+        return sum(write_report(report, fmt, sink) for fmt in ("comprehensive", "json", "markdown"))
+
+
+def bench_document(page_count: int, args, workdir: str) -> Dict[str, Dict[str, Any]]:
+    pdf_path = os.path.join(workdir, f"audit_{page_count}.pdf")
+    write_pdf(pdf_path, synthetic_pages(page_count, seed=args.seed))
+
+    stages = {}
+    extracted = measure(lambda: summarizer.extract_text_from_pdf(pdf_path), args.repeat, args.memory)
+    text = extracted["result"]
+    stages["extract_text_from_pdf"] = extracted
+
+    chunked = measure(lambda: summarizer.chunk_text(text, max_tokens=args.chunk_tokens), args.repeat, args.memory)
+    chunks = chunked["result"]
+    stages["chunk_text"] = chunked
+
+    stages["summarize_chunks"] = summarized = measure(
+        lambda: summarizer.summarize_chunks_concurrently(chunks, audit_focus=True, max_workers=args.workers),
+        args.repeat, args.memory)
+    summaries = summarized["result"]
+
+    stages["extract_financial_metrics"] = metrics = measure(
+        lambda: summarizer.extract_financial_metrics(text), args.repeat, args.memory)
+    stages["format_audit_reports"] = measure(
+        lambda: format_all(text, summaries, metrics["result"]), args.repeat, args.memory)
+    stages["stream_audit_reports"] = measure(
+        lambda: stream_all(text, summaries, metrics["result"]), args.repeat, args.memory)
+
+    report = {}
+    for name, stage in stages.items():
+        p50 = percentile(stage["timings"], 50)
+        report[name] = {
+            "p50_ms": round(p50 * 1000, 3),
+            "p95_ms": round(percentile(stage["timings"], 95) * 1000, 3),
+            "pages_per_s": round(page_count / p50, 1) if p50 else None,
+            "peak_mb": round(stage["peak_bytes"] / 2**20, 2) if stage["peak_bytes"] is not None else None,
+        }
+    report["_document"] = {"characters": len(text), "chunks": len(chunks)}
+    return report
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Stages whose p50 is more than ``tolerance`` (fraction) slower than the baseline."""
+    regressions = []
+    for pages, stages in results.items():
+        for name, row in stages.items():
+            before = baseline.get(pages, {}).get(name, {}).get("p50_ms")
+            if name.startswith("_") or not before:
+                continue
+            if row["p50_ms"] > before * (1 + tolerance):
+                regressions.append(f"{pages} pages / {name}: {before:.1f} ms -> {row['p50_ms']:.1f} ms "
+                                   f"(+{(row['p50_ms'] / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark over synthetic audit reports")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000], help="document sizes to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--seed", type=int, default=42, help="corpus seed")
+    parser.add_argument("--chunk-tokens", type=int, default=summarizer.DEFAULT_CHUNK_TOKENS)
+    parser.add_argument("--workers", type=int, default=summarizer.SUMMARY_MAX_WORKERS,
+                        help="concurrent chunk summaries")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean fake LLM latency in seconds")
+    parser.add_argument("--output-tokens", type=int, default=120, help="words per fake LLM reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected 503")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the tracemalloc pass (it slows each stage down)")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare p50s against an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown vs baseline")
+    args = parser.parse_args()
+
+    summarizer.set_client(FakeGeminiClient(latency=args.latency, output_tokens=args.output_tokens,
+                                           error_rate=args.error_rate, seed=args.seed))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for page_count in args.pages:
+            report = bench_document(page_count, args, workdir)
+            results[str(page_count)] = report
+            doc = report["_document"]
+            print(f"\n{page_count} pages ({doc['characters']:,} chars, {doc['chunks']} chunks)")
+            print(f"  {'stage':<28}{'p50 ms':>10}{'p95 ms':>10}{'pages/s':>10}{'peak MB':>10}")
+            for name, row in report.items():
+                if name.startswith("_"):
+                    continue
+                peak = f"{row['peak_mb']:.2f}" if row["peak_mb"] is not None else "-"
+                print(f"  {name:<28}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['pages_per_s']:>10}{peak:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# rate_limit.py - exercise the request governor against the local fake Gemini client
+#
+# Usage (from the "AI report" directory):
+#     python benchmarks/rate_limit.py [--calls 200] [--quota 20] [--window 1.0]
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import FakeGeminiClient
+from rate_limiter import RequestGovernor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Governor behaviour under an injected quota and random 429s")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32, help="callers competing for the governor")
+    parser.add_argument("--quota", type=int, default=20, help="requests the fake server admits per window")
+    parser.add_argument("--window", type=float, default=1.0, help="quota window in seconds")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean fake call latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="probability of a random 429")
+    args = parser.parse_args()
+
+    client = FakeGeminiClient(latency=args.latency, quota_requests=args.quota, quota_window=args.window,
+                              rate_limit_rate=args.error_rate, retry_delay=args.window / 2)
+    governor = RequestGovernor(max_concurrency=args.threads, base_delay=0.1, max_delay=5.0, max_retries=20,
+                               decrease_interval=args.window)
+    limits = []
+
+    def one_call(i):
+        result = governor.call(lambda: client.models.generate_content(model="fake", contents="x" * (i + 1)))
+        limits.append(governor.stats()["concurrency_limit"])
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(one_call, range(args.calls)))
+    elapsed = time.perf_counter() - start
+
+    stats = governor.stats()
+    print(f"calls: {args.calls}  elapsed: {elapsed:.1f}s  throughput: {args.calls / elapsed:.1f}/s "
+          f"(quota {args.quota / args.window:.1f}/s)")
+    print(f"server rejections: {client.rejected}  retries: {stats['retries']}  failed: {stats['failed']}")
+    step = max(1, len(limits) // 10)
+    print("concurrency limit over time:", " ".join(str(limit) for limit in limits[::step]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# startup.py - measure cold import cost of the summarizer modules
+#
+# Usage (from the "AI report" directory):
+#     python benchmarks/startup.py [--runs 10]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each scenario runs in a fresh interpreter so nothing is already imported
+SCENARIOS = {
+    "python (baseline)": "pass",
+    "import summarizer": "import summarizer",
+    "chunk_text only": "import summarizer; summarizer.chunk_text('Audit finding. ' * 2000)",
+    "import pipeline": "import pipeline",
+    "import summarizer + client": "import summarizer; summarizer.get_client()",
+}
+
+
+def time_scenario(code: str, runs: int) -> list:
+    env = dict(os.environ, GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "benchmark-placeholder-key"))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, env=env, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def slowest_imports(module: str, limit: int = 10) -> list:
+    """Top modules by cumulative import time, from ``python -X importtime``."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=APP_DIR, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the audit summarizer")
+    parser.add_argument("--runs", type=int, default=10, help="interpreter launches per scenario")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<30}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for name, code in SCENARIOS.items():
+        timings = time_scenario(code, args.runs)
+        print(f"{name:<30}{statistics.median(timings):>12.1f}{min(timings):>10.1f}{max(timings):>10.1f}")
+
+    print("\nSlowest imports under 'import summarizer' (cumulative):")
+    for cumulative_us, name in slowest_imports("summarizer"):
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
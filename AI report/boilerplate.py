@@ -0,0 +1,225 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from summarizer import count_tokens
+
+# -----------------------------
+# Repeated-line removal
+# -----------------------------
+# Running headers, footers and disclaimers repeat on most pages of an audit PDF.
+# A line is boilerplate when it appears on at least BOILERPLATE_PAGE_FRACTION of
+# the pages (and on BOILERPLATE_MIN_PAGES or more). Its first occurrence is kept
+# so the report still names the entity once; the rest are dropped.
+
+BOILERPLATE_PAGE_FRACTION = 0.4
+BOILERPLATE_MIN_PAGES = 3
+# Lines this close to the top or bottom of a page are compared with their digits
+# masked, so "Page 3 of 60" and "Page 4 of 60" count as the same footer
+EDGE_LINES = 3
+# Interior lines must repeat exactly and be at least this long to count; short
+# ones ("Total", "Revenue") are usually table labels, not boilerplate
+MIN_INTERIOR_LINE_CHARS = 20
+
+_DIGITS = re.compile(r"\d+")
+_LETTER = re.compile(r"[^\W\d_]")
+
+
+@dataclass
+class CleanedText:
+    """
+    Text with repeated lines removed; ``removed_lines`` lists each distinct line
+    once and ``page_offsets`` gives the pages' ``(char_offset, page_number)`` in
+    the cleaned text.
+    """
+    text: str
+    removed_lines: List[str] = field(default_factory=list)
+    lines_removed: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    page_offsets: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split()).lower()
+
+
+def _line_keys(lines: List[str], index: int) -> List[Tuple[str, str]]:
+    """Keys under which line ``index`` of a page is counted."""
+    normalized = _normalize(lines[index])
+    if not normalized:
+        return []
+    keys = []
+    if index < EDGE_LINES or index >= len(lines) - EDGE_LINES:
+        keys.append(("edge", _DIGITS.sub("#", normalized)))
+    if len(normalized) >= MIN_INTERIOR_LINE_CHARS and _LETTER.search(normalized):
+        keys.append(("line", normalized))
+    return keys
+
+
+def split_pages(text: str, page_offsets: Optional[List[Tuple[int, int]]] = None) -> List[str]:
+    """Page texts from ``join_pages`` offsets, or form feeds when there are none (TXT files)."""
+    if page_offsets:
+        starts = [offset for offset, _ in page_offsets] + [len(text)]
+        return [text[starts[i]:starts[i + 1]] for i in range(len(page_offsets))]
+    return text.split("\f")
+
+
+def _content_lines(lines: List[str]) -> List[int]:
+    """Indices of a page's non-blank lines; edges are counted among these."""
+    return [i for i, line in enumerate(lines) if line.strip()]
+
+
+def find_repeated_lines(pages: List[List[str]]) -> set:
+    """Keys of lines repeated on enough pages to be boilerplate."""
+    threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_FRACTION * len(pages))
+    page_counts: Dict[Tuple[str, str], int] = {}
+    for lines in pages:
+        content = [lines[i] for i in _content_lines(lines)]
+        seen = set()
+        for index in range(len(content)):
+            seen.update(_line_keys(content, index))
+        for key in seen:
+            page_counts[key] = page_counts.get(key, 0) + 1
+    return {key for key, count in page_counts.items() if count >= threshold}
+
+
+def strip_boilerplate(text: str, page_offsets: Optional[List[Tuple[int, int]]] = None) -> CleanedText:
+    """
+    Remove lines repeated across pages, keeping each one's first occurrence.
+
+    Documents with fewer than BOILERPLATE_MIN_PAGES pages are returned unchanged.
+    """
+    tokens_before = count_tokens(text)
+    pages = [page.split("\n") for page in split_pages(text, page_offsets)]
+    if len(pages) < BOILERPLATE_MIN_PAGES:
+        return CleanedText(text, tokens_before=tokens_before, tokens_after=tokens_before,
+                           page_offsets=list(page_offsets or []))
+
+    repeated = find_repeated_lines(pages)
+    if not repeated:
+        return CleanedText(text, tokens_before=tokens_before, tokens_after=tokens_before,
+                           page_offsets=list(page_offsets or []))
+
+    kept_once = set()
+    removed_lines = []
+    lines_removed = 0
+    cleaned_pages = []
+    for lines in pages:
+        content = _content_lines(lines)
+        content_lines = [lines[i] for i in content]
+        drop = set()
+        for position, index in enumerate(content):
+            keys = [key for key in _line_keys(content_lines, position) if key in repeated]
+            if not keys:
+                continue
+            if not any(key in kept_once for key in keys):
+                kept_once.update(keys)
+                removed_lines.append(lines[index].strip())
+                continue
+            kept_once.update(keys)
+            drop.add(index)
+        lines_removed += len(drop)
+        cleaned_pages.append("\n".join(line for i, line in enumerate(lines) if i not in drop))
+
+    separator = "" if page_offsets else "\f"
+    cleaned = separator.join(cleaned_pages)
+    cleaned_offsets = []
+    if page_offsets:
+        position = 0
+        for (_, page_number), page in zip(page_offsets, cleaned_pages):
+            cleaned_offsets.append((position, page_number))
+            position += len(page)
+    return CleanedText(cleaned, removed_lines=removed_lines, lines_removed=lines_removed,
+                       tokens_before=tokens_before, tokens_after=count_tokens(cleaned),
+                       page_offsets=cleaned_offsets)
+
+
+# -----------------------------
+# Near-duplicate chunks
+# -----------------------------
+# Chunks are compared by 64-bit SimHash over word 3-shingles. Two chunks whose
+# hashes differ in at most NEAR_DUPLICATE_BITS bits share one summary. Digits are
+# kept in the shingles, so sections that differ only in their figures are not merged.
+
+SIMHASH_BITS = 64
+NEAR_DUPLICATE_BITS = 3
+SHINGLE_WORDS = 3
+# Below this many shingles a SimHash says little about similarity
+MIN_SHINGLES = 24
+# LSH bands: with at most NEAR_DUPLICATE_BITS differing bits, some band is identical
+_BANDS = NEAR_DUPLICATE_BITS + 1
+_BAND_BITS = SIMHASH_BITS // _BANDS
+
+_WORD = re.compile(r"\w+")
+
+
+def simhash(text: str) -> Optional[int]:
+    """SimHash of the text's word shingles, or None when the text is too short to compare."""
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    bits = [format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+            for shingle in shingles]
+    # Transpose to one column per bit and take the majority in each
+    half = len(bits) / 2
+    value = 0
+    for column in zip(*bits):
+        value = (value << 1) | (column.count("1") > half)
+    return value
+
+
+def cluster_near_duplicates(chunks: List[str], max_distance: int = NEAR_DUPLICATE_BITS) -> List[int]:
+    """
+    For each chunk, the index of the chunk that represents its cluster (itself
+    unless it nearly duplicates an earlier chunk).
+    """
+    representative = list(range(len(chunks)))
+    exact: Dict[str, int] = {}
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    hashes: Dict[int, int] = {}
+    mask = (1 << _BAND_BITS) - 1
+    for i, chunk in enumerate(chunks):
+        normalized = " ".join(chunk.split())
+        if normalized in exact:
+            representative[i] = exact[normalized]
+            continue
+        exact[normalized] = i
+
+        value = simhash(chunk)
+        if value is None:
+            continue
+        # Only representatives are bucketed, so clusters never chain
+        bands = [(band, (value >> (band * _BAND_BITS)) & mask) for band in range(_BANDS)]
+        match = next((j for key in bands for j in buckets.get(key, ())
+                      if bin(value ^ hashes[j]).count("1") <= max_distance), None)
+        if match is not None:
+            representative[i] = match
+            continue
+        hashes[i] = value
+        for key in bands:
+            buckets.setdefault(key, []).append(i)
+    return representative
+
+
+def dedup_report(cleaned: Optional[CleanedText], chunks: List[str], clusters: List[int]) -> Dict[str, Any]:
+    """Tokens kept out of the chunk prompts by boilerplate removal and near-duplicate clustering."""
+    duplicates = [i for i, rep in enumerate(clusters) if rep != i]
+    duplicate_tokens = sum(count_tokens(chunks[i]) for i in duplicates)
+    boilerplate_tokens = cleaned.tokens_saved if cleaned else 0
+    return {
+        "boilerplate_lines": len(cleaned.removed_lines) if cleaned else 0,
+        "boilerplate_occurrences_removed": cleaned.lines_removed if cleaned else 0,
+        "boilerplate_tokens_saved": boilerplate_tokens,
+        "duplicate_chunks": len(duplicates),
+        "duplicate_clusters": len({clusters[i] for i in duplicates}),
+        "duplicate_tokens_saved": duplicate_tokens,
+        "tokens_saved": boilerplate_tokens + duplicate_tokens,
+        "removed_lines": cleaned.removed_lines[:20] if cleaned else [],
+    }
@@ -0,0 +1,249 @@
+import io
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from financial_figures import FigureTable
+from summarizer import count_tokens
+
+# -----------------------------
+# Per-chunk export
+# -----------------------------
+# One row per chunk: where it sits in the document, how large it is, its
+# summary, the figures it mentions and a risk label. Rows go to JSON Lines or
+# to Apache Parquet, so a warehouse can load a quarter of reports with one
+# columnar read instead of parsing a JSON report per document.
+
+CHUNK_FORMATS = ("jsonl", "parquet")
+
+# Batch output directories, one file per document in each; a directory reads
+# back as a single dataset
+CHUNKS_JSONL_DIR = "chunks_jsonl"
+CHUNKS_PARQUET_DIR = "chunks_parquet"
+
+# Largest Parquet row group, in rows
+PARQUET_ROW_GROUP_ROWS = 10_000
+PARQUET_COMPRESSION = "zstd"
+
+# Column name and Arrow type, in file order
+CHUNK_COLUMNS = [
+    ("document", "string"),
+    ("document_sha256", "string"),
+    ("generated_at", "timestamp"),
+    ("chunk_index", "int32"),
+    ("char_start", "int64"),
+    ("char_end", "int64"),
+    ("page_start", "int32"),
+    ("page_end", "int32"),
+    ("chunk_tokens", "int32"),
+    ("summary_tokens", "int32"),
+    ("summary", "string"),
+    ("figures", "list<string>"),
+    ("figure_count", "int32"),
+    ("risk_label", "string"),
+]
+
+# -----------------------------
+# Risk labels
+# -----------------------------
+# A local keyword classifier, so labelling costs no model calls. The highest
+# level with a match wins; a match preceded closely by a negation ("no material
+# weakness was identified") does not count.
+
+RISK_LEVELS = ("none", "low", "medium", "high")
+
+_RISK_PATTERNS = {
+    "high": re.compile(r"\b(?:material weakness(?:es)?|fraud\w*|going concern|restate(?:d|ment)s?"
+                       r"|(?:adverse|qualified) opinion|disclaimer of opinion|high[- ]risk"
+                       r"|significant deficienc(?:y|ies)|non-?compliance|illegal acts?)\b", re.IGNORECASE),
+    "medium": re.compile(r"\b(?:misstatements?|exceptions?|(?:medium|moderate)[- ]risk|deficienc(?:y|ies)"
+                         r"|weakness(?:es)?|violations?|breach(?:es)?)\b", re.IGNORECASE),
+    "low": re.compile(r"\b(?:recommend(?:s|ed|ations?)?|minor|observations?|low[- ]risk"
+                      r"|improvement opportunit(?:y|ies))\b", re.IGNORECASE),
+}
+_NEGATION = re.compile(r"\b(?:no|not|without|nor|never|absence of)\b[^.;:\n]*$", re.IGNORECASE)
+NEGATION_WINDOW = 30
+
+
+def classify_risk(text: str) -> str:
+    """``high``, ``medium``, ``low`` or ``none`` for a chunk or its summary."""
+    for level in ("high", "medium", "low"):
+        for match in _RISK_PATTERNS[level].finditer(text):
+            if not _NEGATION.search(text, max(0, match.start() - NEGATION_WINDOW), match.start()):
+                return level
+    return "none"
+
+
+def _higher_risk(*labels: str) -> str:
+    return max(labels, key=RISK_LEVELS.index)
+
+
+# -----------------------------
+# Chunk statistics
+# -----------------------------
+
+def _page_at(starts: List[int], page_offsets: List[Tuple[int, int]], position: int) -> Optional[int]:
+    index = bisect_right(starts, position) - 1
+    return page_offsets[index][1] if index >= 0 else None
+
+
+def chunk_stats(chunks: List[str], spans: List[Tuple[int, int]],
+                page_offsets: Optional[List[Tuple[int, int]]] = None,
+                figures: Optional[FigureTable] = None) -> List[Dict[str, Any]]:
+    """
+    Position, size, figures and text risk of each chunk.
+
+    ``spans`` are the chunks' character spans (``chunk_text_spans``) and
+    ``page_offsets`` the pages of the same text; page numbers are None without them.
+    ``figures`` is the figure table of that text (``scan_text``): a chunk lists
+    the figures starting inside its span, found by bisecting the table's offsets.
+    """
+    starts = [offset for offset, _ in page_offsets or []]
+    stats = []
+    for chunk, (start, end) in zip(chunks, spans):
+        first = bisect_left(figures.offsets, start) if figures is not None else 0
+        last = bisect_left(figures.offsets, end) if figures is not None else 0
+        stats.append({
+            "char_start": start,
+            "char_end": end,
+            "page_start": _page_at(starts, page_offsets, start) if starts else None,
+            "page_end": _page_at(starts, page_offsets, max(start, end - 1)) if starts else None,
+            "chunk_tokens": count_tokens(chunk),
+            "figures": [figures.raw(i) for i in range(first, last)],
+            "text_risk": classify_risk(chunk),
+        })
+    return stats
+
+
+def chunk_rows(results: Dict[str, Any], filename: str, document_sha256: Optional[str] = None,
+               generated_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Export rows for an analysis result, in CHUNK_COLUMNS order. Results saved
+    before chunk statistics were recorded have no rows.
+    """
+    generated_at = (generated_at or datetime.now()).replace(microsecond=0)
+    rows = []
+    for index, (stats, summary) in enumerate(zip(results.get("chunk_stats") or [], results["summaries"])):
+        rows.append({
+            "document": filename,
+            "document_sha256": document_sha256,
+            "generated_at": generated_at,
+            "chunk_index": index,
+            "char_start": stats["char_start"],
+            "char_end": stats["char_end"],
+            "page_start": stats["page_start"],
+            "page_end": stats["page_end"],
+            "chunk_tokens": stats["chunk_tokens"],
+            "summary_tokens": count_tokens(summary),
+            "summary": summary,
+            "figures": stats["figures"],
+            "figure_count": len(stats["figures"]),
+            "risk_label": _higher_risk(stats["text_risk"], classify_risk(summary)),
+        })
+    return rows
+
+
+# -----------------------------
+# JSON Lines
+# -----------------------------
+
+def iter_jsonl(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({**row, "generated_at": row["generated_at"].isoformat()}, ensure_ascii=False) + "\n"
+
+
+def jsonl_bytes(rows: List[Dict[str, Any]]) -> bytes:
+    return "".join(iter_jsonl(rows)).encode("utf-8")
+
+
+# -----------------------------
+# Parquet
+# -----------------------------
+
+def parquet_available() -> bool:
+    """Whether pyarrow is installed, checked without importing it."""
+    return find_spec("pyarrow") is not None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow. Install it with `pip install pyarrow`.") from e
+    return pyarrow, pyarrow.parquet
+
+
+def chunk_schema():
+    """The Arrow schema of CHUNK_COLUMNS."""
+    pa, _ = _pyarrow()
+    types = {"string": pa.string(), "int32": pa.int32(), "int64": pa.int64(), "timestamp": pa.timestamp("s"),
+             "list<string>": pa.list_(pa.string())}
+    return pa.schema([(name, types[type_name]) for name, type_name in CHUNK_COLUMNS])
+
+
+def parquet_bytes(rows: List[Dict[str, Any]]) -> bytes:
+    pa, pq = _pyarrow()
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pylist(rows, schema=chunk_schema()), buffer, compression=PARQUET_COMPRESSION)
+    return buffer.getvalue()
+
+
+def read_chunk_table(source: Union[str, Iterable[str]], columns: Optional[List[str]] = None, where=None):
+    """
+    Read chunk rows from Parquet files or directories (e.g. a quarter of batch
+    ``chunks_parquet`` directories) as one Arrow table. ``where`` is a
+    ``pyarrow.dataset`` expression, pushed down to the row groups.
+    """
+    _pyarrow()
+    import pyarrow.dataset as ds
+    sources = [source] if isinstance(source, (str, os.PathLike)) else list(source)
+    schema = chunk_schema()
+    dataset = ds.dataset([ds.dataset(path, schema=schema, format="parquet") for path in sources], schema=schema)
+    return dataset.to_table(columns=columns, filter=where)
+
+
+# -----------------------------
+# Batch output
+# -----------------------------
+# Each document's rows go to a file of their own per format, named by content
+# hash and analysis options. Reprocessing a document (``--force``, a retry
+# after a crash) replaces its file instead of adding rows again, and a file
+# that exists holds all of its document's rows, so the batch resume check can
+# look for it like it looks for the reports.
+
+CHUNK_OUTPUT_DIRS = {"jsonl": CHUNKS_JSONL_DIR, "parquet": CHUNKS_PARQUET_DIR}
+
+
+def chunk_output_path(directory: str, fmt: str, document_sha256: str, options_hash: str) -> str:
+    return os.path.join(directory, CHUNK_OUTPUT_DIRS[fmt], f"{document_sha256[:16]}-{options_hash}.{fmt}")
+
+
+def write_chunk_file(path: str, fmt: str, rows: List[Dict[str, Any]]) -> None:
+    """
+    Write one document's rows as ``fmt`` to ``path``. The rows go to a hidden
+    temporary file (dataset readers skip names starting with ".") that is
+    synced to disk before it is renamed, so ``path`` is complete once it exists.
+    """
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    try:
+        if fmt == "jsonl":
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(iter_jsonl(rows))
+        else:
+            pa, pq = _pyarrow()
+            pq.write_table(pa.Table.from_pylist(rows, schema=chunk_schema()), tmp_path,
+                           compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_ROWS)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
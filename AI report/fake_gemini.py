@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+# -----------------------------
+# Local stand-in for google-genai's Client
+# -----------------------------
+
+# Vocabulary for generated replies; audit-flavoured so downstream parsing sees realistic text
+_WORDS = (
+    "audit finding control deficiency revenue recognition material weakness compliance "
+    "management response recommendation reconciliation inventory valuation impairment "
+    "liquidity covenant disclosure internal risk assessment segregation duties approval "
+    "policy procurement payroll access review remediation timeline significant moderate low"
+).split()
+
+
+class FakeAPIError(Exception):
+    """Mimics google.genai.errors.APIError: ``code``, ``status`` and ``details``."""
+
+    def __init__(self, code: int, message: str, retry_delay: Optional[float] = None):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.status = "RESOURCE_EXHAUSTED" if code == 429 else "UNAVAILABLE"
+        details = []
+        if retry_delay is not None:
+            details.append({"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_delay:g}s"})
+        self.details = {"error": {"code": code, "message": message, "status": self.status, "details": details}}
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGeminiClient"):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents: str, config: Optional[Dict[str, Any]] = None) -> FakeResponse:
+        self._owner._admit()
+        text = self._owner._reply(contents, config)
+        time.sleep(self._owner._latency(text))
+        return FakeResponse(text, self._owner._usage(contents, text))
+
+    def generate_content_stream(self, model: str, contents: str,
+                                config: Optional[Dict[str, Any]] = None) -> Iterator[FakeResponse]:
+        self._owner._admit()
+        text = self._owner._reply(contents, config)
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)] or [""]
+        delay = self._owner._latency(text) / len(pieces)
+        for i, piece in enumerate(pieces):
+            time.sleep(delay)
+            usage = self._owner._usage(contents, text) if i == len(pieces) - 1 else None
+            yield FakeResponse(piece, usage)
+
+
+class FakeGeminiClient:
+    """
+    Drop-in for ``genai.Client`` that never touches the network.
+
+    Replies are a deterministic function of the prompt (and the JSON response
+    schema, when one is requested), about ``output_tokens`` words long.
+    ``latency`` is the mean seconds per call plus ``seconds_per_output_token``
+    per word generated. ``error_rate`` injects 503s and ``rate_limit_rate``
+    injects 429s; ``quota_requests`` per ``quota_window`` seconds simulates the
+    server-side quota (429 with a retry hint once exceeded).
+    """
+
+    # Keeps fake replies out of Gemini's entries in the response cache
+    backend_name = "fake"
+
+    def __init__(self, latency: float = 0.05, output_tokens: int = 120, seconds_per_output_token: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, quota_requests: Optional[int] = None,
+                 quota_window: float = 60.0, retry_delay: float = 1.0, seed: Optional[int] = 0):
+        self.latency = latency
+        self.output_tokens = output_tokens
+        self.seconds_per_output_token = seconds_per_output_token
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota_requests = quota_requests
+        self.quota_window = quota_window
+        self.retry_delay = retry_delay
+        self.models = _FakeModels(self)
+        self.calls = 0
+        self.rejected = 0
+        self._random = random.Random(seed)
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeGeminiClient":
+        """Configure from FAKE_LLM_LATENCY, FAKE_LLM_OUTPUT_TOKENS, FAKE_LLM_ERROR_RATE and FAKE_LLM_RATE_LIMIT_RATE."""
+        return cls(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.05")),
+            output_tokens=int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "120")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0")),
+        )
+
+    def _admit(self) -> None:
+        """Count the call against the quota, raising 429/503 like the real API."""
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._window and now - self._window[0] > self.quota_window:
+                self._window.popleft()
+            over_quota = self.quota_requests is not None and len(self._window) >= self.quota_requests
+            if over_quota or self._random.random() < self.rate_limit_rate:
+                self.rejected += 1
+                raise FakeAPIError(429, "Resource has been exhausted (e.g. check quota).", self.retry_delay)
+            if self._random.random() < self.error_rate:
+                self.rejected += 1
+                raise FakeAPIError(503, "The model is overloaded. Please try again later.")
+            self._window.append(now)
+
+    def _latency(self, text: str) -> float:
+        with self._lock:
+            jitter = self._random.uniform(0.5, 1.5)
+        return jitter * self.latency + len(text.split()) * self.seconds_per_output_token
+
+    def _usage(self, contents: str, text: str) -> FakeUsage:
+        return FakeUsage(-(-len(contents) // 4), len(text.split()))
+
+    def _reply(self, contents: str, config: Optional[Dict[str, Any]] = None) -> str:
+        seed = int.from_bytes(hashlib.sha256(contents.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        schema = (config or {}).get("response_schema")
+        if schema and (config or {}).get("response_mime_type") == "application/json":
+            return json.dumps(_value_for_schema(schema, rng, self.output_tokens))
+        return _sentences(rng, self.output_tokens)
+
+
+def _sentences(rng: random.Random, words: int) -> str:
+    out: List[str] = []
+    while len(out) < words:
+        sentence = [rng.choice(_WORDS) for _ in range(rng.randint(8, 16))]
+        sentence[0] = sentence[0].capitalize()
+        out.extend(sentence)
+        out[-1] += "."
+    return " ".join(out[:max(words, 1)])
+
+
+def _value_for_schema(schema: Dict[str, Any], rng: random.Random, budget: int) -> Any:
+    """Generate a value matching an OpenAPI-style response schema."""
+    kind = schema.get("type", "STRING").upper()
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if kind == "OBJECT":
+        properties = schema.get("properties", {})
+        share = max(8, budget // max(len(properties), 1))
+        return {name: _value_for_schema(sub, rng, share) for name, sub in properties.items()}
+    if kind == "ARRAY":
+        count = rng.randint(1, 4)
+        return [_value_for_schema(schema.get("items", {}), rng, max(8, budget // count)) for _ in range(count)]
+    if kind in ("INTEGER", "NUMBER"):
+        return rng.randint(0, 100)
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    return _sentences(rng, min(budget, 60))
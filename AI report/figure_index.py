@@ -0,0 +1,187 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from financial_figures import (
+    CATEGORIES,
+    CONTEXT_AFTER,
+    CONTEXT_BEFORE,
+    CURRENCIES,
+    KINDS,
+    VALUE_PLACES,
+    FigureTable,
+)
+
+# -----------------------------
+# Figure index
+# -----------------------------
+# Built once per document from a FigureTable (and the text it was scanned from);
+# queries then only touch the index arrays, never the text.
+
+# Words recorded around each figure: letters, at least three of them
+_WORD_PATTERN = re.compile(r"[a-z][a-z'-]{2,}")
+
+
+def _fixed(value: Union[int, float, str, Decimal], rounding: str) -> int:
+    """A query bound in the table's fixed-point units, rounded so the bound stays inclusive."""
+    return int((Decimal(str(value)).scaleb(VALUE_PLACES)).to_integral_value(rounding=rounding))
+
+
+def _normalize_words(keywords: Union[str, Iterable[str], None]) -> List[str]:
+    if not keywords:
+        return []
+    if isinstance(keywords, str):
+        keywords = keywords.split()
+    return [word for keyword in keywords for word in _WORD_PATTERN.findall(keyword.lower())]
+
+
+class FigureIndex:
+    """
+    Query extracted figures by value range, nearby words and page range.
+
+    - values: per kind, figure ids sorted by value, searched by bisection
+    - words: inverted index from each word within the classification window
+      (CONTEXT_BEFORE/CONTEXT_AFTER characters) to the ids of nearby figures
+    - pages: figures are stored in document order, so a page range is one
+      contiguous id range found by bisection
+
+    ``query`` starts from whichever of these yields the fewest candidates and
+    checks the remaining conditions against the table columns.
+    """
+
+    def __init__(self, table: FigureTable, text: Optional[str] = None):
+        self.table = table
+        self.text = text
+
+        self._sorted_ids: Dict[int, array] = {}
+        self._sorted_values: Dict[int, array] = {}
+        for kind in range(len(KINDS)):
+            ids = sorted((i for i in range(len(table)) if table.kinds[i] == kind), key=table.values.__getitem__)
+            self._sorted_ids[kind] = array("I", ids)
+            self._sorted_values[kind] = array("q", (table.values[i] for i in ids))
+
+        # Pages are non-decreasing when the table was scanned in document order
+        pages = table.pages
+        self._page_ordered = all(pages[i] <= pages[i + 1] for i in range(len(pages) - 1))
+
+        self._postings: Dict[str, array] = {}
+        if text is not None:
+            lowered = text.lower()
+            # A few characters lower-case to two; then lower each window instead so offsets stay aligned
+            aligned = len(lowered) == len(text)
+            for i in range(len(table)):
+                start = table.offsets[i]
+                end = start + len(table.raw(i)) + CONTEXT_AFTER
+                window = lowered[max(0, start - CONTEXT_BEFORE):end] if aligned \
+                    else text[max(0, start - CONTEXT_BEFORE):end].lower()
+                for word in set(_WORD_PATTERN.findall(window)):
+                    self._postings.setdefault(word, array("I")).append(i)
+
+    # -- candidate sources ------------------------------------------------
+
+    def _value_candidates(self, kind: Optional[int], low: Optional[int], high: Optional[int]) -> List[Sequence[int]]:
+        kinds = [kind] if kind is not None else range(len(KINDS))
+        ranges = []
+        for k in kinds:
+            values = self._sorted_values[k]
+            start = bisect_left(values, low) if low is not None else 0
+            stop = bisect_right(values, high) if high is not None else len(values)
+            ranges.append(self._sorted_ids[k][start:stop])
+        return ranges
+
+    def _page_range(self, first: int, last: int) -> range:
+        if not self._page_ordered:
+            return range(len(self.table))  # fall back to checking every figure's page
+        return range(bisect_left(self.table.pages, first), bisect_right(self.table.pages, last))
+
+    # -- queries ------------------------------------------------------------
+
+    def query(self, kind: Optional[str] = None, category: Optional[str] = None, currency: Optional[str] = None,
+              min_value=None, max_value=None, pages: Optional[Tuple[int, int]] = None,
+              near: Union[str, Iterable[str], None] = None, limit: Optional[int] = None) -> List[int]:
+        """
+        Ids of matching figures in document order.
+
+        ``min_value``/``max_value`` are inclusive, in the figure's own units
+        (dollars, percent, ratio value). ``pages`` is an inclusive ``(first, last)``.
+        ``near`` requires every given word within the context window of the figure.
+        """
+        table = self.table
+        kind_code = KINDS.index(kind) if kind else None
+        category_code = CATEGORIES.index(category) if category else None
+        currency_code = CURRENCIES.index(currency) if currency else None
+        low = _fixed(min_value, ROUND_CEILING) if min_value is not None else None
+        high = _fixed(max_value, ROUND_FLOOR) if max_value is not None else None
+        words = _normalize_words(near)
+
+        # Each candidate source is a list of id sequences; pick the smallest
+        sources = []
+        if words:
+            postings = [self._postings.get(word, array("I")) for word in words]
+            sources.append(("words", [min(postings, key=len)]))
+        if pages is not None:
+            sources.append(("pages", [self._page_range(*pages)]))
+        if low is not None or high is not None or kind_code is not None:
+            sources.append(("values", self._value_candidates(kind_code, low, high)))
+        if not sources:
+            sources.append(("all", [range(len(table))]))
+        source, candidates = min(sources, key=lambda item: sum(len(ids) for ids in item[1]))
+
+        word_postings = [self._postings.get(word, array("I")) for word in words]
+        matches = []
+        for ids in candidates:
+            for i in ids:
+                if kind_code is not None and table.kinds[i] != kind_code:
+                    continue
+                if category_code is not None and table.categories[i] != category_code:
+                    continue
+                if currency_code is not None and table.currencies[i] != currency_code:
+                    continue
+                value = table.values[i]
+                if (low is not None and value < low) or (high is not None and value > high):
+                    continue
+                if pages is not None and not pages[0] <= table.pages[i] <= pages[1]:
+                    continue
+                if any(not _contains(posting, i) for posting in word_postings):
+                    continue
+                matches.append(i)
+        if source == "values":
+            matches.sort()  # value order -> document order
+        return matches[:limit] if limit is not None else matches
+
+    def page_span(self) -> Tuple[int, int]:
+        """First and last page with a figure, or (0, 0) when pages are unknown."""
+        if not len(self.table):
+            return 0, 0
+        return min(self.table.pages), max(self.table.pages)
+
+    def context(self, i: int, width: int = 60) -> str:
+        """Text around figure ``i`` on one line, if the index was built with the text."""
+        if self.text is None:
+            return ""
+        start = self.table.offsets[i]
+        end = start + len(self.table.raw(i))
+        return " ".join(self.text[max(0, start - width):end + width].split())
+
+    def rows(self, ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Table-friendly records for ``ids``."""
+        rows = []
+        for i in ids:
+            figure = self.table[i]
+            rows.append({
+                "page": figure.page,
+                "kind": figure.kind,
+                "category": figure.category,
+                "value": float(figure.value),
+                "currency": figure.currency,
+                "figure": " ".join(figure.raw.split()),
+                "context": self.context(i),
+            })
+        return rows
+
+
+def _contains(sorted_ids: array, i: int) -> bool:
+    position = bisect_left(sorted_ids, i)
+    return position < len(sorted_ids) and sorted_ids[position] == i
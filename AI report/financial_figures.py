@@ -0,0 +1,337 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# -----------------------------
+# Figure vocabulary
+# -----------------------------
+# Small integer codes so a table of figures can live in flat arrays
+
+KINDS = ("money", "percentage", "ratio")
+CATEGORIES = ("revenue", "expenses", "assets", "liabilities", "other")
+CURRENCIES = ("", "USD", "EUR", "GBP", "JPY", "INR", "CAD", "AUD", "CHF", "CNY")
+
+MONEY, PERCENTAGE, RATIO = range(len(KINDS))
+OTHER = CATEGORIES.index("other")
+
+_SYMBOLS = {"$": "USD", "US$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR"}
+# Currency words after an amount ("3.5 million dollars"); a bare "dollar" is read as USD
+_CURRENCY_WORDS = {"dollar": "USD", "euro": "EUR", "pound": "GBP", "sterling": "GBP", "yen": "JPY", "rupee": "INR"}
+_SCALES = {"thousand": 10**3, "k": 10**3, "million": 10**6, "mn": 10**6, "m": 10**6,
+           "billion": 10**9, "bn": 10**9}
+
+# Values are stored as 64-bit fixed point with this many decimal places
+VALUE_PLACES = 4
+_VALUE_SCALE = 10 ** VALUE_PLACES
+
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_SCALE = r"(?i:thousand|million|billion|bn|mn|m|k)"
+_CODES = "|".join(CURRENCIES[1:])
+
+# Every figure type in one alternation, so a document is scanned once. The
+# leading lookahead lets the regex engine skip straight to candidate characters
+# instead of trying each branch at every position (about 6x faster). Money has
+# two branches: currency before the amount ("USD 3.4bn", "$(120)") and after
+# it ("2,000 EUR", "3.5 million dollars", "(450) EUR").
+FIGURE_PATTERN = re.compile(rf"""
+    (?=[\d(\-$€£¥₹{"".join(sorted({code[0] for code in CURRENCIES[1:]}))}])
+    (?:(?P<money>
+        (?P<open>\()?
+        (?P<sign>-)?
+        (?:(?P<symbol>US\$|[$€£¥₹])|\b(?P<code>{_CODES})\s?)
+        (?P<inner>\()?
+        (?P<amount>{_NUMBER})
+        (?:\s?(?P<scale>{_SCALE})\b)?
+        (?P<close>\))?
+    )
+    |(?P<money_after>(?<![\w.,])
+        (?P<paren>\()?
+        (?P<sign_after>-)?
+        (?P<amount_after>{_NUMBER})
+        (?:\s?(?P<scale_after>{_SCALE})\b)?
+        (?(paren)\))
+        \s?(?:(?P<code_after>{_CODES})|(?P<word>(?i:(?:pounds?\s)?sterling|(?:dollar|euro|pound|rupee)s?|yen)))\b
+    )
+    |(?P<percentage>(?<![\w.])(?P<percent>-?\d+(?:\.\d+)?)\s?(?:%|(?i:per\s?cent)\b))
+    |(?P<ratio>(?<![\w.:])(?P<lhs>\d+(?:\.\d+)?):(?P<rhs>\d+(?:\.\d+)?)(?![\d:])))
+""", re.VERBOSE)
+
+# Keywords that place a figure in a statement category; the nearest one wins.
+# Matched against lower-cased text, which is faster than re.IGNORECASE.
+_CATEGORY_KEYWORDS = r"""
+    (?=[rstiecagpldbo])\b(?:
+        (?P<revenue>revenues?|sales|turnover|income)
+        |(?P<expenses>expenses?|expenditures?|costs?|charges?|spend(?:ing)?)
+        |(?P<assets>assets?|goodwill|inventor(?:y|ies)|receivables?|cash|property|equipment)
+        |(?P<liabilities>liabilit(?:y|ies)|debts?|borrowings?|payables?|loans?|provisions?|obligations?)
+    )\b
+"""
+CATEGORY_PATTERN = re.compile(_CATEGORY_KEYWORDS, re.VERBOSE)
+_CATEGORY_PATTERN_ANY_CASE = re.compile(_CATEGORY_KEYWORDS, re.IGNORECASE | re.VERBOSE)
+_CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+# Characters around a figure searched for category keywords. Statements usually
+# name the line item first ("revenue of $5m"), so a following keyword counts as
+# this many times further away.
+CONTEXT_BEFORE = 80
+CONTEXT_AFTER = 40
+FOLLOWING_KEYWORD_WEIGHT = 3
+
+
+@dataclass(frozen=True)
+class Figure:
+    kind: str
+    category: str
+    value: Decimal
+    currency: str
+    raw: str
+    offset: int
+    page: Optional[int]
+
+
+# -----------------------------
+# Compact storage
+# -----------------------------
+
+class FigureTable:
+    """
+    Column-oriented store of extracted figures.
+
+    Each figure costs about 25 bytes across typed arrays plus its raw text in a
+    shared string, instead of a dict and several objects per match. ``page`` is
+    0 when unknown. Index with ``table[i]`` or iterate to get ``Figure`` rows.
+    """
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.categories = array("B")
+        self.currencies = array("B")
+        self.offsets = array("q")
+        self.pages = array("i")
+        self.values = array("q")  # fixed point, VALUE_PLACES decimals
+        self._raw_ends = array("I")
+        self._raw = ""
+        self._pending: List[str] = []
+        self._raw_length = 0
+
+    def append(self, kind: int, category: int, value: Decimal, currency: int, raw: str,
+               offset: int, page: Optional[int]) -> bool:
+        """Add one figure; returns False if the value is too large for fixed-point storage."""
+        try:
+            fixed = int((value * _VALUE_SCALE).to_integral_value())
+            self.values.append(fixed)
+        except OverflowError:
+            return False
+        self.kinds.append(kind)
+        self.categories.append(category)
+        self.currencies.append(currency)
+        self.offsets.append(offset)
+        self.pages.append(page or 0)
+        self._pending.append(raw)
+        self._raw_length += len(raw)
+        self._raw_ends.append(self._raw_length)
+        return True
+
+    def _raw_text(self) -> str:
+        if self._pending:
+            self._raw += "".join(self._pending)
+            self._pending.clear()
+        return self._raw
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def value(self, i: int) -> Decimal:
+        value = Decimal(self.values[i]).scaleb(-VALUE_PLACES)
+        # Drop trailing zeros without switching to exponent notation (1E+6)
+        return value.quantize(Decimal(1)) if value == value.to_integral_value() else value.normalize()
+
+    def raw(self, i: int) -> str:
+        start = self._raw_ends[i - 1] if i else 0
+        return self._raw_text()[start:self._raw_ends[i]]
+
+    def __getitem__(self, i: int) -> Figure:
+        if i < 0:
+            i += len(self)
+        return Figure(
+            kind=KINDS[self.kinds[i]],
+            category=CATEGORIES[self.categories[i]],
+            value=self.value(i),
+            currency=CURRENCIES[self.currencies[i]],
+            raw=self.raw(i),
+            offset=self.offsets[i],
+            page=self.pages[i] or None,
+        )
+
+    def __iter__(self) -> Iterator[Figure]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def count(self, kind: str) -> int:
+        return self.kinds.count(KINDS.index(kind))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns and raw text."""
+        columns = (self.kinds, self.categories, self.currencies, self.offsets, self.pages, self.values, self._raw_ends)
+        return sum(column.itemsize * len(column) for column in columns) + len(self._raw_text())
+
+
+# -----------------------------
+# Scanning
+# -----------------------------
+
+def _decimal(number: str) -> Decimal:
+    return Decimal(number.replace(",", ""))
+
+
+class KeywordPositions:
+    """Category keywords of one text segment, found in a single pass and searched by bisection."""
+
+    def __init__(self, text: str):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.codes = array("B")
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            matches = CATEGORY_PATTERN.finditer(lowered)
+        else:
+            # A few characters lower-case to two, which would shift offsets
+            matches = _CATEGORY_PATTERN_ANY_CASE.finditer(text)
+        for match in matches:
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+            self.codes.append(_CATEGORY_CODES[match.lastgroup])
+
+    def classify(self, start: int, end: int) -> int:
+        """Category code of the keyword nearest to ``text[start:end]``, or ``other``."""
+        best, best_distance = OTHER, None
+        before = bisect_right(self.ends, start) - 1
+        if before >= 0 and start - self.ends[before] <= CONTEXT_BEFORE:
+            best, best_distance = self.codes[before], start - self.ends[before]
+        after = bisect_left(self.starts, end)
+        if after < len(self.starts) and self.starts[after] - end <= CONTEXT_AFTER:
+            distance = (self.starts[after] - end) * FOLLOWING_KEYWORD_WEIGHT
+            if best_distance is None or distance < best_distance:
+                best = self.codes[after]
+        return best
+
+
+def parse_figure(match: "re.Match") -> Tuple[int, Decimal, int, int, int]:
+    """
+    ``(kind, value, currency, start, end)`` for a FIGURE_PATTERN match; the span
+    leaves out a bracket that is not part of a ``(negative)`` pair.
+    """
+    start, end = match.span()
+    if match.group("money_after"):
+        value = _decimal(match.group("amount_after"))
+        scale = match.group("scale_after")
+        if scale:
+            value *= _SCALES[scale.lower()]
+        if match.group("paren") or match.group("sign_after"):
+            value = -value
+        word = match.group("word")
+        currency = match.group("code_after") or _CURRENCY_WORDS[word.lower().split()[-1].rstrip("s")]
+        return MONEY, value, CURRENCIES.index(currency), start, end
+    if match.group("money"):
+        value = _decimal(match.group("amount"))
+        scale = match.group("scale")
+        if scale:
+            value *= _SCALES[scale.lower()]
+        paired = match.group("close") and (match.group("open") or match.group("inner"))
+        if match.group("close") and not paired:
+            end -= 1
+        if match.group("open") and not paired:
+            start += 1
+        if paired or match.group("sign"):
+            value = -value
+        currency = _SYMBOLS.get(match.group("symbol")) or match.group("code")
+        return MONEY, value, CURRENCIES.index(currency), start, end
+    if match.group("percentage"):
+        return PERCENTAGE, _decimal(match.group("percent")), 0, start, end
+    rhs = _decimal(match.group("rhs"))
+    value = _decimal(match.group("lhs")) / rhs if rhs else Decimal(0)
+    return RATIO, value, 0, start, end
+
+
+class FigureScanner:
+    """
+    Incremental figure extractor: ``feed`` pages or chunks in document order
+    and read the accumulated ``table``.
+
+    Offsets are positions in the concatenated text, where each fed segment is
+    followed by ``separator`` (``join_pages`` uses a newline).
+    """
+
+    def __init__(self, separator: str = "\n"):
+        self.table = FigureTable()
+        self.separator = separator
+        self.skipped = 0
+        self._offset = 0
+
+    def feed(self, text: str, page: Optional[int] = None) -> None:
+        keywords = None
+        for match in FIGURE_PATTERN.finditer(text):
+            try:
+                kind, value, currency, start, end = parse_figure(match)
+            except (InvalidOperation, ValueError):
+                self.skipped += 1
+                continue
+            if keywords is None:
+                keywords = KeywordPositions(text)
+            stored = self.table.append(kind, keywords.classify(start, end), value, currency,
+                                       text[start:end], self._offset + start, page)
+            self.skipped += not stored
+        self._offset += len(text) + len(self.separator)
+
+
+def scan_pages(pages: Iterable[Tuple[int, str]]) -> FigureTable:
+    """Scan ``(page_number, text)`` pairs, e.g. from ``iter_pdf_pages``, with offsets as in ``join_pages``."""
+    scanner = FigureScanner()
+    for page_number, page_text in pages:
+        if page_text:
+            scanner.feed(page_text, page_number)
+    return scanner.table
+
+
+def scan_text(text: str, page_offsets: Optional[List[Tuple[int, int]]] = None) -> FigureTable:
+    """
+    Scan a whole document. With ``page_offsets`` (``(char_offset, page_number)``
+    pairs from ``join_pages``) each page is scanned separately and figures carry
+    their page number.
+    """
+    scanner = FigureScanner(separator="")
+    if not page_offsets:
+        scanner.feed(text)
+        return scanner.table
+    if page_offsets[0][0] > 0:
+        scanner.feed(text[:page_offsets[0][0]])
+    for i, (start, page_number) in enumerate(page_offsets):
+        end = page_offsets[i + 1][0] if i + 1 < len(page_offsets) else len(text)
+        scanner.feed(text[start:end], page_number)
+    return scanner.table
+
+
+def summarize_figures(table: FigureTable, limit: int = 10, ratio_limit: int = 5) -> Dict[str, Any]:
+    """
+    The ``extract_financial_metrics`` result: the first few raw figures per
+    category and kind (kept short, since the dict is sent along with prompts)
+    plus total counts per kind.
+    """
+    metrics: Dict[str, Any] = {name: [] for name in ("revenue", "expenses", "assets", "liabilities")}
+    metrics.update({"ratios": [], "percentages": [], "financial_figures": []})
+    limits = {"ratios": ratio_limit}
+    for i in range(len(table)):
+        kind = table.kinds[i]
+        keys = {MONEY: ["financial_figures"], PERCENTAGE: ["percentages"], RATIO: ["ratios"]}[kind]
+        category = CATEGORIES[table.categories[i]]
+        if kind == MONEY and category != "other":
+            keys.append(category)
+        for key in keys:
+            if len(metrics[key]) < limits.get(key, limit):
+                metrics[key].append(table.raw(i))
+    metrics["figure_counts"] = {kind: table.count(kind) for kind in KINDS}
+    return metrics
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from summarizer import MODEL_NAME, active_backend_name, count_tokens, summarize_chunks_concurrently, SUMMARY_MAX_WORKERS
+from tracing import current_span
+
+# -----------------------------
+# Store configuration
+# -----------------------------
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ai-audit-summarizer", "analysis_store.sqlite3")
+DEFAULT_TTL_SECONDS = 90 * 24 * 3600  # 90 days
+VERSIONS_KEPT = 20  # per document
+
+# Stage results that are error messages are recomputed next time rather than reused
+_ERROR_PREFIX = re.compile(r"^Error (summarizing|in|generating)\b")
+
+
+def _backend_prefix(backend: str) -> str:
+    # Gemini keys predate the backend registry and stay as they were, like make_cache_key
+    return "" if backend == "gemini" else f"{backend}\0"
+
+
+def chunk_fingerprint(chunk: str, style: str, audit_focus: bool, model: str = MODEL_NAME,
+                      backend: str = "gemini") -> str:
+    """Identity of a chunk summary: whitespace-normalized text plus everything that shapes its prompt."""
+    digest = hashlib.sha256()
+    digest.update(f"{_backend_prefix(backend)}{model}\0{style}\0{int(audit_focus)}\0".encode("utf-8"))
+    digest.update(" ".join(chunk.split()).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def stage_input_key(stage: str, inputs: Dict[str, Any], model: str = MODEL_NAME, backend: str = "gemini") -> str:
+    digest = hashlib.sha256(f"{_backend_prefix(backend)}{model}\0{stage}\0".encode("utf-8"))
+    digest.update(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def document_series_id(filename: str) -> str:
+    """
+    Name shared by the drafts of one report: the file name without extension
+    and trailing version markers (``_v7``, ``-draft3``, `` (2)``, ``_final``).
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0].lower()
+    marker = re.compile(r"[\s_.-]*(\(\d+\)|v(ersion)?[\s_.-]?\d+|draft[\s_.-]?\d*|rev[\s_.-]?\d+|final|copy)$")
+    while True:
+        shorter = marker.sub("", stem)
+        if shorter == stem or not shorter:
+            return stem
+        stem = shorter
+
+
+def _is_error(value: Any) -> bool:
+    if isinstance(value, str):
+        return bool(_ERROR_PREFIX.match(value))
+    if isinstance(value, dict):
+        return any(_is_error(item) for item in value.values())
+    return False
+
+
+# Pipeline results produced by model calls; a failed call leaves its error message in place of the text
+LLM_RESULT_FIELDS = ("final_summary", "audit_analysis", "risk_categorization", "compliance_checklist")
+
+
+def failed_results(results: Dict[str, Any]) -> List[str]:
+    """
+    Names of the model-generated results that hold an error message rather
+    than output (chunk summaries as ``summaries[i]``); empty when every call succeeded.
+    """
+    failed = [f"summaries[{i}]" for i, summary in enumerate(results.get("summaries") or []) if _is_error(summary)]
+    return failed + [name for name in LLM_RESULT_FIELDS if _is_error(results.get(name))]
+
+
+# -----------------------------
+# Analysis store
+# -----------------------------
+
+class AnalysisStore:
+    """
+    SQLite store of chunk summaries by fingerprint, document-level stage results
+    by input hash, and the chunk fingerprints of each document version.
+
+    Safe to share between threads, like LLMResponseCache.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_summaries (
+                fingerprint TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stage_results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS versions (
+                document_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                fingerprints TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (document_id, version)
+            );
+            """
+        )
+        if ttl_seconds is not None:
+            cutoff = time.time() - ttl_seconds
+            with self._lock:
+                for table in ("chunk_summaries", "stage_results", "versions"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (cutoff,))
+
+    def get_summaries(self, fingerprints: List[str]) -> Dict[str, str]:
+        found = {}
+        unique = list(dict.fromkeys(fingerprints))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT fingerprint, summary FROM chunk_summaries WHERE fingerprint IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_summaries(self, summaries: Dict[str, str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_summaries (fingerprint, summary, created_at) VALUES (?, ?, ?)",
+                [(fingerprint, summary, now) for fingerprint, summary in summaries.items()],
+            )
+
+    def get_stage(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM stage_results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_stage(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_results (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+
+    def latest_version(self, document_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, fingerprints, created_at FROM versions WHERE document_id = ? "
+                "ORDER BY version DESC LIMIT 1", (document_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"version": row[0], "fingerprints": json.loads(row[1]), "created_at": row[2]}
+
+    def record_version(self, document_id: str, fingerprints: List[str]) -> int:
+        """Store a version's fingerprints unless they match the latest one; returns its version number."""
+        latest = self.latest_version(document_id)
+        if latest and latest["fingerprints"] == fingerprints:
+            return latest["version"]
+        version = latest["version"] + 1 if latest else 1
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO versions (document_id, version, fingerprints, created_at) VALUES (?, ?, ?, ?)",
+                (document_id, version, json.dumps(fingerprints), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM versions WHERE document_id = ? AND version <= ?", (document_id, version - VERSIONS_KEPT)
+            )
+        return version
+
+
+def store_from_env() -> Optional[AnalysisStore]:
+    """
+    Build the store from ANALYSIS_STORE_ENABLED, ANALYSIS_STORE_PATH and
+    ANALYSIS_STORE_TTL_DAYS. Returns None when disabled or when the store
+    cannot be opened (analysis then simply runs in full).
+    """
+    if os.getenv("ANALYSIS_STORE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    try:
+        return AnalysisStore(
+            path=os.getenv("ANALYSIS_STORE_PATH", DEFAULT_STORE_PATH),
+            ttl_seconds=float(os.getenv("ANALYSIS_STORE_TTL_DAYS", "90")) * 24 * 3600,
+        )
+    except (OSError, sqlite3.Error):
+        return None
+
+
+_store = None
+_store_lock = threading.Lock()
+_UNSET = object()
+
+
+def get_analysis_store() -> Optional[AnalysisStore]:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = store_from_env() or _UNSET
+    return None if _store is _UNSET else _store
+
+
+# -----------------------------
+# Incremental run
+# -----------------------------
+
+class IncrementalRun:
+    """
+    Reuse bookkeeping for one pipeline run over one version of a document.
+
+    ``summarize`` replaces summarize_chunks_concurrently and only sends chunks
+    without a stored summary to the model; ``memoize`` wraps a document-level
+    stage so it reruns only when its inputs differ from a stored run. ``finish``
+    records this version and returns the reuse report.
+    """
+
+    def __init__(self, store: AnalysisStore, document_id: str):
+        self.store = store
+        self.document_id = document_id
+        self.fingerprints: List[str] = []
+        self.chunk_tokens: List[int] = []
+        self.reused_chunks = 0
+        self.reused_tokens = 0
+        self.stages_reused: List[str] = []
+        self.stages_recomputed: List[str] = []
+        self._lock = threading.Lock()
+
+    def summarize(self, chunks: List[str], style: str, audit_focus: bool,
+                  max_workers: int = SUMMARY_MAX_WORKERS,
+                  progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        backend = active_backend_name()
+        fingerprints = [chunk_fingerprint(chunk, style, audit_focus, backend=backend) for chunk in chunks]
+        stored = self.store.get_summaries(fingerprints)
+
+        # Identical chunks within the document are summarized once too
+        pending: Dict[str, int] = {}
+        for i, fingerprint in enumerate(fingerprints):
+            if fingerprint not in stored and fingerprint not in pending:
+                pending[fingerprint] = i
+        reused = len(chunks) - len(pending)
+        current_span().set_attribute("incremental.chunks_reused", reused)
+        if progress_callback and reused:
+            progress_callback(reused, len(chunks))
+
+        fresh = summarize_chunks_concurrently(
+            [chunks[i] for i in pending.values()], style=style, audit_focus=audit_focus, max_workers=max_workers,
+            progress_callback=(lambda done, total: progress_callback(reused + done, len(chunks)))
+            if progress_callback else None,
+        )
+        new_summaries = dict(zip(pending, fresh))
+        self.store.put_summaries({fp: summary for fp, summary in new_summaries.items() if not _is_error(summary)})
+
+        self.fingerprints = fingerprints
+        self.chunk_tokens = [count_tokens(chunk) for chunk in chunks]
+        self.reused_chunks = reused
+        self.reused_tokens = sum(tokens for fp, tokens in zip(fingerprints, self.chunk_tokens) if fp not in pending)
+        stored.update(new_summaries)
+        return [stored[fingerprint] for fingerprint in fingerprints]
+
+    def memoize(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a stage function; a stored result for the same inputs is returned (and streamed) as is."""
+        def run(**kwargs):
+            emit_partial = kwargs.pop("emit_partial", None)
+            report_progress = kwargs.pop("report_progress", None)
+            key = stage_input_key(stage, kwargs, backend=active_backend_name())
+            stored = self.store.get_stage(key)
+            current_span().set_attribute("incremental.reused", stored is not None)
+            if stored is not None:
+                with self._lock:
+                    self.stages_reused.append(stage)
+                if emit_partial:
+                    emit_partial(stored)
+                return stored
+            if emit_partial:
+                kwargs["emit_partial"] = emit_partial
+            if report_progress:
+                kwargs["report_progress"] = report_progress
+            result = func(**kwargs)
+            if not _is_error(result):
+                self.store.put_stage(key, result)
+            with self._lock:
+                self.stages_recomputed.append(stage)
+            return result
+        return run
+
+    def finish(self) -> Dict[str, Any]:
+        previous = self.store.latest_version(self.document_id)
+        version = self.store.record_version(self.document_id, self.fingerprints)
+        report = {
+            "document_id": self.document_id,
+            "version": version,
+            "chunks_total": len(self.fingerprints),
+            "chunks_reused": self.reused_chunks,
+            "chunks_summarized": len(self.fingerprints) - self.reused_chunks,
+            "tokens_reused": self.reused_tokens,
+            "tokens_total": sum(self.chunk_tokens),
+            "stages_reused": sorted(self.stages_reused),
+            "stages_recomputed": sorted(self.stages_recomputed),
+            "previous_version": None,
+        }
+        if previous is not None:
+            before, after = Counter(previous["fingerprints"]), Counter(self.fingerprints)
+            report["previous_version"] = previous["version"]
+            report["chunks_unchanged"] = sum((before & after).values())
+            report["chunks_added"] = sum((after - before).values())
+            report["chunks_removed"] = sum((before - after).values())
+        return report
@@ -0,0 +1,130 @@
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# -----------------------------
+# Per-stage LLM metrics
+# -----------------------------
+# A RunMetrics collects one pipeline run. The run and the current stage travel
+# in context variables: the scheduler sets the stage for each stage's worker,
+# and code that fans out to its own threads copies the context into them
+# (contextvars.copy_context().run), so every Gemini call is attributed to the
+# stage that made it without passing anything through the call chain.
+
+current_run: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar("current_run", default=None)
+current_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_stage", default=None)
+
+# Calls made outside any stage (e.g. directly from the app) are reported under this name
+UNATTRIBUTED = "other"
+
+
+@dataclass
+class StageMetrics:
+    wall_seconds: float = 0.0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    retries: int = 0
+    cache_hits: int = 0
+    failures: int = 0
+
+
+def pricing_from_env() -> Dict[str, float]:
+    """USD per million tokens, from GEMINI_INPUT_USD_PER_M and GEMINI_OUTPUT_USD_PER_M."""
+    return {
+        "input_usd_per_million": float(os.getenv("GEMINI_INPUT_USD_PER_M", "0.30")),
+        "output_usd_per_million": float(os.getenv("GEMINI_OUTPUT_USD_PER_M", "2.50")),
+    }
+
+
+class RunMetrics:
+    """Thread-safe per-stage counters for one analysis run."""
+
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name: Optional[str]) -> StageMetrics:
+        return self.stages.setdefault(name or UNATTRIBUTED, StageMetrics())
+
+    def add(self, stage: Optional[str], **counts: Any) -> None:
+        with self._lock:
+            metrics = self._stage(stage)
+            for field_name, value in counts.items():
+                setattr(metrics, field_name, getattr(metrics, field_name) + value)
+
+    @contextmanager
+    def activate(self) -> Iterator["RunMetrics"]:
+        """Make this the current run for the calling context."""
+        token = current_run.set(self)
+        try:
+            yield self
+        finally:
+            current_run.reset(token)
+
+    def report(self, stage_timings: Optional[Dict[str, float]] = None,
+               pricing: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Per-stage breakdown plus totals and estimated cost. ``stage_timings``
+        (the scheduler's wall times) adds stages that made no LLM calls.
+        """
+        pricing = pricing or pricing_from_env()
+        with self._lock:
+            for name, seconds in (stage_timings or {}).items():
+                self._stage(name).wall_seconds = seconds
+            # Stages in the order they finished, then calls made outside any stage
+            names = list(stage_timings or {}) + [name for name in self.stages if name not in (stage_timings or {})]
+            stages = {name: asdict(self.stages[name]) for name in names}
+
+        def cost(row: Dict[str, Any]) -> float:
+            return round(row["input_tokens"] * pricing["input_usd_per_million"] / 1e6
+                         + row["output_tokens"] * pricing["output_usd_per_million"] / 1e6, 6)
+
+        totals = asdict(StageMetrics())
+        for row in stages.values():
+            row["cost_usd"] = cost(row)
+            for key in totals:
+                totals[key] += row[key]
+        totals["cost_usd"] = cost(totals)
+        # Stages overlap, so summed wall time can exceed the run's duration
+        totals["wall_seconds"] = round(totals["wall_seconds"], 3)
+        for row in stages.values():
+            row["wall_seconds"] = round(row["wall_seconds"], 3)
+            row["llm_seconds"] = round(row["llm_seconds"], 3)
+        totals["llm_seconds"] = round(totals["llm_seconds"], 3)
+        return {"stages": stages, "totals": totals, "pricing": pricing}
+
+
+@contextmanager
+def stage_context(name: str) -> Iterator[None]:
+    """Attribute LLM calls made in this context to stage ``name``."""
+    token = current_stage.set(name)
+    try:
+        yield
+    finally:
+        current_stage.reset(token)
+
+
+def record(**counts: Any) -> None:
+    """Add ``counts`` to the current stage of the current run; a no-op outside a run."""
+    run = current_run.get()
+    if run is not None:
+        run.add(current_stage.get(), **counts)
+
+
+def record_usage(usage: Any) -> Tuple[int, int]:
+    """
+    Record token counts from a Gemini ``usage_metadata`` (thinking tokens are
+    billed as output). Returns ``(input_tokens, output_tokens)``.
+    """
+    if usage is None:
+        return 0, 0
+    input_tokens = getattr(usage, "prompt_token_count", None) or 0
+    output_tokens = (getattr(usage, "candidates_token_count", None) or 0) + \
+        (getattr(usage, "thoughts_token_count", None) or 0)
+    record(input_tokens=input_tokens, output_tokens=output_tokens)
+    return input_tokens, output_tokens
@@ -0,0 +1,318 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pipeline import run_audit_pipeline
+from scheduler import StageEvent
+from tracing import span
+from uploads import SpooledUpload, touch
+
+# -----------------------------
+# Job store configuration
+# -----------------------------
+# An analysis runs as a background job so that widget changes, reloads and
+# dropped connections do not interrupt it. Jobs run on a thread pool in the
+# Streamlit server process: the work is waiting on Gemini, and threads share the
+# process-wide client, rate governor and response cache. Progress, streamed
+# output and results go to a local SQLite store, from which any session can
+# read them by job ID. A job refers to its upload's spooled file (see
+# uploads.py) instead of holding a copy.
+
+DEFAULT_JOB_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ai-audit-summarizer", "jobs.sqlite3")
+DEFAULT_JOB_TTL_SECONDS = 7 * 24 * 3600  # 7 days
+DEFAULT_JOB_WORKERS = 3
+
+# Progress is written at most this often; stage changes are always written
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+# Each job manager marks its unfinished jobs alive this often. Unfinished jobs
+# not marked for JOB_ABANDONED_SECONDS belong to a server that has stopped, and
+# are failed by whichever manager notices first.
+HEARTBEAT_INTERVAL_SECONDS = 10
+JOB_ABANDONED_SECONDS = 60
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+NO_TEXT_ERROR = "No text could be extracted from the file. Please ensure your document contains readable text."
+
+# Columns returned by JobStore.get; the result blob is read separately
+_JOB_COLUMNS = ("job_id", "status", "filename", "file_type", "options", "result_key", "document_id", "progress",
+                "message", "partial_label", "partial_text", "error", "created_at", "started_at", "finished_at")
+
+
+# -----------------------------
+# Job store
+# -----------------------------
+
+class JobStore:
+    """
+    SQLite store of jobs: the path of their spooled upload, options, owner,
+    status, progress and pickled results. Results hold the app's own objects
+    (e.g. the figure table), so the store must only be shared with trusted
+    processes.
+
+    Safe to share between threads, like AnalysisStore.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_STORE_PATH, ttl_seconds: Optional[float] = DEFAULT_JOB_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                document_path TEXT NOT NULL,
+                document_size INTEGER NOT NULL,
+                document_sha256 TEXT NOT NULL,
+                options TEXT NOT NULL,
+                result_key TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT '',
+                partial_label TEXT NOT NULL DEFAULT '',
+                partial_text TEXT NOT NULL DEFAULT '',
+                result BLOB,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT NOT NULL DEFAULT '',
+                heartbeat_at REAL
+            );
+            """
+        )
+        if ttl_seconds is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM jobs WHERE created_at < ?", (time.time() - ttl_seconds,))
+
+    def create(self, job_id: str, document: SpooledUpload, options: Dict[str, Any], result_key: str,
+               document_id: str, owner: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, filename, file_type, document_path, document_size, "
+                "document_sha256, options, result_key, document_id, created_at, owner, heartbeat_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, document.name, document.type, document.path, document.size, document.sha256,
+                 json.dumps(options), result_key, document_id, now, owner, now),
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        """Set any of ``status``, ``progress``, ``message``, ``partial_label``, ``partial_text``, ``started_at``."""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id: str, result: Dict[str, Any]) -> None:
+        blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1, message = '', partial_text = '', result = ?, "
+                "finished_at = ? WHERE job_id = ?",
+                (DONE, blob, time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, message = '', error = ?, finished_at = ? WHERE job_id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def heartbeat(self, owner: str) -> None:
+        """Mark ``owner``'s queued and running jobs as still alive."""
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? "
+                f"WHERE owner = ? AND status IN ({','.join('?' * len(ACTIVE_STATUSES))})",
+                (time.time(), owner, *ACTIVE_STATUSES),
+            )
+
+    def fail_abandoned(self, error: str, timeout_seconds: float = JOB_ABANDONED_SECONDS) -> int:
+        """Mark failed the queued and running jobs whose owner stopped marking them alive, e.g. a stopped server."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET status = ?, message = '', error = ?, finished_at = ? "
+                f"WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))}) "
+                f"AND COALESCE(heartbeat_at, created_at) < ?",
+                (FAILED, error, now, *ACTIVE_STATUSES, now - timeout_seconds),
+            )
+        return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job's status and progress (without its document or result), or None if unknown."""
+        return next(iter(self.get_many([job_id])), None)
+
+    def get_many(self, job_ids: List[str]) -> List[Dict[str, Any]]:
+        """Known jobs among ``job_ids``, oldest first."""
+        if not job_ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE job_id IN ({','.join('?' * len(job_ids))}) "
+                f"ORDER BY created_at",
+                list(job_ids),
+            ).fetchall()
+        jobs = [dict(zip(_JOB_COLUMNS, row)) for row in rows]
+        for job in jobs:
+            job["options"] = json.loads(job["options"])
+        return jobs
+
+    def get_document(self, job_id: str) -> Optional[SpooledUpload]:
+        """The job's spooled upload, or None if the job is unknown or the file has been removed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, file_type, document_path, document_size, document_sha256 FROM jobs "
+                "WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        upload = SpooledUpload(*row)
+        return upload if touch(upload) else None
+
+    def document_paths(self) -> List[str]:
+        """Spooled uploads that stored jobs refer to."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT document_path FROM jobs")]
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return pickle.loads(row[0]) if row and row[0] is not None else None
+
+
+def job_store_from_env() -> Optional[JobStore]:
+    """
+    Build the job store from JOB_STORE_PATH and JOB_STORE_TTL_DAYS. Returns
+    None when the store location cannot be used.
+    """
+    try:
+        return JobStore(
+            path=os.getenv("JOB_STORE_PATH", DEFAULT_JOB_STORE_PATH),
+            ttl_seconds=float(os.getenv("JOB_STORE_TTL_DAYS", "7")) * 24 * 3600,
+        )
+    except (OSError, sqlite3.Error):
+        return None
+
+
+# -----------------------------
+# Job runner
+# -----------------------------
+
+class JobProgress:
+    """``on_event`` handler that writes a job's stage progress and streamed output to the store."""
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.running_stages: Dict[str, str] = {}
+        self.streamed_text: Dict[str, str] = {}
+        self._last_write = 0.0
+
+    def __call__(self, event: StageEvent) -> None:
+        now = time.monotonic()
+        if event.status == "partial":
+            # The stored result keeps the full text; this is only for live display
+            self.streamed_text[event.stage] = self.streamed_text.get(event.stage, "") + event.message
+            if now - self._last_write >= PROGRESS_INTERVAL_SECONDS:
+                self._last_write = now
+                self.store.update(self.job_id, partial_label=event.label,
+                                  partial_text=self.streamed_text[event.stage])
+            return
+        if event.status in ("started", "progress"):
+            self.running_stages[event.stage] = f"{event.label} {event.message}".strip()
+            if event.status == "progress" and now - self._last_write < PROGRESS_INTERVAL_SECONDS:
+                return
+        else:
+            self.running_stages.pop(event.stage, None)
+        self._last_write = now
+        self.store.update(self.job_id, progress=min(event.overall, 1.0),
+                          message=" | ".join(self.running_stages.values()) or "📊 Finishing analysis...")
+
+
+class JobManager:
+    """
+    Runs submitted analyses on a thread pool and records them in a JobStore.
+
+    Several managers (server processes) can share a store. Each owns the jobs
+    it created and keeps them marked alive; it only fails another owner's
+    unfinished jobs once they have gone unmarked for JOB_ABANDONED_SECONDS.
+    """
+
+    ABANDONED_ERROR = "The server stopped before this job finished. Please run the analysis again."
+
+    def __init__(self, store: JobStore, max_workers: int = DEFAULT_JOB_WORKERS):
+        self.store = store
+        self.owner = uuid.uuid4().hex
+        store.fail_abandoned(self.ABANDONED_ERROR)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audit-job")
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(target=self._keep_alive, name="audit-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _keep_alive(self) -> None:
+        while not self._stopped.wait(HEARTBEAT_INTERVAL_SECONDS):
+            try:
+                self.store.heartbeat(self.owner)
+                self.store.fail_abandoned(self.ABANDONED_ERROR)
+            except sqlite3.Error:
+                continue  # e.g. the store is briefly locked; try again next interval
+
+    def submit(self, document: SpooledUpload, options: Dict[str, Any], result_key: str, document_id: str,
+               extract: Callable[[str, str], Tuple[Optional[str], List[Tuple[int, int]]]]) -> str:
+        """
+        Queue an analysis of ``document`` and return its job ID.
+
+        ``extract(path, file_type)`` returns ``(text, page_offsets)``; it runs in
+        the worker, so slow PDF extraction happens in the background too.
+        """
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, document, options, result_key, document_id, owner=self.owner)
+        self._executor.submit(self._run, job_id, document, options, document_id, extract)
+        return job_id
+
+    def _run(self, job_id: str, document: SpooledUpload, options: Dict[str, Any], document_id: str,
+             extract: Callable[[str, str], Tuple[Optional[str], List[Tuple[int, int]]]]) -> None:
+        self.store.update(job_id, status=RUNNING, started_at=time.time(), message="📄 Extracting text...")
+        try:
+            with span("analyze_upload", **{"job.id": job_id, "file.name": document.name,
+                                           "file.type": document.type, "file.bytes": document.size}):
+                text, page_offsets = extract(document.path, document.type)
+                if not text:
+                    self.store.fail(job_id, NO_TEXT_ERROR)
+                    return
+                results = run_audit_pipeline(text, options, on_event=JobProgress(self.store, job_id),
+                                             page_offsets=page_offsets, document_id=document_id)
+            self.store.finish(job_id, results)
+        except Exception as e:
+            self.store.fail(job_id, f"Analysis failed: {e}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+        self._stopped.set()
+
+
+def job_manager_from_env() -> JobManager:
+    """
+    A job manager with JOB_MAX_WORKERS concurrent jobs. If the job store cannot
+    be opened, jobs are kept in memory and do not outlive the server.
+    """
+    store = job_store_from_env() or JobStore(":memory:", ttl_seconds=None)
+    return JobManager(store, max_workers=max(1, int(os.getenv("JOB_MAX_WORKERS", str(DEFAULT_JOB_WORKERS)))))
@@ -0,0 +1,82 @@
+import os
+from typing import Any, Callable, Dict, Iterator, Optional, Protocol
+
+# -----------------------------
+# Backend interface
+# -----------------------------
+# summarizer.py only needs ``client.models.generate_content`` and
+# ``client.models.generate_content_stream``, returning objects with a ``text``
+# attribute (and optionally ``usage_metadata``). Anything with that shape can
+# stand in for genai.Client.
+
+
+class LLMResponse(Protocol):
+    text: str
+
+
+class LLMModels(Protocol):
+    def generate_content(self, model: str, contents: str,
+                         config: Optional[Dict[str, Any]] = None) -> LLMResponse: ...
+
+    def generate_content_stream(self, model: str, contents: str,
+                                config: Optional[Dict[str, Any]] = None) -> Iterator[LLMResponse]: ...
+
+
+class LLMBackend(Protocol):
+    models: LLMModels
+
+
+def backend_name(client: Any) -> str:
+    """
+    The name a client's responses are cached under: its ``backend_name``
+    attribute (set by create_backend), else ``gemini`` for google-genai clients
+    and the class name for anything else.
+    """
+    name = getattr(client, "backend_name", None)
+    if name:
+        return name
+    if type(client).__module__.startswith("google."):
+        return "gemini"
+    return type(client).__name__
+
+
+def _gemini_backend() -> LLMBackend:
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY is not set. Add it to your environment or .env file.")
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+
+def _fake_backend() -> LLMBackend:
+    from fake_gemini import FakeGeminiClient
+    return FakeGeminiClient.from_env()
+
+
+_BACKENDS: Dict[str, Callable[[], LLMBackend]] = {
+    "gemini": _gemini_backend,
+    "fake": _fake_backend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], LLMBackend]) -> None:
+    """Make ``factory`` selectable with LLM_BACKEND=<name>."""
+    _BACKENDS[name] = factory
+
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """
+    Build the backend named ``name``, or by the LLM_BACKEND setting
+    (default ``gemini``; ``fake`` runs fully offline).
+    """
+    name = name or os.getenv("LLM_BACKEND", "gemini")
+    try:
+        factory = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend '{name}'. Available: {', '.join(sorted(_BACKENDS))}")
+    backend = factory()
+    try:
+        backend.backend_name = name
+    except AttributeError:
+        pass  # backend_name() falls back to the client's type
+    return backend
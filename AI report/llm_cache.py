@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# -----------------------------
+# Cache configuration
+# -----------------------------
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ai-audit-summarizer", "llm_responses.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB of stored responses
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600    # 30 days
+
+# Once per this many writes, expired entries are purged and the stored size is
+# recounted (picking up entries written by other processes sharing the file)
+HOUSEKEEPING_EVERY_PUTS = 100
+# Eviction over the size limit goes down to this fraction of it, so it runs
+# once per batch of new entries rather than on every write near the limit
+EVICT_TO_FRACTION = 0.9
+
+
+def make_cache_key(model: str, prompt: str, config: Optional[Dict[str, Any]] = None,
+                   backend: str = "gemini") -> str:
+    """
+    Content address for a request: SHA-256 of backend, model, prompt and generation config.
+
+    Gemini keys leave the backend out, so entries cached before other backends
+    existed stay valid; any other backend (e.g. the offline fake) gets keys of
+    its own and can never answer for Gemini.
+    """
+    digest = hashlib.sha256()
+    if backend != "gemini":
+        digest.update(backend.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    if config:
+        digest.update(b"\0")
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    On-disk SQLite cache of LLM responses with a size limit, LRU eviction and TTL.
+
+    Safe to share between threads; every operation runs under one lock on a
+    single connection. Writes keep a running estimate of the stored size (an
+    over-estimate, since replaced and expired entries are not subtracted), so
+    the table is only summed when the estimate passes the limit.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at)")
+        self._estimated_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for ``key`` or None, refreshing its LRU position."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Store ``value`` under ``key`` and evict least recently used entries over the size limit."""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._puts += 1
+            self._estimated_bytes += size
+            if self._puts % HOUSEKEEPING_EVERY_PUTS == 0:
+                if self.ttl_seconds is not None:
+                    self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._evict()
+            elif self._estimated_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Recount the stored size and, over the limit, drop least recently used entries."""
+        total = self._stored_bytes()
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO_FRACTION
+            stale = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if total <= target:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self._estimated_bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._estimated_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus current on-disk footprint."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": total,
+            }
+
+
+def cache_from_env() -> Optional[LLMResponseCache]:
+    """
+    Build the response cache from environment settings.
+
+    LLM_CACHE_ENABLED=0 disables caching; LLM_CACHE_PATH, LLM_CACHE_MAX_MB and
+    LLM_CACHE_TTL_HOURS override the defaults.
+    """
+    if os.getenv("LLM_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    max_mb = os.getenv("LLM_CACHE_MAX_MB")
+    ttl_hours = os.getenv("LLM_CACHE_TTL_HOURS")
+    try:
+        return LLMResponseCache(
+            path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES,
+            ttl_seconds=float(ttl_hours) * 3600 if ttl_hours else DEFAULT_TTL_SECONDS,
+        )
+    except (OSError, sqlite3.Error):
+        # An unwritable cache location should not stop the app; run uncached instead
+        return None
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from typing import Callable, Dict, Iterator, List, Optional, Protocol, Tuple
+
+# -----------------------------
+# Backend interface
+# -----------------------------
+# A PDF backend yields ``(page_number, text)`` for a range of 1-based pages.
+# pdfplumber lays text out most faithfully but is slow; pypdf (or PyPDF2 when
+# only that is installed) is many times faster on text-based reports. Backends
+# import their library on first use, like the rest of the extraction code.
+
+AUTO = "auto"
+DEFAULT_BACKEND = "pdfplumber"
+
+
+class PdfBackend(Protocol):
+    name: str
+
+    def page_count(self, pdf_file) -> int: ...
+
+    def iter_pages(self, pdf_file, start: int = 1, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]: ...
+
+
+def _rewind(pdf_file) -> None:
+    if hasattr(pdf_file, "seek"):
+        pdf_file.seek(0)
+
+
+class PdfplumberBackend:
+    name = "pdfplumber"
+
+    def page_count(self, pdf_file) -> int:
+        import pdfplumber
+        _rewind(pdf_file)
+        with pdfplumber.open(pdf_file) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, pdf_file, start: int = 1, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        import pdfplumber
+        _rewind(pdf_file)
+        # Restricting the pages up front keeps pdfplumber from loading the rest
+        pages = list(range(start, stop + 1)) if stop else None
+        with pdfplumber.open(pdf_file, pages=pages) as pdf:
+            for page in pdf.pages if pages else pdf.pages[start - 1:]:
+                yield page.page_number, page.extract_text() or ""
+                page.flush_cache()
+
+
+class PypdfBackend:
+    name = "pypdf"
+
+    @staticmethod
+    def _reader(pdf_file):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            from PyPDF2 import PdfReader
+        _rewind(pdf_file)
+        return PdfReader(pdf_file)
+
+    def page_count(self, pdf_file) -> int:
+        return len(self._reader(pdf_file).pages)
+
+    def iter_pages(self, pdf_file, start: int = 1, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        reader = self._reader(pdf_file)
+        for index in range(start - 1, min(stop or len(reader.pages), len(reader.pages))):
+            yield index + 1, reader.pages[index].extract_text() or ""
+
+
+_BACKENDS: Dict[str, Tuple[Callable[[], PdfBackend], Tuple[str, ...]]] = {
+    "pdfplumber": (PdfplumberBackend, ("pdfplumber",)),
+    "pypdf": (PypdfBackend, ("pypdf", "PyPDF2")),
+}
+
+
+def register_backend(name: str, factory: Callable[[], PdfBackend], modules: Tuple[str, ...] = ()) -> None:
+    """Make ``factory`` selectable by name; it counts as available when any of ``modules`` is installed."""
+    _BACKENDS[name] = (factory, modules)
+
+
+def available_backends() -> List[str]:
+    """Registered backends whose library is installed, checked without importing it."""
+    return [name for name, (_, modules) in _BACKENDS.items()
+            if not modules or any(find_spec(module) for module in modules)]
+
+
+def get_backend(name: str) -> PdfBackend:
+    try:
+        factory, _ = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend '{name}'. Available: {', '.join(sorted(_BACKENDS))}, {AUTO}")
+    return factory()
+
+
+def default_backend_name() -> str:
+    """The PDF_BACKEND setting: a backend name or ``auto`` (the default)."""
+    return os.getenv("PDF_BACKEND", AUTO)
+
+
+# -----------------------------
+# Automatic selection
+# -----------------------------
+# Each available backend extracts the same few pages spread over the document.
+# A backend's text is good enough when it yields at least AUTO_MIN_YIELD of the
+# best backend's characters, its words are not run together (mean word length)
+# and few glyphs failed to map ("(cid:12)", U+FFFD). The fastest good backend
+# wins, but only if it beats DEFAULT_BACKEND by AUTO_MIN_SPEEDUP: the choice
+# then does not flip with timing noise, and the same document keeps getting the
+# same text (which matters for incremental reuse).
+
+AUTO_SAMPLE_PAGES = 3
+AUTO_MIN_YIELD = 0.9
+AUTO_MAX_MEAN_WORD_CHARS = 12
+AUTO_MAX_UNMAPPED_FRACTION = 0.02
+AUTO_MIN_SPEEDUP = 1.5
+
+_WORD = re.compile(r"[^\W\d_]+")
+_UNMAPPED = re.compile(r"\(cid:\d+\)|\ufffd")
+
+
+@dataclass
+class BackendSample:
+    """One backend's result on the sampled pages."""
+    seconds: float
+    pages: int
+    characters: int = 0
+    mean_word_chars: float = 0.0
+    unmapped_fraction: float = 0.0
+    good: bool = False
+    error: str = ""
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds > 0 else float("inf")
+
+
+@dataclass
+class BackendChoice:
+    name: str
+    reason: str
+    samples: Dict[str, BackendSample] = field(default_factory=dict)
+
+
+def sample_page_numbers(page_count: int, sample_pages: int = AUTO_SAMPLE_PAGES) -> List[int]:
+    """Up to ``sample_pages`` 1-based pages spread evenly from the first page to the last."""
+    if page_count <= sample_pages:
+        return list(range(1, page_count + 1))
+    step = (page_count - 1) / (sample_pages - 1) if sample_pages > 1 else 0
+    return sorted({1 + round(i * step) for i in range(sample_pages)})
+
+
+def _sample_backend(backend: PdfBackend, pdf_file, pages: List[int]) -> BackendSample:
+    start = time.perf_counter()
+    try:
+        texts = [text for page in pages for _, text in backend.iter_pages(pdf_file, page, page)]
+    except Exception as e:
+        return BackendSample(time.perf_counter() - start, len(pages), error=str(e))
+    seconds = time.perf_counter() - start
+    text = "\n".join(texts)
+    characters = sum(not c.isspace() for c in text)
+    words = _WORD.findall(text)
+    unmapped = sum(len(match) for match in _UNMAPPED.findall(text))
+    return BackendSample(
+        seconds, len(pages), characters,
+        mean_word_chars=sum(map(len, words)) / len(words) if words else 0.0,
+        unmapped_fraction=unmapped / characters if characters else 0.0,
+    )
+
+
+def choose_backend(pdf_file, sample_pages: int = AUTO_SAMPLE_PAGES,
+                   candidates: Optional[List[str]] = None) -> BackendChoice:
+    """Sample a few pages with every candidate backend and pick one; see the notes above."""
+    candidates = [name for name in (candidates or available_backends()) if name in _BACKENDS]
+    if not candidates:
+        raise RuntimeError("No PDF backend is installed. Install pdfplumber or pypdf.")
+    fallback = DEFAULT_BACKEND if DEFAULT_BACKEND in candidates else candidates[0]
+    if len(candidates) == 1:
+        return BackendChoice(fallback, "only backend installed")
+
+    backends = {name: get_backend(name) for name in candidates}
+    # pypdf counts pages without parsing them
+    page_count = backends.get("pypdf", backends[fallback]).page_count(pdf_file)
+    pages = sample_page_numbers(page_count, sample_pages)
+    samples = {name: _sample_backend(backend, pdf_file, pages) for name, backend in backends.items()}
+
+    best_yield = max(sample.characters for sample in samples.values())
+    if best_yield == 0:
+        return BackendChoice(fallback, "no text on the sampled pages", samples)
+    for sample in samples.values():
+        sample.good = (not sample.error and sample.characters >= AUTO_MIN_YIELD * best_yield
+                       and sample.mean_word_chars <= AUTO_MAX_MEAN_WORD_CHARS
+                       and sample.unmapped_fraction <= AUTO_MAX_UNMAPPED_FRACTION)
+
+    good = [name for name in candidates if samples[name].good]
+    if not good:
+        best = max(candidates, key=lambda name: samples[name].characters)
+        return BackendChoice(best, "no backend passed the text checks; most text", samples)
+    fastest = min(good, key=lambda name: samples[name].seconds)
+    if fallback in good and fastest != fallback \
+            and samples[fallback].seconds < AUTO_MIN_SPEEDUP * samples[fastest].seconds:
+        return BackendChoice(fallback, f"{fastest} not {AUTO_MIN_SPEEDUP}x faster", samples)
+    speedup = samples[fallback].seconds / samples[fastest].seconds if samples[fastest].seconds else float("inf")
+    reason = "fastest with good text" if fastest == fallback else f"{speedup:.1f}x faster than {fallback}"
+    return BackendChoice(fastest, reason, samples)
+
+
+def resolve_backend(pdf_file, name: Optional[str] = None) -> BackendChoice:
+    """The backend ``name`` (default: PDF_BACKEND), running the automatic choice for ``auto``."""
+    name = name or default_backend_name()
+    if name == AUTO:
+        return choose_backend(pdf_file)
+    get_backend(name)  # unknown names fail here, before any extraction
+    return BackendChoice(name, "requested")
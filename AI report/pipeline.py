@@ -0,0 +1,214 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from boilerplate import cluster_near_duplicates, dedup_report, strip_boilerplate
+from chunk_export import chunk_stats
+from financial_figures import scan_text, summarize_figures
+from incremental import IncrementalRun, get_analysis_store
+from instrumentation import RunMetrics
+from tracing import span
+from scheduler import Stage, StageEvent, run_stages
+from summarizer import (
+    DEFAULT_CHUNK_TOKENS,
+    aggregate_summaries,
+    analyze_audit_findings,
+    analyze_audit_fused,
+    categorize_risk_levels,
+    chunk_text_spans,
+    generate_audit_executive_summary_stream,
+    generate_compliance_checklist,
+    summarize_chunks_concurrently,
+)
+
+# Analysis types that use the audit-focused chunk prompt
+AUDIT_FOCUS_TYPES = ["comprehensive-audit", "financial-focus", "compliance-review"]
+
+# Stages that run at the same time; chunk summarization has its own worker pool
+PIPELINE_MAX_WORKERS = 4
+
+
+def stream_executive_summary(text: str, financial_metrics: Dict, audit_analysis: Dict,
+                             emit_partial: Callable[[str], None]) -> str:
+    """Generate the executive summary, passing each streamed piece to ``emit_partial``."""
+    parts = []
+    for piece in generate_audit_executive_summary_stream(text, financial_metrics, audit_analysis):
+        parts.append(piece)
+        emit_partial(piece)
+    return "".join(parts).strip()
+
+
+def build_audit_stages(options: Dict[str, Any], incremental: Optional[IncrementalRun] = None) -> List[Stage]:
+    """
+    Declare the analysis stages enabled by ``options`` and what each one consumes.
+
+    ``options`` uses the keys of the app's analysis options: ``summary_style``,
+    ``analysis_type``, ``chunk_size``, ``fused_analysis``, ``financial_analysis``,
+    ``risk_assessment``, ``compliance_check``, ``remove_boilerplate`` and
+    ``incremental``. With ``remove_boilerplate``, lines repeated across pages are
+    dropped before chunking and near-duplicate chunks are summarized once. With an
+    ``incremental`` run, chunk boundaries are content-defined, stored chunk
+    summaries are reused and model-backed stages rerun only on new inputs.
+    """
+    analysis_type = options.get("analysis_type", "basic-summary")
+    summary_style = options.get("summary_style", "concise")
+    run_findings = options.get("risk_assessment") or analysis_type == "comprehensive-audit"
+    run_risk = options.get("risk_assessment", False)
+    run_compliance = options.get("compliance_check") or analysis_type == "compliance-review"
+    run_executive = analysis_type == "comprehensive-audit" or summary_style == "executive"
+    run_fused = options.get("fused_analysis") and sum([run_findings, run_compliance, run_executive]) >= 2
+    dedupe = options.get("remove_boilerplate", False)
+
+    summarize_chunks = incremental.summarize if incremental else summarize_chunks_concurrently
+    memoize = incremental.memoize if incremental else (lambda stage, func: func)
+
+    def summarize(chunks, report_progress, chunk_clusters=None):
+        # Near-duplicate chunks share their cluster representative's summary
+        clusters = chunk_clusters or list(range(len(chunks)))
+        representatives = [i for i, rep in enumerate(clusters) if rep == i]
+        summaries = summarize_chunks(
+            [chunks[i] for i in representatives], style=summary_style, audit_focus=analysis_type in AUDIT_FOCUS_TYPES,
+            progress_callback=lambda done, total: report_progress(done / total, f"Processed chunk {done} of {total}")
+        )
+        by_chunk = dict(zip(representatives, summaries))
+        return [by_chunk[rep] for rep in clusters]
+
+    def chunk_spans(text):
+        return chunk_text_spans(text, max_tokens=options.get("chunk_size", DEFAULT_CHUNK_TOKENS),
+                                content_defined=incremental is not None)
+
+    stages = []
+    if dedupe:
+        # Everything downstream reads the cleaned "text"; figures keep the page-aligned original
+        stages.append(Stage("cleaned", lambda raw_text, page_offsets: strip_boilerplate(raw_text, page_offsets),
+                            ["raw_text", "page_offsets"], "🧹 Removing boilerplate", weight=0.3))
+        stages.append(Stage("text", lambda cleaned: cleaned.text, ["cleaned"], weight=0))
+        stages.append(Stage("text_page_offsets", lambda cleaned: cleaned.page_offsets, ["cleaned"], weight=0))
+        stages.append(Stage("chunk_clusters", lambda chunks: cluster_near_duplicates(chunks), ["chunks"],
+                            "🧹 Finding near-duplicate chunks", weight=0.2))
+    stages.append(Stage("chunk_spans", chunk_spans, ["text"], "📝 Chunking document", weight=0.5))
+    stages.append(Stage("chunks", lambda text, chunk_spans: [text[start:end].strip() for start, end in chunk_spans],
+                        ["text", "chunk_spans"], weight=0))
+    stages.append(Stage("summaries", summarize, ["chunks", "chunk_clusters"] if dedupe else ["chunks"],
+                        "📝 Summarizing chunks", weight=6, reports_progress=True))
+    if options.get("financial_analysis"):
+        # The full figure table stays out of financial_metrics, which is sent along with prompts
+        stages.append(Stage("figures", lambda raw_text, page_offsets: scan_text(raw_text, page_offsets),
+                            ["raw_text", "page_offsets"], "💰 Financial figures", weight=0.5))
+        stages.append(Stage("financial_metrics", lambda figures: summarize_figures(figures), ["figures"], weight=0))
+    # Figures of the chunked text, placed in chunks by offset: the figure table
+    # itself when it was scanned from that text, else one scan of the cleaned text
+    if options.get("financial_analysis") and not dedupe:
+        stages.append(Stage("text_figures", lambda figures: figures, ["figures"], weight=0))
+    else:
+        stages.append(Stage("text_figures", lambda text, text_page_offsets: scan_text(text, text_page_offsets),
+                            ["text", "text_page_offsets"], weight=0.3))
+    # Per-chunk pages, tokens, figures and risk for the chunk export; runs beside summarization
+    stages.append(Stage("chunk_stats", lambda chunks, chunk_spans, text_page_offsets, text_figures: chunk_stats(
+                            chunks, chunk_spans, text_page_offsets, text_figures),
+                        ["chunks", "chunk_spans", "text_page_offsets", "text_figures"], "📑 Chunk statistics",
+                        weight=0.3))
+
+    if run_fused:
+        # One structured request; the other stages just pick their part of the response
+        fused = memoize("fused", lambda text, financial_metrics: analyze_audit_fused(text, financial_metrics))
+        stages.append(Stage("fused", fused, ["text", "financial_metrics"], "⚡ Fused audit analysis", weight=3))
+        if run_findings:
+            stages.append(Stage("audit_analysis", lambda fused: fused["audit_analysis"], ["fused"], weight=0))
+        if run_risk:
+            stages.append(Stage("risk_categorization", lambda fused: fused["risk_categorization"], ["fused"], weight=0))
+        if run_compliance:
+            stages.append(Stage("compliance_checklist", lambda fused: fused["compliance_checklist"], ["fused"], weight=0))
+    else:
+        if run_findings:
+            stages.append(Stage("audit_analysis", memoize("audit_analysis", analyze_audit_findings), ["text"],
+                                "⚠️ Audit findings", weight=2))
+            if run_risk:
+                stages.append(Stage("risk_categorization",
+                                    memoize("risk_categorization",
+                                            lambda audit_analysis: categorize_risk_levels(audit_analysis.get("analysis", ""))),
+                                    ["audit_analysis"], "⚠️ Risk categorization", weight=2))
+        if run_compliance:
+            stages.append(Stage("compliance_checklist", memoize("compliance_checklist", generate_compliance_checklist),
+                                ["text"], "✅ Compliance checklist", weight=2))
+
+    if run_executive and run_fused:
+        stages.append(Stage("final_summary", lambda fused: fused["executive_summary"], ["fused"], weight=0))
+    elif run_executive:
+        stages.append(Stage("final_summary", memoize("final_summary", stream_executive_summary),
+                            ["text", "financial_metrics", "audit_analysis"], "📊 Executive summary", weight=2,
+                            streams_output=True))
+    elif dedupe:
+        stages.append(Stage("final_summary",
+                            lambda summaries, chunk_clusters: aggregate_summaries(
+                                [summary for i, summary in enumerate(summaries) if chunk_clusters[i] == i]),
+                            ["summaries", "chunk_clusters"], "📊 Final summary", weight=0.1))
+    else:
+        stages.append(Stage("final_summary", lambda summaries: aggregate_summaries(summaries), ["summaries"],
+                            "📊 Final summary", weight=0.1))
+    return stages
+
+
+def run_audit_pipeline(text: str, options: Dict[str, Any],
+                       on_event: Optional[Callable[[StageEvent], None]] = None,
+                       max_workers: int = PIPELINE_MAX_WORKERS,
+                       page_offsets: Optional[List[Tuple[int, int]]] = None,
+                       document_id: str = "document") -> Dict[str, Any]:
+    """
+    Run every enabled analysis stage over ``text``, independent stages concurrently.
+
+    ``page_offsets`` (from ``join_pages``) lets extracted figures carry page numbers.
+    With ``options["incremental"]``, work stored for earlier runs is reused and
+    the result is compared with the previous version of ``document_id``.
+    Returns the result dict stored by the app: ``text``, ``page_offsets``, ``chunk_count``,
+    ``summaries``, ``final_summary``, the four analysis dicts (empty when their
+    stage is disabled), the ``figures`` table (None when financial analysis is
+    off), ``reuse_report`` (None unless incremental), ``dedup_report`` (None
+    unless boilerplate removal is on), ``chunk_stats`` (each chunk's character
+    span, pages, tokens, figures and text risk; see chunk_export), ``stage_timings`` and
+    ``processing_metrics`` (per-stage wall time, LLM calls, tokens, retries,
+    cache hits and estimated cost; see instrumentation.RunMetrics.report).
+    """
+    initial = {
+        "raw_text": text,
+        "text": text,
+        "cleaned": None,
+        "chunk_clusters": None,
+        "page_offsets": page_offsets,
+        "text_page_offsets": page_offsets,
+        "figures": None,
+        "financial_metrics": {},
+        "audit_analysis": {},
+        "risk_categorization": {},
+        "compliance_checklist": {},
+    }
+    store = get_analysis_store() if options.get("incremental") else None
+    incremental = IncrementalRun(store, document_id) if store else None
+    stages = build_audit_stages(options, incremental)
+    for stage in stages:
+        initial.pop(stage.name, None)
+
+    metrics = RunMetrics()
+    with metrics.activate(), span("audit_pipeline", **{
+        "document.id": document_id, "document.chars": len(text),
+        "analysis.type": options.get("analysis_type", ""), "analysis.fused": bool(options.get("fused_analysis")),
+        "analysis.incremental": incremental is not None,
+    }) as pipeline_span:
+        results = run_stages(stages, initial, max_workers=max_workers, on_event=on_event)
+        pipeline_span.set_attribute("chunk.count", len(results["chunks"]))
+    return {
+        "text": text,
+        "page_offsets": page_offsets or [],
+        "chunk_count": len(results["chunks"]),
+        "summaries": results["summaries"],
+        "final_summary": results["final_summary"],
+        "financial_metrics": results["financial_metrics"],
+        "audit_analysis": results["audit_analysis"],
+        "compliance_checklist": results["compliance_checklist"],
+        "risk_categorization": results["risk_categorization"],
+        "figures": results["figures"],
+        "chunk_stats": results["chunk_stats"],
+        "reuse_report": incremental.finish() if incremental else None,
+        "dedup_report": dedup_report(results["cleaned"], results["chunks"], results["chunk_clusters"])
+        if results["cleaned"] is not None else None,
+        "stage_timings": results["stage_timings"],
+        "processing_metrics": metrics.report(results["stage_timings"]),
+    }
@@ -0,0 +1,229 @@
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# -----------------------------
+# Error classification
+# -----------------------------
+# HTTP statuses worth retrying: timeouts, rate limits and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_RETRY_DELAY_PATTERN = re.compile(r"retry(?:Delay|[ _-]?after| in)\W{0,4}(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """HTTP status of an API error (google-genai ``APIError.code`` or an HTTP response), if any."""
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return status_code_of(error) in RETRYABLE_STATUS_CODES
+
+
+def retry_hint_seconds(error: BaseException) -> Optional[float]:
+    """
+    Server-suggested wait before retrying, from a Retry-After header, a
+    google.rpc.RetryInfo ``retryDelay`` in the error details, or the message.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        try:
+            if value is not None:
+                return float(value)
+        except ValueError:
+            pass
+
+    def find_delay(node) -> Optional[str]:
+        if isinstance(node, dict):
+            if isinstance(node.get("retryDelay"), str):
+                return node["retryDelay"]
+            node = list(node.values())
+        if isinstance(node, list):
+            for item in node:
+                found = find_delay(item)
+                if found:
+                    return found
+        return None
+
+    delay = find_delay(getattr(error, "details", None))
+    if delay:
+        try:
+            return float(delay.rstrip("s"))
+        except ValueError:
+            pass
+    match = _RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+# -----------------------------
+# Token bucket
+# -----------------------------
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at ``rate_per_minute``.
+
+    ``capacity`` (default: one minute's worth) bounds bursts.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until ``amount`` tokens are available and take them; returns seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = (amount - self.tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+# -----------------------------
+# Request governor
+# -----------------------------
+
+class RequestGovernor:
+    """
+    Shared gate for LLM requests: requests-per-minute and tokens-per-minute
+    buckets, retries with exponential backoff and full jitter (or the server's
+    retry hint), and an AIMD concurrency limit.
+
+    The concurrency limit grows by one for every ``limit`` successful calls and
+    halves on a rate-limit response (at most once per ``decrease_interval``
+    seconds, so a burst of 429s counts as one signal), letting throughput settle
+    at the quota the API actually grants.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_concurrency: int = 16, min_concurrency: int = 1, initial_concurrency: Optional[int] = None,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 decrease_interval: float = 1.0, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock, sleep=sleep) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock, sleep=sleep) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(initial_concurrency or max(min_concurrency, max_concurrency // 2))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.decrease_interval = decrease_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._last_decrease = float("-inf")
+        self._in_flight = 0
+        self._slots = threading.Condition()
+        self._stats = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    def _acquire_slot(self) -> None:
+        with self._slots:
+            while self._in_flight >= int(self.limit):
+                self._slots.wait()
+            self._in_flight += 1
+
+    def _release_slot(self, throttled: bool = False, succeeded: bool = False) -> None:
+        with self._slots:
+            self._in_flight -= 1
+            if throttled and self._clock() - self._last_decrease >= self.decrease_interval:
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                self._last_decrease = self._clock()
+            elif succeeded:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._slots.notify_all()
+
+    def backoff_delay(self, attempt: int, error: BaseException) -> float:
+        hint = retry_hint_seconds(error)
+        if hint is not None:
+            return min(hint, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int = 0,
+             on_retry: Optional[Callable[[Exception], None]] = None) -> Any:
+        """
+        Run ``fn()`` within the rate limits, retrying retryable errors.
+
+        Non-retryable errors, and retryable ones once ``max_retries`` is used up,
+        are re-raised to the caller. ``on_retry`` is called with each error that
+        is about to be retried.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire_slot()
+            try:
+                waited = 0.0
+                if self.request_bucket:
+                    waited += self.request_bucket.acquire(1)
+                if self.token_bucket and estimated_tokens:
+                    waited += self.token_bucket.acquire(estimated_tokens)
+                with self._slots:
+                    self._stats["requests"] += 1
+                    self._stats["wait_seconds"] += waited
+                result = fn()
+            except Exception as e:
+                throttled = status_code_of(e) == 429
+                self._release_slot(throttled=throttled)
+                with self._slots:
+                    self._stats["throttled"] += throttled
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        self._stats["failed"] += 1
+                        raise
+                    self._stats["retries"] += 1
+                if on_retry:
+                    on_retry(e)
+                delay = self.backoff_delay(attempt, e)
+                with self._slots:
+                    self._stats["wait_seconds"] += delay
+                self._sleep(delay)
+                continue
+            self._release_slot(succeeded=True)
+            with self._slots:
+                self._stats["succeeded"] += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._slots:
+            return {**self._stats, "concurrency_limit": int(self.limit), "in_flight": self._in_flight}
+
+
+def governor_from_env() -> RequestGovernor:
+    """
+    Build the request governor from GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCURRENCY
+    and GEMINI_MAX_RETRIES; unset rate limits leave only the adaptive limit.
+    """
+    rpm = os.getenv("GEMINI_RPM")
+    tpm = os.getenv("GEMINI_TPM")
+    return RequestGovernor(
+        requests_per_minute=float(rpm) if rpm else None,
+        tokens_per_minute=float(tpm) if tpm else None,
+        max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")),
+        max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "5")),
+    )
@@ -0,0 +1,392 @@
+import json
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+# -----------------------------
+# Report model
+# -----------------------------
+# An AuditReport is built once per analysis: it fixes the generation timestamp
+# and the document statistics that every export format shows. The renderers
+# below yield a report piece by piece, so a download, a batch output file or an
+# entry of the all-formats ZIP is written out without holding the whole
+# document as a string.
+
+AI_MODEL_LABEL = "Gemini-2.5-Flash"
+
+
+@dataclass(slots=True, frozen=True)
+class DocumentStats:
+    original_length: int
+    summary_length: int
+    chunks_processed: int
+    compression_ratio: float  # summary length as a percentage of the original
+
+
+@dataclass(slots=True, frozen=True)
+class AuditReport:
+    filename: str
+    generated_at: datetime
+    final_summary: str
+    financial_metrics: Dict[str, Any]
+    audit_analysis: Dict[str, Any]
+    compliance_checklist: Dict[str, Any]
+    chunk_summaries: List[str]
+    stats: DocumentStats
+    processing_metrics: Optional[Dict[str, Any]] = None
+    model: str = AI_MODEL_LABEL
+    # Rendered timestamps, fixed when the report is built
+    timestamp: str = field(init=False)
+    iso_timestamp: str = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "timestamp", self.generated_at.strftime("%Y-%m-%d %H:%M:%S"))
+        object.__setattr__(self, "iso_timestamp", self.generated_at.isoformat())
+
+
+def build_report(filename: str, original_text: str, final_summary: str, financial_metrics: Optional[Dict],
+                 audit_analysis: Optional[Dict], compliance_checklist: Optional[Dict],
+                 chunk_summaries: Optional[List[str]] = None,
+                 processing_metrics: Optional[Dict[str, Any]] = None,
+                 generated_at: Optional[datetime] = None) -> AuditReport:
+    """Collect one analysis into an AuditReport, computing its statistics once."""
+    chunk_summaries = chunk_summaries or []
+    stats = DocumentStats(
+        original_length=len(original_text),
+        summary_length=len(final_summary),
+        chunks_processed=len(chunk_summaries),
+        compression_ratio=len(final_summary) / len(original_text) * 100 if original_text else 0.0,
+    )
+    return AuditReport(
+        filename=filename,
+        generated_at=generated_at or datetime.now(),
+        final_summary=final_summary,
+        financial_metrics=financial_metrics or {},
+        audit_analysis=audit_analysis or {},
+        compliance_checklist=compliance_checklist or {},
+        chunk_summaries=chunk_summaries,
+        stats=stats,
+        processing_metrics=processing_metrics,
+    )
+
+
+def report_from_results(filename: str, results: Dict[str, Any]) -> AuditReport:
+    """An AuditReport from a ``run_audit_pipeline`` result."""
+    return build_report(filename, results["text"], results["final_summary"], results["financial_metrics"],
+                        results["audit_analysis"], results["compliance_checklist"], results["summaries"],
+                        processing_metrics=results.get("processing_metrics"))
+
+
+# -----------------------------
+# Renderers
+# -----------------------------
+
+# Each renderer yields the report in pieces of at most one section (or one
+# chunk summary), so memory use does not grow with the number of chunks
+Renderer = Callable[[AuditReport], Iterator[str]]
+
+
+def iter_comprehensive_report(report: AuditReport) -> Iterator[str]:
+    """Plain-text report with every analysis section."""
+    metrics = report.financial_metrics
+    yield f"""
+COMPREHENSIVE AUDIT ANALYSIS REPORT
+{'='*60}
+Original File: {report.filename}
+Generated: {report.timestamp}
+Analysis Type: AI-Powered Audit Summarization
+{'='*60}
+
+EXECUTIVE SUMMARY
+{'-'*20}
+{report.final_summary}
+
+FINANCIAL METRICS EXTRACTED
+{'-'*30}
+Key Financial Figures: {', '.join(metrics.get('financial_figures', [])[:5])}
+Percentages Found: {', '.join(metrics.get('percentages', [])[:5])}
+Ratios Identified: {', '.join(metrics.get('ratios', []))}
+
+DETAILED AUDIT ANALYSIS
+{'-'*25}
+{report.audit_analysis.get('analysis', 'No analysis available')}
+
+COMPLIANCE CHECKLIST
+{'-'*20}
+{report.compliance_checklist.get('checklist', 'No checklist generated')}
+
+AUDIT TRAIL DOCUMENTATION
+{'-'*30}
+Document Processing Timestamp: {report.timestamp}
+AI Model Used: {report.model}
+Analysis Method: Chunk-based processing with audit-specific prompts
+Total Chunks Processed: {report.stats.chunks_processed}
+Original Document Size: {report.stats.original_length} characters
+Summary Compression Ratio: {report.stats.compression_ratio:.1f}%
+
+"""
+
+    if report.chunk_summaries:
+        yield f"\nDETAILED CHUNK ANALYSIS\n{'-'*25}\n"
+        for i, chunk_summary in enumerate(report.chunk_summaries, 1):
+            yield f"\nSection {i} Analysis:\n{chunk_summary}\n"
+
+    yield f"\n{'='*60}\nReport generated by AI-Powered Audit Summarizer\n{'='*60}"
+
+
+def iter_json_report(report: AuditReport) -> Iterator[str]:
+    """Structured JSON report; ``processing_metrics`` goes in the audit trail when present."""
+    stats = report.stats
+    data = {
+        "audit_report_metadata": {
+            "original_file": report.filename,
+            "generated_timestamp": report.iso_timestamp,
+            "ai_model": report.model,
+            "processing_method": "audit-focused-analysis",
+            "document_stats": {
+                "original_length": stats.original_length,
+                "summary_length": stats.summary_length,
+                "compression_ratio": f"{stats.compression_ratio:.1f}%",
+                "chunks_processed": stats.chunks_processed
+            }
+        },
+        "executive_summary": report.final_summary,
+        "financial_analysis": report.financial_metrics,
+        "audit_findings": report.audit_analysis,
+        "compliance_assessment": report.compliance_checklist,
+        "detailed_analysis": {
+            "chunk_summaries": report.chunk_summaries,
+            "processing_notes": "Each chunk analyzed with audit-specific AI prompts"
+        },
+        "audit_trail": {
+            "processing_timestamp": report.iso_timestamp,
+            "validation_status": "AI-generated, requires human review",
+            "confidence_level": "Medium - AI analysis should be verified by qualified auditor"
+        }
+    }
+    if report.processing_metrics:
+        data["audit_trail"]["processing_metrics"] = report.processing_metrics
+    # The pure-Python encoder yields tokens as it walks the data, so the JSON text is never held whole
+    yield from json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(data)
+
+
+def iter_markdown_report(report: AuditReport) -> Iterator[str]:
+    """Markdown report with tables and section headings."""
+    metrics = report.financial_metrics
+    stats = report.stats
+    yield f"""# 🔍 Comprehensive Audit Analysis Report
+
+## 📋 Report Information
+- **Original File:** {report.filename}
+- **Generated:** {report.timestamp}
+- **Analysis Method:** AI-Powered Audit Summarization
+- **Processing Model:** {report.model}
+
+---
+
+## 📊 Executive Summary
+
+{report.final_summary}
+
+---
+
+## 💰 Financial Metrics Analysis
+
+### Key Financial Figures
+{', '.join(metrics.get('financial_figures', ['None identified'])[:8])}
+
+### Percentages & Ratios
+- **Percentages:** {', '.join(metrics.get('percentages', ['None'])[:5])}
+- **Ratios:** {', '.join(metrics.get('ratios', ['None'])[:3])}
+
+---
+
+## 🎯 Detailed Audit Analysis
+
+{report.audit_analysis.get('analysis', '*No detailed analysis available*')}
+
+---
+
+## ✅ Compliance Assessment
+
+{report.compliance_checklist.get('checklist', '*No compliance checklist generated*')}
+
+---
+
+## 📈 Document Statistics
+
+| Metric | Value |
+|--------|--------|
+| Original Length | {stats.original_length:,} characters |
+| Summary Length | {stats.summary_length:,} characters |
+| Compression Ratio | {stats.compression_ratio:.1f}% |
+| Sections Analyzed | {stats.chunks_processed} |
+
+---
+
+## 🔗 Audit Trail
+
+- **Processing Timestamp:** {report.timestamp}
+- **AI Model:** {report.model}
+- **Validation Status:** ⚠️ AI-generated content requires human review
+- **Confidence Level:** Medium - Should be verified by qualified auditor
+
+"""
+
+    if report.chunk_summaries:
+        yield "\n---\n\n## 📑 Detailed Section Analysis\n\n"
+        for i, chunk_summary in enumerate(report.chunk_summaries, 1):
+            yield f"### Section {i}\n\n{chunk_summary}\n\n"
+
+    yield "\n---\n\n*Report generated by AI-Powered Audit Summarizer v2.0*\n"
+
+
+def iter_executive_summary(report: AuditReport) -> Iterator[str]:
+    """The executive summary with key document statistics."""
+    stats = report.stats
+    yield f"""
+EXECUTIVE AUDIT SUMMARY
+{report.filename}
+Generated: {report.timestamp}
+
+{report.final_summary}
+
+Key Statistics:
+- Document Length: {stats.original_length:,} characters
+- Summary Length: {stats.summary_length:,} characters
+- Compression Ratio: {stats.compression_ratio:.1f}%
+- Sections Analyzed: {stats.chunks_processed}
+"""
+
+
+def iter_financial_metrics(report: AuditReport) -> Iterator[str]:
+    """Extracted financial figures, percentages and ratios."""
+    metrics = report.financial_metrics
+    yield f"""
+FINANCIAL METRICS REPORT
+{report.filename}
+Generated: {report.timestamp}
+
+Financial Figures: {', '.join(metrics.get('financial_figures', []))}
+Percentages: {', '.join(metrics.get('percentages', []))}
+Ratios: {', '.join(metrics.get('ratios', []))}
+"""
+
+
+def iter_compliance_report(report: AuditReport) -> Iterator[str]:
+    """The compliance checklist on its own."""
+    yield f"""
+COMPLIANCE ASSESSMENT REPORT
+{report.filename}
+Generated: {report.timestamp}
+
+{report.compliance_checklist.get('checklist', 'No compliance assessment available')}
+"""
+
+
+# Export format -> (renderer, file name suffix, MIME type). The first four are
+# the app's export menu; batch output files and bundle entries use the suffixes.
+REPORT_FORMATS: Dict[str, Tuple[Renderer, str, str]] = {
+    "comprehensive": (iter_comprehensive_report, "_comprehensive_audit_report.txt", "text/plain"),
+    "json": (iter_json_report, "_audit_analysis.json", "application/json"),
+    "markdown": (iter_markdown_report, "_audit_report.md", "text/markdown"),
+    "executive-summary": (iter_executive_summary, "_executive_summary.txt", "text/plain"),
+    "financial-metrics": (iter_financial_metrics, "_financial_metrics.txt", "text/plain"),
+    "compliance": (iter_compliance_report, "_compliance_report.txt", "text/plain"),
+}
+
+# Pieces are gathered into writes of about this many characters; the JSON
+# encoder yields one token at a time
+WRITE_BUFFER_CHARS = 64 * 1024
+# Downloads are assembled in memory up to this size, then in a temporary file,
+# so a large report exists in memory only as the bytes handed to the download
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+def iter_report(report: AuditReport, fmt: str) -> Iterator[str]:
+    """``report`` in export format ``fmt``, piece by piece."""
+    return REPORT_FORMATS[fmt][0](report)
+
+
+def iter_report_bytes(report: AuditReport, fmt: str, buffer_chars: int = WRITE_BUFFER_CHARS) -> Iterator[bytes]:
+    """``report`` in export format ``fmt`` as UTF-8 blocks of about ``buffer_chars`` characters."""
+    pending: List[str] = []
+    size = 0
+    for piece in iter_report(report, fmt):
+        pending.append(piece)
+        size += len(piece)
+        if size >= buffer_chars:
+            yield "".join(pending).encode("utf-8")
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending).encode("utf-8")
+
+
+def write_report(report: AuditReport, fmt: str, out: BinaryIO) -> int:
+    """Write ``report`` in export format ``fmt`` to a binary stream; returns the bytes written."""
+    written = 0
+    for block in iter_report_bytes(report, fmt):
+        out.write(block)
+        written += len(block)
+    return written
+
+
+def render_report(report: AuditReport, fmt: str) -> str:
+    """``report`` in export format ``fmt`` as a string."""
+    return "".join(iter_report(report, fmt))
+
+
+def preview_report(report: AuditReport, fmt: str, max_chars: int) -> str:
+    """The first ``max_chars`` characters of ``report`` in format ``fmt``; the rest is never rendered."""
+    pieces = []
+    size = 0
+    for piece in iter_report(report, fmt):
+        pieces.append(piece[:max_chars - size])
+        size += len(pieces[-1])
+        if size >= max_chars:
+            break
+    return "".join(pieces)
+
+
+def report_stem(report: AuditReport) -> str:
+    """Upload name without its extension, the prefix of every export file name."""
+    return report.filename.rsplit('.', 1)[0]
+
+
+def write_bundle(report: AuditReport, out: BinaryIO, formats: Optional[List[str]] = None) -> None:
+    """
+    Write a ZIP archive with ``report`` in each of ``formats`` (default: all).
+
+    Every renderer writes straight into its compressed archive entry, so the
+    formats are produced in one pass without holding each one as a string.
+    """
+    stem = report_stem(report)
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for fmt in formats or list(REPORT_FORMATS):
+            entry = zipfile.ZipInfo(stem + REPORT_FORMATS[fmt][1], date_time=report.generated_at.timetuple()[:6])
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            with bundle.open(entry, "w") as raw:
+                write_report(report, fmt, raw)
+
+
+def _spool(write: Callable[[BinaryIO], Any]) -> bytes:
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        write(spool)
+        spool.seek(0)
+        return spool.read()
+
+
+def report_bytes(report: AuditReport, fmt: str) -> bytes:
+    """
+    ``report`` in format ``fmt`` as UTF-8 bytes, for a download. The report is
+    streamed into a spooled temporary file, so the returned bytes are the only
+    full copy held in memory.
+    """
+    return _spool(lambda spool: write_report(report, fmt, spool))
+
+
+def bundle_bytes(report: AuditReport, formats: Optional[List[str]] = None) -> bytes:
+    """The all-formats ZIP archive of ``report`` as bytes, assembled in a spooled temporary file."""
+    return _spool(lambda spool: write_bundle(report, spool, formats))
@@ -0,0 +1,233 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+# -----------------------------
+# Extractive salience ranking
+# -----------------------------
+# Picks the most informative sentences of a whole document for prompts that
+# can only take a few hundred tokens of it. Each sentence is scored by
+#   - BM25 against the document's own term profile (topical and specific terms),
+#   - TextRank centrality over TF-IDF cosine similarity (what the text keeps
+#     coming back to), and
+#   - a small boost for figures and audit vocabulary,
+# then sentences are taken greedily by score, skipping near-repeats, until the
+# token budget is spent, and returned in document order. Runs locally on CPU.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 30
+# TextRank builds a dense similarity matrix, so it ranks only this many of the
+# best BM25 candidates; the rest keep their BM25 score
+MAX_GRAPH_SENTENCES = 1200
+MAX_GRAPH_TERMS = 2000
+# A candidate this similar (cosine) to an already selected sentence is skipped
+REDUNDANCY_THRESHOLD = 0.7
+NEAR_IDENTICAL_THRESHOLD = 0.95
+# Selection stops once less than this much of the budget is left
+MIN_SLOT_TOKENS = 16
+FIGURE_BOOST = 0.25
+AUDIT_TERM_BOOST = 0.25
+# Sentences shorter than this carry too little to be worth a slot
+MIN_SENTENCE_WORDS = 5
+# Rankings kept for reuse by the next prompt built from the same document. They
+# are keyed by a digest of the text, so the cache does not keep documents alive.
+RANKING_CACHE_SIZE = 4
+
+_PARAGRAPH = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[A-Z0-9(\"'$£€])")
+# A line with two runs of column spacing is kept as its own unit (table rows)
+_TABLE_LINE = re.compile(r"\S {2,}\S.* {2,}\S")
+_TERM = re.compile(r"[a-z][a-z0-9'-]+")
+_FIGURE = re.compile(r"[$£€]\s?\d|\d\s?%|\(\d[\d,.]*\)")
+_AUDIT_TERMS = re.compile(
+    r"\b(finding|deficien|material weakness|non-?complian|misstat|going concern|qualified|"
+    r"recommend|remediat|risk|control|breach|fraud|impair|restat|exception|violation|opinion)",
+    re.IGNORECASE,
+)
+_STOPWORDS = frozenset(
+    "the and for are was were has have had been being with that this these those from into onto upon "
+    "its it's our their there which who whom whose what when where while than then them they also not "
+    "but all any each per such other more most some can could may might shall should will would "
+    "about above after before below between during over under out off again further only own same "
+    "very just both few nor too yet via within without".split()
+)
+
+
+def _paragraphs(text: str):
+    start = 0
+    for match in _PARAGRAPH.finditer(text):
+        yield start, match.start()
+        start = match.end()
+    yield start, len(text)
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """``(start, end)`` spans of the sentences of ``text``; table rows count as one sentence each."""
+    spans = []
+    for start, end in _paragraphs(text):
+        paragraph = text[start:end]
+        lines = paragraph.split("\n")
+        if sum(1 for line in lines if _TABLE_LINE.search(line)) * 2 >= len(lines):
+            offset = start
+            for line in lines:
+                spans.append((offset, offset + len(line)))
+                offset += len(line) + 1
+            continue
+        sentence_start = start
+        for match in _SENTENCE_END.finditer(paragraph):
+            spans.append((sentence_start, start + match.start()))
+            sentence_start = start + match.end()
+        spans.append((sentence_start, end))
+    return [(start, end) for start, end in spans if text[start:end].strip()]
+
+
+def _terms(sentence: str) -> List[str]:
+    return [term for term in _TERM.findall(sentence.lower()) if term not in _STOPWORDS]
+
+
+def _textrank(vectors: np.ndarray) -> np.ndarray:
+    """PageRank over cosine similarity of the (row-normalized) ``vectors``."""
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, out_weight, out=np.zeros_like(similarity), where=out_weight > 0)
+    n = len(vectors)
+    rank = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(TEXTRANK_ITERATIONS):
+        rank = (1 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * (transition.T @ rank)
+    return rank
+
+
+Ranking = Tuple[Tuple[Tuple[int, int], ...], Tuple[int, ...], np.ndarray]
+
+_rankings: "OrderedDict[bytes, Ranking]" = OrderedDict()
+_rankings_lock = threading.Lock()
+
+
+def rank_sentences(text: str) -> Ranking:
+    """
+    Rank the sentences of ``text``.
+
+    Returns the sentence spans, candidate indices best first (sentences too short
+    to rank are left out), and the candidates' row-normalized TF-IDF vectors in
+    that order, used to skip near-repeats. The last RANKING_CACHE_SIZE rankings
+    are cached, since several prompts are built from one document.
+    """
+    key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _rankings_lock:
+        ranking = _rankings.get(key)
+        if ranking is not None:
+            _rankings.move_to_end(key)
+            return ranking
+    ranking = _rank_sentences(text)
+    with _rankings_lock:
+        _rankings[key] = ranking
+        while len(_rankings) > RANKING_CACHE_SIZE:
+            _rankings.popitem(last=False)
+    return ranking
+
+
+def _rank_sentences(text: str) -> Ranking:
+    spans = split_sentences(text)
+    term_ids = {}
+    rows, cols = [], []
+    lengths = np.zeros(len(spans), dtype=np.float32)
+    for i, (start, end) in enumerate(spans):
+        terms = _terms(text[start:end])
+        lengths[i] = len(terms)
+        for term in terms:
+            rows.append(i)
+            cols.append(term_ids.setdefault(term, len(term_ids)))
+    eligible = np.flatnonzero(lengths >= MIN_SENTENCE_WORDS)
+    if not len(eligible):
+        return tuple(spans), (), np.zeros((0, 0), dtype=np.float32)
+
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    vocabulary = len(term_ids)
+    # Term frequency per (sentence, term) pair, as sorted unique pair codes
+    pairs, tf = np.unique(rows * vocabulary + cols, return_counts=True)
+    pair_rows, pair_cols = pairs // vocabulary, pairs % vocabulary
+    tf = tf.astype(np.float32)
+
+    n = len(spans)
+    df = np.bincount(pair_cols, minlength=vocabulary).astype(np.float32)
+    idf = np.log((n - df + 0.5) / (df + 0.5) + 1.0)
+    # The "query" is the document itself: terms weighted by how often it uses them
+    collection = np.bincount(cols, minlength=vocabulary).astype(np.float32)
+    query_weight = np.log1p(collection)
+
+    average_length = max(float(lengths.mean()), 1.0)
+    saturation = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[pair_rows] / average_length))
+    bm25 = np.bincount(pair_rows, weights=query_weight[pair_cols] * idf[pair_cols] * saturation,
+                       minlength=n).astype(np.float32)
+
+    # Dense TF-IDF rows for the best BM25 candidates; terms seen in one sentence cannot link two
+    candidates = eligible[np.argsort(-bm25[eligible], kind="stable")[:MAX_GRAPH_SENTENCES]]
+    position = np.full(n, -1, dtype=np.int64)
+    position[candidates] = np.arange(len(candidates))
+    in_graph = position[pair_rows] >= 0
+    shared = np.flatnonzero(df >= 2)
+    shared = shared[np.argsort(-df[shared], kind="stable")[:MAX_GRAPH_TERMS]]
+    column = np.full(vocabulary, -1, dtype=np.int64)
+    column[shared] = np.arange(len(shared))
+    keep = in_graph & (column[pair_cols] >= 0)
+    vectors = np.zeros((len(candidates), max(len(shared), 1)), dtype=np.float32)
+    vectors[position[pair_rows[keep]], column[pair_cols[keep]]] = tf[keep] * idf[pair_cols[keep]]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    centrality = _textrank(vectors) if len(candidates) > 1 else np.ones(1, dtype=np.float32)
+    score = bm25[candidates] / max(float(bm25[candidates].max()), 1e-9) \
+        + centrality / max(float(centrality.max()), 1e-9)
+    for k, i in enumerate(candidates):
+        sentence = text[spans[i][0]:spans[i][1]]
+        score[k] *= 1 + FIGURE_BOOST * bool(_FIGURE.search(sentence)) \
+            + AUDIT_TERM_BOOST * bool(_AUDIT_TERMS.search(sentence))
+
+    order = np.argsort(-score, kind="stable")
+    return tuple(spans), tuple(int(candidates[k]) for k in order), vectors[order]
+
+
+def _estimate_tokens(text: str) -> int:
+    return -(-len(text) // 4)
+
+
+def select_salient(text: str, max_tokens: int,
+                   count_tokens: Optional[Callable[[str], int]] = None) -> str:
+    """
+    The most informative sentences of ``text`` within ``max_tokens``, in document
+    order and one per line. Text already within the budget is returned whole.
+    """
+    count_tokens = count_tokens or _estimate_tokens
+    if count_tokens(text) <= max_tokens:
+        return text.strip()
+
+    spans, ranked, vectors = rank_sentences(text)
+    sentences = {}
+    selected_rows = []
+    used = 0
+    # Repetitive documents may not fill the budget with distinct sentences; a
+    # second pass then only keeps out near-identical ones
+    for threshold in (REDUNDANCY_THRESHOLD, NEAR_IDENTICAL_THRESHOLD):
+        for k, i in enumerate(ranked):
+            if max_tokens - used < MIN_SLOT_TOKENS:
+                break
+            if i in sentences:
+                continue
+            if selected_rows and float((vectors[selected_rows] @ vectors[k]).max()) > threshold:
+                continue
+            sentence = " ".join(text[spans[i][0]:spans[i][1]].split())
+            tokens = count_tokens(sentence) + 1  # newline
+            if used + tokens > max_tokens:
+                continue
+            sentences[i] = sentence
+            selected_rows.append(k)
+            used += tokens
+    return "\n".join(sentences[i] for i in sorted(sentences))
@@ -0,0 +1,157 @@
+import contextvars
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from instrumentation import stage_context
+from tracing import span
+
+
+# -----------------------------
+# Stage declarations
+# -----------------------------
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline.
+
+    ``func`` is called with one keyword argument per name in ``inputs``; each
+    name refers to an initial value or another stage's result. Stages with
+    ``reports_progress`` also receive ``report_progress(fraction, message)``, and
+    stages with ``streams_output`` receive ``emit_partial(text)`` for incremental
+    output. ``weight`` is the stage's share of overall progress.
+    """
+    name: str
+    func: Callable[..., Any]
+    inputs: List[str] = field(default_factory=list)
+    label: str = ""
+    weight: float = 1.0
+    reports_progress: bool = False
+    streams_output: bool = False
+
+
+@dataclass
+class StageEvent:
+    """Progress notification delivered to ``on_event`` on the calling thread."""
+    stage: str
+    label: str
+    status: str  # "started", "progress", "partial", "finished" or "failed"
+    fraction: float  # completion of this stage, 0..1
+    overall: float  # weighted completion of the whole run, 0..1
+    message: str = ""  # status text, or the new piece of output for "partial" events
+    elapsed: float = 0.0
+
+
+# -----------------------------
+# Scheduler
+# -----------------------------
+
+def _run_in_stage(stage: Stage, kwargs: Dict[str, Any], attributes: Dict[str, Any]) -> Any:
+    """Run a stage in the caller's context copy, with LLM calls and spans attributed to it."""
+    with stage_context(stage.name), span(f"stage {stage.name}", **attributes):
+        return stage.func(**kwargs)
+
+
+def run_stages(stages: List[Stage], initial: Optional[Dict[str, Any]] = None, max_workers: int = 4,
+               on_event: Optional[Callable[[StageEvent], None]] = None) -> Dict[str, Any]:
+    """
+    Run ``stages`` on a thread pool, starting each one as soon as its inputs exist.
+
+    Independent stages run concurrently, so the run takes about as long as its
+    critical path. ``on_event`` is always invoked from the calling thread, which
+    makes it safe for Streamlit updates. Returns initial values plus every stage
+    result, with per-stage wall times under ``"stage_timings"``. The first stage
+    exception is re-raised once running stages have finished.
+    """
+    results = dict(initial or {})
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+    for stage in stages:
+        if stage.name in results:
+            raise ValueError(f"Stage '{stage.name}' shadows an initial value")
+        missing = [name for name in stage.inputs if name not in results and name not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' has unknown inputs: {', '.join(missing)}")
+
+    total_weight = sum(stage.weight for stage in stages) or 1.0
+    fractions = {stage.name: 0.0 for stage in stages}
+    started_at: Dict[str, float] = {}
+    finished_at: Dict[str, float] = {}
+    timings: Dict[str, float] = {}
+    progress_events: "queue.Queue" = queue.Queue()
+
+    def overall() -> float:
+        return sum(by_name[name].weight * fraction for name, fraction in fractions.items()) / total_weight
+
+    def emit(stage: Stage, status: str, message: str = "") -> None:
+        if on_event:
+            on_event(StageEvent(stage.name, stage.label or stage.name, status, fractions[stage.name], overall(),
+                                message, time.perf_counter() - started_at[stage.name]))
+
+    def drain_progress() -> None:
+        while True:
+            try:
+                name, status, fraction, message = progress_events.get_nowait()
+            except queue.Empty:
+                return
+            if fraction is not None:
+                fractions[name] = max(fractions[name], min(fraction, 1.0))
+            emit(by_name[name], status, message)
+
+    pending = dict(by_name)
+    running = {}
+    failure: Optional[BaseException] = None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            if failure is None:
+                for name, stage in list(pending.items()):
+                    if all(input_name in results for input_name in stage.inputs):
+                        kwargs = {input_name: results[input_name] for input_name in stage.inputs}
+                        if stage.reports_progress:
+                            kwargs["report_progress"] = (
+                                lambda fraction, message="", _name=name:
+                                    progress_events.put((_name, "progress", fraction, message))
+                            )
+                        if stage.streams_output:
+                            kwargs["emit_partial"] = (
+                                lambda text, _name=name: progress_events.put((_name, "partial", None, text))
+                            )
+                        del pending[name]
+                        started_at[name] = time.perf_counter()
+                        # The input finished last is the one this stage was waiting on
+                        upstream = [input_name for input_name in stage.inputs if input_name in finished_at]
+                        attributes = {"stage.name": name, "stage.inputs": list(stage.inputs)}
+                        if upstream:
+                            attributes["stage.waited_on"] = max(upstream, key=finished_at.__getitem__)
+                        running[executor.submit(contextvars.copy_context().run, _run_in_stage,
+                                                stage, kwargs, attributes)] = stage
+                        emit(stage, "started")
+            if not running:
+                if failure is None and pending:
+                    raise ValueError(f"Stages have cyclic dependencies: {', '.join(pending)}")
+                break
+
+            done, _ = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+            drain_progress()
+            for future in done:
+                stage = running.pop(future)
+                finished_at[stage.name] = time.perf_counter()
+                timings[stage.name] = finished_at[stage.name] - started_at[stage.name]
+                try:
+                    results[stage.name] = future.result()
+                except Exception as e:
+                    failure = failure or e
+                    emit(stage, "failed", str(e))
+                    continue
+                fractions[stage.name] = 1.0
+                emit(stage, "finished")
+
+    if failure is not None:
+        raise failure
+    results["stage_timings"] = timings
+    return results
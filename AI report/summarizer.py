@@ -1,90 +1,525 @@
-import pdfplumber
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Iterable, Iterator, Tuple
 import os
-from google import genai
+import codecs
+import hashlib
 from datetime import datetime
 import json
 import re
+import threading
+import itertools
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llm_cache import cache_from_env, make_cache_key
+from rate_limiter import governor_from_env, status_code_of
+from llm_backend import backend_name, create_backend
+import pdf_backends
+from financial_figures import scan_text, summarize_figures
+from instrumentation import record, record_usage
+from report import build_report, render_report
+from tracing import current_span, span, start_span, traced
+
+# PDF libraries, the google-genai SDK and the salience ranker (NumPy) are imported where
+# they are first used, so importing this module (app reruns, worker processes,
+# text-only tools) stays cheap.
 
 # -----------------------------
 # Set up Gemini API client
 # -----------------------------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # Replace with your actual Gemini API key
-os.environ["GOOGLE_GENAI_API_KEY"] = GEMINI_API_KEY
-client = genai.Client(api_key=GEMINI_API_KEY)
+MODEL_NAME = "gemini-2.5-flash"
+
+# Shared LLM client (any llm_backend.LLMBackend), created on first use by get_client()
+client = None
+_init_lock = threading.Lock()
+
+# Upper bound on Gemini requests in flight during chunk summarization
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "8"))
+
+# PDFs with at least this many pages are extracted across a process pool
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+
+# Persistent response cache keyed on backend + model + prompt, opened on first use (None when disabled)
+_UNSET = object()
+response_cache = _UNSET
+
+# Rate limits, retries and adaptive concurrency shared by every Gemini call
+governor = None
+
+def get_client():
+    """
+    Return the process-wide LLM client, creating it on first call.
+
+    The backend comes from LLM_BACKEND (see llm_backend.py): ``gemini`` by
+    default, or ``fake`` for an offline stand-in.
+    """
+    global client
+    if client is None:
+        with _init_lock:
+            if client is None:
+                client = create_backend()
+    return client
+
+def set_client(new_client) -> None:
+    """Use ``new_client`` for all subsequent Gemini calls."""
+    global client
+    client = new_client
+
+def get_governor():
+    """Return the process-wide request governor, configured from GEMINI_* settings on first use."""
+    global governor
+    if governor is None:
+        with _init_lock:
+            if governor is None:
+                governor = governor_from_env()
+    return governor
+
+def active_backend_name() -> str:
+    """Backend name for cache and store keys, without creating the client (cache hits need none)."""
+    if client is None:
+        return os.getenv("LLM_BACKEND", "gemini")
+    return backend_name(client)
+
+def _get_response_cache():
+    global response_cache
+    if response_cache is _UNSET:
+        with _init_lock:
+            if response_cache is _UNSET:
+                response_cache = cache_from_env()
+    return response_cache
+
+def _retry_handler(llm_span) -> Callable[[Exception], None]:
+    """Count a retry for the current stage and mark it on the call's span."""
+    def on_retry(error: Exception) -> None:
+        record(retries=1)
+        llm_span.add_event("retry", status_code=status_code_of(error), error=str(error)[:200])
+    return on_retry
+
+def _generate(prompt: str, model: str = MODEL_NAME, config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Send a prompt to Gemini, serving byte-identical repeat requests from the response cache.
+    """
+    with span("llm.generate", **{"llm.model": model, "llm.prompt_chars": len(prompt)}) as llm_span:
+        cache = _get_response_cache()
+        key = make_cache_key(model, prompt, config, active_backend_name())
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                record(cache_hits=1)
+                llm_span.set_attribute("llm.cache_hit", True)
+                return cached
+
+        start = time.perf_counter()
+        try:
+            response = get_governor().call(
+                lambda: get_client().models.generate_content(model=model, contents=prompt, config=config),
+                estimated_tokens=count_tokens(prompt),
+                on_retry=_retry_handler(llm_span),
+            )
+        except Exception:
+            record(llm_calls=1, failures=1, llm_seconds=time.perf_counter() - start)
+            raise
+        record(llm_calls=1, llm_seconds=time.perf_counter() - start)
+        input_tokens, output_tokens = record_usage(getattr(response, "usage_metadata", None))
+        llm_span.set_attributes({"llm.cache_hit": False, "llm.input_tokens": input_tokens,
+                                 "llm.output_tokens": output_tokens})
+        text = response.text.strip()
+        if cache is not None:
+            cache.put(key, text)
+        return text
+
+def _generate_stream(prompt: str, model: str = MODEL_NAME, config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Streaming counterpart of _generate: yields text pieces as Gemini produces them.
+
+    A cached response is yielded in one piece; a completed stream is cached.
+    """
+    # A generator's body runs in its consumer's context, so this span is ended here rather than made current
+    llm_span = start_span("llm.generate_stream", **{"llm.model": model, "llm.prompt_chars": len(prompt)})
+    try:
+        yield from _generate_stream_traced(prompt, model, config, llm_span)
+    except Exception as e:
+        llm_span.record_exception(e)
+        raise
+    finally:
+        llm_span.end()
+
+def _generate_stream_traced(prompt: str, model: str, config: Optional[Dict[str, Any]], llm_span) -> Iterator[str]:
+    cache = _get_response_cache()
+    key = make_cache_key(model, prompt, config, active_backend_name())
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            record(cache_hits=1)
+            llm_span.set_attribute("llm.cache_hit", True)
+            yield cached
+            return
+
+    def open_stream():
+        # The request is sent on the first next(), so retries cover everything up to the first piece
+        responses = iter(get_client().models.generate_content_stream(model=model, contents=prompt, config=config))
+        return next(responses, None), responses
+
+    start = time.perf_counter()
+    try:
+        first, responses = get_governor().call(open_stream, estimated_tokens=count_tokens(prompt),
+                                               on_retry=_retry_handler(llm_span))
+    except Exception:
+        record(llm_calls=1, failures=1, llm_seconds=time.perf_counter() - start)
+        raise
+    parts = []
+    usage = None
+    for response in itertools.chain([first] if first is not None else [], responses):
+        # Usage metadata arrives with the last piece (earlier pieces may carry partial counts)
+        usage = getattr(response, "usage_metadata", None) or usage
+        if response.text:
+            # Drop leading whitespace so the streamed text matches the stripped cached text
+            piece = response.text if parts else response.text.lstrip()
+            if piece:
+                parts.append(piece)
+                yield piece
+    record(llm_calls=1, llm_seconds=time.perf_counter() - start)
+    input_tokens, output_tokens = record_usage(usage)
+    llm_span.set_attributes({"llm.cache_hit": False, "llm.input_tokens": input_tokens,
+                             "llm.output_tokens": output_tokens})
+    if cache is not None:
+        cache.put(key, "".join(parts).strip())
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the LLM response cache."""
+    cache = _get_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
 
 # -----------------------------
 # PDF / TXT extraction functions
 # -----------------------------
 
-def extract_text_from_pdf(pdf_file) -> str:
+def _extract_page_range(pdf_path: str, start: int, stop: int,
+                        backend: str = pdf_backends.DEFAULT_BACKEND) -> List[Tuple[int, str]]:
+    """
+    Extract 1-based pages ``start`` to ``stop`` (inclusive); runs inside a worker process.
+    """
+    return list(pdf_backends.get_backend(backend).iter_pages(pdf_path, start, stop))
+
+
+def iter_pdf_pages(pdf_file, max_workers: Optional[int] = None,
+                   backend: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield ``(page_number, text)`` pairs in page order as each page is extracted.
+
+    ``backend`` names a pdf_backends backend or ``auto`` (default: the
+    PDF_BACKEND setting), which samples a few pages to pick one per document.
+    When ``pdf_file`` is a path to a PDF with at least PDF_PARALLEL_MIN_PAGES pages
+    and more than one worker is allowed, page ranges are extracted across a
+    process pool; pages are still yielded in order as soon as their range is done.
+    """
+    # A generator's body runs in its consumer's context, so this span is ended here rather than made
+    # current; the backend attributes are set on it directly
+    pdf_span = start_span("iter_pdf_pages")
+    try:
+        yield from _iter_pdf_pages_traced(pdf_file, max_workers, backend, pdf_span)
+    except GeneratorExit:
+        pdf_span.set_attribute("generator.closed_early", True)
+        raise
+    except Exception as e:
+        pdf_span.record_exception(e)
+        raise
+    finally:
+        pdf_span.end()
+
+
+def _iter_pdf_pages_traced(pdf_file, max_workers: Optional[int], backend: Optional[str],
+                           pdf_span) -> Iterator[Tuple[int, str]]:
+    choice = pdf_backends.resolve_backend(pdf_file, backend)
+    pdf_span.set_attributes({"pdf.backend": choice.name, "pdf.backend.reason": choice.reason})
+    pdf_backend = pdf_backends.get_backend(choice.name)
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers > 1 and isinstance(pdf_file, (str, os.PathLike)):
+        page_count = pdf_backend.page_count(pdf_file)
+        if page_count >= PDF_PARALLEL_MIN_PAGES:
+            # Several ranges per worker keeps the pool busy and the first pages arriving early
+            range_size = max(1, -(-page_count // (workers * 4)))
+            starts = list(range(1, page_count + 1, range_size))
+            stops = [min(start + range_size - 1, page_count) for start in starts]
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for page_range in executor.map(_extract_page_range, [os.fspath(pdf_file)] * len(starts), starts,
+                                               stops, [choice.name] * len(starts)):
+                    yield from page_range
+            return
+
+    yield from pdf_backend.iter_pages(pdf_file)
+
+
+@traced()
+def join_pages(pages: Iterable[Tuple[int, str]]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Join page texts with newlines, copying each page once.
+
+    Returns the document text and a list of ``(char_offset, page_number)`` for
+    every non-empty page, in order.
+    """
+    parts = []
+    page_starts = []
+    offset = 0
+    for page_number, page_text in pages:
+        if page_text:
+            page_starts.append((offset, page_number))
+            parts.append(page_text)
+            parts.append("\n")
+            offset += len(page_text) + 1
+    return "".join(parts), page_starts
+
+
+@traced()
+def extract_text_from_pdf(pdf_file, max_workers: Optional[int] = None, backend: Optional[str] = None) -> str:
     """
     Accepts a file path or file-like object for PDF extraction.
     """
-    text = ""
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
+    text, _ = join_pages(iter_pdf_pages(pdf_file, max_workers=max_workers, backend=backend))
     return text
 
 
+# TXT files are decoded this many bytes at a time, so the raw bytes are never all in memory
+TXT_READ_BLOCK_BYTES = 1 << 20
+# Bytes sampled to guess the encoding of a file that has no BOM and is not UTF-8
+TXT_SAMPLE_BYTES = 64 * 1024
+# Used when the encoding cannot be guessed; undecodable bytes become U+FFFD
+TXT_FALLBACK_ENCODING = "cp1252"
+
+# UTF-32 first: its little-endian BOM starts with the UTF-16 one
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def _guess_encoding(sample: bytes) -> str:
+    """
+    Best guess from charset_normalizer when it is installed, else
+    TXT_FALLBACK_ENCODING. Mostly-English text fits several Latin code pages
+    equally well; the fallback wins those ties.
+    """
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return TXT_FALLBACK_ENCODING
+    matches = from_bytes(sample)
+    best = matches.best()
+    if best is None:
+        return TXT_FALLBACK_ENCODING
+    tied = [m for m in matches if (m.chaos, m.coherence) == (best.chaos, best.coherence)]
+    if any(TXT_FALLBACK_ENCODING in m.could_be_from_charset for m in tied):
+        return TXT_FALLBACK_ENCODING
+    return best.encoding
+
+
+def _decode_blocks(stream, encoding: str, errors: str) -> str:
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    parts = [decoder.decode(block) for block in iter(lambda: stream.read(TXT_READ_BLOCK_BYTES), b"")]
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def decode_text_stream(stream) -> str:
+    """
+    Decode a binary stream block by block. The encoding comes from a byte-order
+    mark if there is one; otherwise UTF-8 is tried, then a guess from a sample.
+    """
+    start = stream.tell()
+    head = stream.read(4)
+    stream.seek(start)
+    bom_encoding = next((encoding for bom, encoding in _BOMS if head.startswith(bom)), None)
+    if bom_encoding:
+        return _decode_blocks(stream, bom_encoding, "replace")
+    try:
+        return _decode_blocks(stream, "utf-8", "strict")
+    except UnicodeDecodeError:
+        stream.seek(start)
+        encoding = _guess_encoding(stream.read(TXT_SAMPLE_BYTES))
+        stream.seek(start)
+        current_span().set_attribute("txt.encoding", encoding)
+        return _decode_blocks(stream, encoding, "replace")
+
+
+@traced()
 def extract_text_from_txt(txt_file) -> str:
     """
     Accepts a file path or file-like object for TXT extraction.
     """
-    if isinstance(txt_file, str):
-        with open(txt_file, "r", encoding="utf-8") as file:
-            return file.read()
-    else:
-        txt_file.seek(0)
-        return txt_file.read().decode("utf-8")
+    if isinstance(txt_file, (str, os.PathLike)):
+        with open(txt_file, "rb") as file:
+            return decode_text_stream(file)
+    txt_file.seek(0)
+    return decode_text_stream(txt_file)
 
 # -----------------------------
 # Text chunking
 # -----------------------------
-def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size):
-        chunks.append(" ".join(words[i:i+chunk_size]))
-    return chunks
+# Context window of each supported model, in tokens
+MODEL_CONTEXT_TOKENS = {"gemini-2.5-flash": 1_048_576}
+DEFAULT_CHUNK_TOKENS = 4000
+DEFAULT_CHUNK_OVERLAP = 200
+# Room left in the context for the summarization prompt and the model's answer
+PROMPT_RESERVE_TOKENS = 1024
+OUTPUT_RESERVE_TOKENS = 65_536
+
+# Boundaries tried in order when a span is over budget: paragraph, sentence, line, word
+_CHUNK_BOUNDARIES = [
+    re.compile(r"\n[ \t]*\n\s*"),
+    re.compile(r"[.!?][\"')\]]*\s+"),
+    re.compile(r"\n"),
+    re.compile(r"\s+"),
+]
+
+_token_encoder = None
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with tiktoken's cl100k_base encoding, a close proxy for Gemini's
+    tokenizer. Falls back to ~4 characters per token if tiktoken is unavailable.
+    """
+    global _token_encoder
+    if _token_encoder is None:
+        try:
+            import tiktoken
+            _token_encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _token_encoder = False
+    if _token_encoder:
+        return len(_token_encoder.encode(text, disallowed_special=()))
+    return -(-len(text) // 4)
+
+def auto_chunk_tokens(model: str = MODEL_NAME) -> int:
+    """Largest chunk size that still fits the model's context with the prompt and output reserved."""
+    context = MODEL_CONTEXT_TOKENS.get(model, 32_768)
+    return max(DEFAULT_CHUNK_TOKENS, context - PROMPT_RESERVE_TOKENS - OUTPUT_RESERVE_TOKENS)
+
+def _split_units(text: str, start: int, end: int, max_tokens: int, level: int = 0) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yield ``(start, end, tokens)`` spans no larger than ``max_tokens``, splitting
+    at the coarsest boundary that works.
+    """
+    tokens = count_tokens(text[start:end])
+    if tokens <= max_tokens or level == len(_CHUNK_BOUNDARIES):
+        yield start, end, tokens
+        return
+
+    pos = start
+    for match in _CHUNK_BOUNDARIES[level].finditer(text, start, end):
+        if pos < match.end() < end:
+            if text[pos:match.end()].strip():
+                yield from _split_units(text, pos, match.end(), max_tokens, level + 1)
+            pos = match.end()
+    if text[pos:end].strip():
+        yield from _split_units(text, pos, end, max_tokens, level + 1)
+
+def _is_anchor(unit: str, tokens: int, anchor_tokens: int) -> bool:
+    """
+    Content-defined chunk boundary test: true for roughly one unit per
+    ``anchor_tokens`` tokens, decided only by the unit's own text.
+    """
+    digest = hashlib.blake2b(" ".join(unit.split()).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") < min(1.0, tokens / anchor_tokens) * 2 ** 64
+
+@traced()
+def chunk_text_spans(text: str, max_tokens=DEFAULT_CHUNK_TOKENS,
+                     overlap_tokens: int = DEFAULT_CHUNK_OVERLAP, model: str = MODEL_NAME,
+                     content_defined: bool = False) -> List[Tuple[int, int]]:
+    """
+    Character spans of the chunks produced by ``chunk_text``.
+    """
+    if max_tokens == "auto":
+        max_tokens = auto_chunk_tokens(model)
+    if max_tokens < 2:
+        raise ValueError(f"max_tokens must be at least 2, got {max_tokens}")
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    if not text.strip():
+        return []
+
+    units = list(_split_units(text, 0, len(text), max_tokens))
+    anchors = None
+    if content_defined:
+        anchors = [_is_anchor(text[start:end], tokens, max_tokens // 2) for start, end, tokens in units]
+    spans = []
+    i = 0
+    while i < len(units):
+        j = i
+        total = 0
+        while j < len(units) and (j == i or total + units[j][2] <= max_tokens):
+            total += units[j][2]
+            j += 1
+            if anchors and anchors[j - 1] and total >= max_tokens // 4:
+                break
+        spans.append((units[i][0], units[j - 1][1]))
+        if j >= len(units):
+            break
+
+        # Start the next chunk a few units back so context carries across the boundary
+        k = j
+        carried = 0
+        while k - 1 > i and carried + units[k - 1][2] <= overlap_tokens:
+            k -= 1
+            carried += units[k][2]
+        i = k
+    current_span().set_attributes({"chunk.max_tokens": str(max_tokens), "chunk.count": len(spans)})
+    return spans
+
+def chunk_text(text: str, max_tokens=DEFAULT_CHUNK_TOKENS,
+               overlap_tokens: int = DEFAULT_CHUNK_OVERLAP, model: str = MODEL_NAME,
+               content_defined: bool = False) -> List[str]:
+    """
+    Split text into chunks of at most ``max_tokens`` tokens, breaking at paragraph,
+    then sentence, then line boundaries. Consecutive chunks share up to
+    ``overlap_tokens`` of trailing context. Pass ``max_tokens="auto"`` to use the
+    largest chunk that fits ``model``'s context window.
+
+    With ``content_defined=True`` chunks also end after "anchor" units chosen by
+    a hash of their text, so an edit only moves the chunk boundaries near it and
+    the other chunks of a revised document come out identical.
+    """
+    spans = chunk_text_spans(text, max_tokens, overlap_tokens, model, content_defined)
+    return [text[start:end].strip() for start, end in spans]
 
 # -----------------------------
 # Audit-Specific Analysis Functions
 # -----------------------------
 
-def extract_financial_metrics(text: str) -> Dict[str, Any]:
-    """Extract key financial metrics from audit text"""
-    metrics = {
-        "revenue": [],
-        "expenses": [],
-        "assets": [],
-        "liabilities": [],
-        "ratios": [],
-        "percentages": []
-    }
-    
-    # Common patterns for financial figures
-    money_pattern = r'\$[\d,]+\.?\d*'
-    percentage_pattern = r'\d+\.?\d*%'
-    ratio_pattern = r'\d+\.?\d*:\d+\.?\d*'
-    
-    # Extract monetary values
-    money_matches = re.findall(money_pattern, text)
-    metrics["financial_figures"] = money_matches[:10]  # Limit to top 10
-    
-    # Extract percentages
-    percentage_matches = re.findall(percentage_pattern, text)
-    metrics["percentages"] = percentage_matches[:10]
-    
-    # Extract ratios
-    ratio_matches = re.findall(ratio_pattern, text)
-    metrics["ratios"] = ratio_matches[:5]
-    
-    return metrics
+def extract_financial_metrics(text: str, page_offsets: Optional[List[Tuple[int, int]]] = None) -> Dict[str, Any]:
+    """
+    Extract key financial metrics from audit text.
 
+    Scans the text once for money values, percentages and ratios (see
+    financial_figures.py) and returns the first few of each, money values
+    grouped into revenue/expenses/assets/liabilities, plus ``figure_counts``.
+    Use ``scan_text`` directly for every figure with its value, offset and page.
+    """
+    return summarize_figures(scan_text(text, page_offsets))
+
+# Token budgets for document-level prompts, filled with the document's most
+# informative sentences instead of its first few thousand characters
+FINDINGS_EXCERPT_TOKENS = 750
+COMPLIANCE_EXCERPT_TOKENS = 500
+
+@traced()
+def salient_excerpt(text: str, max_tokens: int) -> str:
+    """
+    The sentences of ``text`` that best cover the whole document, within
+    ``max_tokens``. Falls back to the opening ~4 characters per token if NumPy
+    is unavailable.
+    """
+    try:
+        from salience import select_salient
+    except ImportError:
+        return text[:max_tokens * 4]
+    return select_salient(text, max_tokens, count_tokens)
+
+@traced()
 def analyze_audit_findings(text: str) -> Dict[str, Any]:
     """Analyze audit findings using AI"""
     prompt = f"""
@@ -98,18 +533,16 @@ def analyze_audit_findings(text: str) -> Dict[str, Any]:
     
     Format the response as structured text with clear sections.
     
-    Text to analyze:
-    {text[:3000]}  # Limit text to avoid token limits
+    Key excerpts from the audit text:
+    {salient_excerpt(text, FINDINGS_EXCERPT_TOKENS)}
     """
     
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", contents=prompt
-        )
-        return {"analysis": response.text.strip()}
+        return {"analysis": _generate(prompt)}
     except Exception as e:
         return {"analysis": f"Error in AI analysis: {str(e)}"}
 
+@traced()
 def generate_compliance_checklist(text: str) -> Dict[str, Any]:
     """Generate compliance checklist based on audit content"""
     prompt = f"""
@@ -128,17 +561,15 @@ def generate_compliance_checklist(text: str) -> Dict[str, Any]:
     2. Short-term improvements
     3. Long-term strategic changes
     
-    Text: {text[:2000]}
+    Key excerpts: {salient_excerpt(text, COMPLIANCE_EXCERPT_TOKENS)}
     """
     
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", contents=prompt
-        )
-        return {"checklist": response.text.strip()}
+        return {"checklist": _generate(prompt)}
     except Exception as e:
         return {"checklist": f"Error generating checklist: {str(e)}"}
 
+@traced()
 def categorize_risk_levels(findings_text: str) -> Dict[str, List[str]]:
     """Categorize findings by risk level"""
     prompt = f"""
@@ -154,10 +585,7 @@ def categorize_risk_levels(findings_text: str) -> Dict[str, List[str]]:
     """
     
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", contents=prompt
-        )
-        return {"risk_categorization": response.text.strip()}
+        return {"risk_categorization": _generate(prompt)}
     except Exception as e:
         return {"risk_categorization": f"Error in risk categorization: {str(e)}"}
 
@@ -165,12 +593,9 @@ def categorize_risk_levels(findings_text: str) -> Dict[str, List[str]]:
 # Enhanced Summarization Functions
 # -----------------------------
 
-def summarize_chunk_gemini(chunk: str, style: str = "concise", audit_focus: bool = False) -> str:
-    """
-    Summarize a chunk of text using Gemini AI API with optional audit focus.
-    """
+def _build_chunk_prompt(chunk: str, style: str, audit_focus: bool) -> str:
     if audit_focus:
-        prompt = f"""
+        return f"""
         Summarize this audit text in {style} style, focusing on:
         - Key audit findings and observations
         - Financial figures and metrics
@@ -180,17 +605,62 @@ def summarize_chunk_gemini(chunk: str, style: str = "concise", audit_focus: bool
         
         Text: {chunk}
         """
-    else:
-        prompt = f"Summarize the following text in a {style} style:\n\n{chunk}"
-    
-    response = client.models.generate_content(
-        model="gemini-2.5-flash", contents=prompt
-    )
-    return response.text.strip()
+    return f"Summarize the following text in a {style} style:\n\n{chunk}"
 
-def generate_audit_executive_summary(text: str, financial_metrics: Dict, findings: Dict) -> str:
-    """Generate executive summary specifically for audit reports"""
-    prompt = f"""
+@traced()
+def summarize_chunk_gemini(chunk: str, style: str = "concise", audit_focus: bool = False) -> str:
+    """
+    Summarize a chunk of text using Gemini AI API with optional audit focus.
+    """
+    return _generate(_build_chunk_prompt(chunk, style, audit_focus))
+
+@traced()
+def summarize_chunk_gemini_stream(chunk: str, style: str = "concise", audit_focus: bool = False) -> Iterator[str]:
+    """
+    Streaming variant of summarize_chunk_gemini that yields text as it is generated.
+    """
+    yield from _generate_stream(_build_chunk_prompt(chunk, style, audit_focus))
+
+@traced()
+def summarize_chunks_concurrently(chunks: List[str], style: str = "concise", audit_focus: bool = False,
+                                  max_workers: int = SUMMARY_MAX_WORKERS,
+                                  progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
+    """
+    Summarize chunks on a bounded thread pool, keeping results in chunk order.
+
+    A failing chunk yields an error string in its slot instead of aborting the run.
+    ``progress_callback(completed, total)`` is called from the calling thread as
+    each chunk finishes, so it can safely update Streamlit elements.
+    """
+    summaries = [""] * len(chunks)
+    if not chunks:
+        return summaries
+
+    def summarize_one(i: int, chunk: str) -> str:
+        with span("chunk", **{"chunk.index": i, "chunk.chars": len(chunk)}):
+            return summarize_chunk_gemini(chunk, style, audit_focus)
+
+    completed = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        # Each worker runs in a copy of the caller's context, so its calls count toward the
+        # caller's stage and its spans nest under the caller's span
+        futures = {
+            executor.submit(contextvars.copy_context().run, summarize_one, i, chunk): i
+            for i, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                summaries[i] = future.result()
+            except Exception as e:
+                summaries[i] = f"Error summarizing section {i+1}: {str(e)}"
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, len(chunks))
+    return summaries
+
+def _build_executive_summary_prompt(text: str, financial_metrics: Dict) -> str:
+    return f"""
     Create an executive summary for this audit report including:
     
     1. AUDIT OVERVIEW (scope, period, methodology)
@@ -203,18 +673,152 @@ def generate_audit_executive_summary(text: str, financial_metrics: Dict, finding
     Make it suitable for senior management and board members.
     Limit to 300-400 words.
     
-    Audit text: {text[:3000]}
+    Key excerpts from the audit text: {salient_excerpt(text, FINDINGS_EXCERPT_TOKENS)}
     Financial metrics: {str(financial_metrics)}
     """
-    
+
+@traced()
+def generate_audit_executive_summary(text: str, financial_metrics: Dict, findings: Dict) -> str:
+    """Generate executive summary specifically for audit reports"""
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", contents=prompt
-        )
-        return response.text.strip()
+        return _generate(_build_executive_summary_prompt(text, financial_metrics))
     except Exception as e:
         return f"Error generating executive summary: {str(e)}"
 
+@traced()
+def generate_audit_executive_summary_stream(text: str, financial_metrics: Dict, findings: Dict) -> Iterator[str]:
+    """Streaming variant of generate_audit_executive_summary that yields text as it is generated"""
+    try:
+        yield from _generate_stream(_build_executive_summary_prompt(text, financial_metrics))
+    except Exception as e:
+        yield f"Error generating executive summary: {str(e)}"
+
+# -----------------------------
+# Fused single-request analysis
+# -----------------------------
+_STRING_LIST = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+FUSED_ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "findings": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "finding": {"type": "STRING"},
+                    "risk_level": {"type": "STRING", "enum": ["High", "Medium", "Low"]},
+                    "recommendation": {"type": "STRING"},
+                    "management_response": {"type": "STRING"},
+                },
+                "required": ["finding", "risk_level"],
+            },
+        },
+        "compliance": {
+            "type": "OBJECT",
+            "properties": {
+                "compliant_areas": _STRING_LIST,
+                "non_compliant_areas": _STRING_LIST,
+                "areas_needing_review": _STRING_LIST,
+                "regulatory_standards": _STRING_LIST,
+                "immediate_actions": _STRING_LIST,
+                "short_term_improvements": _STRING_LIST,
+                "long_term_changes": _STRING_LIST,
+            },
+        },
+        "executive_summary": {"type": "STRING"},
+    },
+    "required": ["findings", "compliance", "executive_summary"],
+}
+
+def _bullets(items: List[str], marker: str = "-", empty: str = "None identified") -> str:
+    return "\n".join(f"{marker} {item}" for item in items) if items else f"{marker} {empty}"
+
+def _format_fused_findings(findings: List[Dict[str, str]], compliance: Dict[str, List[str]]) -> str:
+    """Render structured findings in the section layout of analyze_audit_findings."""
+    recommendations = [f["recommendation"] for f in findings if f.get("recommendation")]
+    responses = [f["management_response"] for f in findings if f.get("management_response")]
+    return "\n\n".join([
+        "1. AUDIT FINDINGS\n" + _bullets([f["finding"] for f in findings]),
+        "2. RECOMMENDATIONS\n" + _bullets(recommendations),
+        "3. RISK LEVEL\n" + _bullets([f"{f['finding']}: {f['risk_level']}" for f in findings]),
+        "4. COMPLIANCE STATUS\n"
+        + _bullets([f"Compliant: {a}" for a in compliance.get("compliant_areas", [])]
+                   + [f"Non-compliant: {a}" for a in compliance.get("non_compliant_areas", [])]),
+        "5. MANAGEMENT RESPONSE\n" + _bullets(responses, empty="No management response provided"),
+    ])
+
+def _format_fused_risks(findings: List[Dict[str, str]]) -> str:
+    """Render findings grouped by risk level, as categorize_risk_levels does."""
+    sections = []
+    for level, label in (("High", "HIGH RISK"), ("Medium", "MEDIUM RISK"), ("Low", "LOW RISK")):
+        items = [f["finding"] for f in findings if f.get("risk_level") == level]
+        sections.append(f"{label}:\n" + _bullets(items, empty="None"))
+    return "\n\n".join(sections)
+
+def _format_fused_checklist(compliance: Dict[str, List[str]]) -> str:
+    """Render the compliance block in the generate_compliance_checklist layout."""
+    areas = ([f"✓ {a}" for a in compliance.get("compliant_areas", [])]
+             + [f"✗ {a}" for a in compliance.get("non_compliant_areas", [])]
+             + [f"? {a}" for a in compliance.get("areas_needing_review", [])])
+    return "\n\n".join([
+        "COMPLIANCE AREAS REVIEWED:\n" + ("\n".join(areas) if areas else "None identified"),
+        "REGULATORY STANDARDS MENTIONED:\n" + _bullets(compliance.get("regulatory_standards", [])),
+        "ACTION ITEMS:\n"
+        + "1. Immediate actions required\n" + _bullets(compliance.get("immediate_actions", []), "   -", "None") + "\n"
+        + "2. Short-term improvements\n" + _bullets(compliance.get("short_term_improvements", []), "   -", "None") + "\n"
+        + "3. Long-term strategic changes\n" + _bullets(compliance.get("long_term_changes", []), "   -", "None"),
+    ])
+
+@traced()
+def analyze_audit_fused(text: str, financial_metrics: Dict = None) -> Dict[str, Any]:
+    """
+    Get findings, risk levels, compliance status and the executive summary in a
+    single structured-output request.
+
+    Returns ``audit_analysis``, ``risk_categorization`` and ``compliance_checklist``
+    dicts shaped like the results of the individual helpers, plus the
+    ``executive_summary`` string and the parsed ``structured`` response.
+    """
+    prompt = f"""
+    You are reviewing an audit report. From the text below, produce:
+    
+    - findings: each significant issue, deficiency or non-compliance, with a risk level
+      (High: critical, immediate attention; Medium: timely resolution; Low: minor improvement),
+      the recommended corrective action and any management response
+    - compliance: compliant areas, non-compliant areas, areas needing further review,
+      regulatory standards or frameworks mentioned, and immediate, short-term and
+      long-term action items
+    - executive_summary: a 300-400 word summary for senior management and board members
+      covering audit overview, key findings, financial highlights, overall risk rating,
+      top priority recommendations and the overall audit opinion
+    
+    Key excerpts from the audit text: {salient_excerpt(text, FINDINGS_EXCERPT_TOKENS)}
+    Financial metrics: {str(financial_metrics or {})}
+    """
+    config = {"response_mime_type": "application/json", "response_schema": FUSED_ANALYSIS_SCHEMA}
+
+    try:
+        data = json.loads(_generate(prompt, config=config))
+        findings = data.get("findings", [])
+        compliance = data.get("compliance", {})
+        return {
+            "audit_analysis": {"analysis": _format_fused_findings(findings, compliance)},
+            "risk_categorization": {"risk_categorization": _format_fused_risks(findings)},
+            "compliance_checklist": {"checklist": _format_fused_checklist(compliance)},
+            "executive_summary": data.get("executive_summary", "").strip(),
+            "structured": data,
+        }
+    except Exception as e:
+        error = f"Error in fused analysis: {str(e)}"
+        return {
+            "audit_analysis": {"analysis": error},
+            "risk_categorization": {"risk_categorization": error},
+            "compliance_checklist": {"checklist": error},
+            "executive_summary": error,
+            "structured": {},
+        }
+
 # -----------------------------
 # Aggregate summaries
 # -----------------------------
@@ -225,184 +829,57 @@ def aggregate_summaries(summaries: List[str]) -> str:
 # Enhanced Download Formatting Functions
 # -----------------------------
 
+@traced()
 def format_audit_report_comprehensive(filename: str, original_text: str, final_summary: str, 
                                     financial_metrics: Dict, audit_analysis: Dict, 
                                     compliance_checklist: Dict, chunk_summaries: List[str] = None) -> str:
     """
     Format comprehensive audit report with all analysis.
+
+    Builds a one-off report model; to render several formats of one analysis,
+    build it once with ``report.build_report`` and use its renderers.
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    content = f"""
-COMPREHENSIVE AUDIT ANALYSIS REPORT
-{'='*60}
-Original File: {filename}
-Generated: {timestamp}
-Analysis Type: AI-Powered Audit Summarization
-{'='*60}
-
-EXECUTIVE SUMMARY
-{'-'*20}
-{final_summary}
-
-FINANCIAL METRICS EXTRACTED
-{'-'*30}
-Key Financial Figures: {', '.join(financial_metrics.get('financial_figures', [])[:5])}
-Percentages Found: {', '.join(financial_metrics.get('percentages', [])[:5])}
-Ratios Identified: {', '.join(financial_metrics.get('ratios', []))}
-
-DETAILED AUDIT ANALYSIS
-{'-'*25}
-{audit_analysis.get('analysis', 'No analysis available')}
-
-COMPLIANCE CHECKLIST
-{'-'*20}
-{compliance_checklist.get('checklist', 'No checklist generated')}
-
-AUDIT TRAIL DOCUMENTATION
-{'-'*30}
-Document Processing Timestamp: {timestamp}
-AI Model Used: Gemini-2.5-Flash
-Analysis Method: Chunk-based processing with audit-specific prompts
-Total Chunks Processed: {len(chunk_summaries) if chunk_summaries else 0}
-Original Document Size: {len(original_text)} characters
-Summary Compression Ratio: {len(final_summary)/len(original_text)*100:.1f}%
-
-"""
-    
-    if chunk_summaries:
-        content += f"\nDETAILED CHUNK ANALYSIS\n{'-'*25}\n"
-        for i, chunk_summary in enumerate(chunk_summaries, 1):
-            content += f"\nSection {i} Analysis:\n{chunk_summary}\n"
-    
-    content += f"\n{'='*60}\nReport generated by AI-Powered Audit Summarizer\n{'='*60}"
-    
-    return content
+    report = build_report(filename, original_text, final_summary, financial_metrics, audit_analysis,
+                          compliance_checklist, chunk_summaries)
+    return render_report(report, "comprehensive")
 
+@traced()
 def format_audit_json_report(filename: str, original_text: str, final_summary: str,
                            financial_metrics: Dict, audit_analysis: Dict,
-                           compliance_checklist: Dict, chunk_summaries: List[str] = None) -> str:
+                           compliance_checklist: Dict, chunk_summaries: List[str] = None,
+                           processing_metrics: Optional[Dict[str, Any]] = None) -> str:
     """
     Format audit report as structured JSON.
+
+    ``processing_metrics`` (the pipeline's per-stage time, token and cost
+    breakdown) is recorded in the audit trail when given.
     """
-    timestamp = datetime.now().isoformat()
-    
-    data = {
-        "audit_report_metadata": {
-            "original_file": filename,
-            "generated_timestamp": timestamp,
-            "ai_model": "Gemini-2.5-Flash",
-            "processing_method": "audit-focused-analysis",
-            "document_stats": {
-                "original_length": len(original_text),
-                "summary_length": len(final_summary),
-                "compression_ratio": f"{len(final_summary)/len(original_text)*100:.1f}%",
-                "chunks_processed": len(chunk_summaries) if chunk_summaries else 0
-            }
-        },
-        "executive_summary": final_summary,
-        "financial_analysis": financial_metrics,
-        "audit_findings": audit_analysis,
-        "compliance_assessment": compliance_checklist,
-        "detailed_analysis": {
-            "chunk_summaries": chunk_summaries or [],
-            "processing_notes": "Each chunk analyzed with audit-specific AI prompts"
-        },
-        "audit_trail": {
-            "processing_timestamp": timestamp,
-            "validation_status": "AI-generated, requires human review",
-            "confidence_level": "Medium - AI analysis should be verified by qualified auditor"
-        }
-    }
-    
-    return json.dumps(data, indent=2, ensure_ascii=False)
+    report = build_report(filename, original_text, final_summary, financial_metrics, audit_analysis,
+                          compliance_checklist, chunk_summaries, processing_metrics=processing_metrics)
+    return render_report(report, "json")
 
+@traced()
 def format_audit_markdown_report(filename: str, original_text: str, final_summary: str,
                                 financial_metrics: Dict, audit_analysis: Dict,
                                 compliance_checklist: Dict, chunk_summaries: List[str] = None) -> str:
     """
     Format audit report as professional Markdown.
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    content = f"""# 🔍 Comprehensive Audit Analysis Report
-
-## 📋 Report Information
-- **Original File:** {filename}
-- **Generated:** {timestamp}
-- **Analysis Method:** AI-Powered Audit Summarization
-- **Processing Model:** Gemini-2.5-Flash
-
----
-
-## 📊 Executive Summary
-
-{final_summary}
-
----
-
-## 💰 Financial Metrics Analysis
-
-### Key Financial Figures
-{', '.join(financial_metrics.get('financial_figures', ['None identified'])[:8])}
-
-### Percentages & Ratios
-- **Percentages:** {', '.join(financial_metrics.get('percentages', ['None'])[:5])}
-- **Ratios:** {', '.join(financial_metrics.get('ratios', ['None'])[:3])}
-
----
-
-## 🎯 Detailed Audit Analysis
-
-{audit_analysis.get('analysis', '*No detailed analysis available*')}
-
----
-
-## ✅ Compliance Assessment
-
-{compliance_checklist.get('checklist', '*No compliance checklist generated*')}
-
----
-
-## 📈 Document Statistics
-
-| Metric | Value |
-|--------|--------|
-| Original Length | {len(original_text):,} characters |
-| Summary Length | {len(final_summary):,} characters |
-| Compression Ratio | {len(final_summary)/len(original_text)*100:.1f}% |
-| Sections Analyzed | {len(chunk_summaries) if chunk_summaries else 0} |
-
----
-
-## 🔗 Audit Trail
-
-- **Processing Timestamp:** {timestamp}
-- **AI Model:** Gemini-2.5-Flash
-- **Validation Status:** ⚠️ AI-generated content requires human review
-- **Confidence Level:** Medium - Should be verified by qualified auditor
-
-"""
-
-    if chunk_summaries:
-        content += f"\n---\n\n## 📑 Detailed Section Analysis\n\n"
-        for i, chunk_summary in enumerate(chunk_summaries, 1):
-            content += f"### Section {i}\n\n{chunk_summary}\n\n"
-
-    content += f"\n---\n\n*Report generated by AI-Powered Audit Summarizer v2.0*\n"
-    
-    return content
+    report = build_report(filename, original_text, final_summary, financial_metrics, audit_analysis,
+                          compliance_checklist, chunk_summaries)
+    return render_report(report, "markdown")
 
 # Legacy formatting functions (for backward compatibility)
+@traced()
 def format_summary_as_text(filename: str, final_summary: str, chunk_summaries: List[str] = None) -> str:
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    content = f"AI REPORT SUMMARY\n{'='*50}\nOriginal File: {filename}\nGenerated: {timestamp}\n{'='*50}\n\nFINAL SUMMARY\n{'-'*20}\n{final_summary}\n\n"
+    parts = [f"AI REPORT SUMMARY\n{'='*50}\nOriginal File: {filename}\nGenerated: {timestamp}\n{'='*50}\n\nFINAL SUMMARY\n{'-'*20}\n{final_summary}\n\n"]
     if chunk_summaries:
-        content += f"DETAILED CHUNK SUMMARIES\n{'-'*30}\n"
-        for i, chunk_summary in enumerate(chunk_summaries, 1):
-            content += f"Chunk {i}:\n{chunk_summary}\n\n"
-    return content
+        parts.append(f"DETAILED CHUNK SUMMARIES\n{'-'*30}\n")
+        parts.extend(f"Chunk {i}:\n{chunk_summary}\n\n" for i, chunk_summary in enumerate(chunk_summaries, 1))
+    return "".join(parts)
 
+@traced()
 def format_summary_as_json(filename: str, final_summary: str, chunk_summaries: List[str] = None) -> str:
     timestamp = datetime.now().isoformat()
     data = {
@@ -411,12 +888,12 @@ def format_summary_as_json(filename: str, final_summary: str, chunk_summaries: L
     }
     return json.dumps(data, indent=2, ensure_ascii=False)
 
+@traced()
 def format_summary_as_markdown(filename: str, final_summary: str, chunk_summaries: List[str] = None) -> str:
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    content = f"# AI Report Summary\n\n**Original File:** {filename}  \n**Generated:** {timestamp}  \n\n---\n\n## Final Summary\n\n{final_summary}\n\n"
+    parts = [f"# AI Report Summary\n\n**Original File:** {filename}  \n**Generated:** {timestamp}  \n\n---\n\n## Final Summary\n\n{final_summary}\n\n"]
     if chunk_summaries:
-        content += f"## Detailed Chunk Summaries\n\n"
-        for i, chunk_summary in enumerate(chunk_summaries, 1):
-            content += f"### Chunk {i}\n\n{chunk_summary}\n\n"
+        parts.append("## Detailed Chunk Summaries\n\n")
+        parts.extend(f"### Chunk {i}\n\n{chunk_summary}\n\n" for i, chunk_summary in enumerate(chunk_summaries, 1))
 
-    return content
+    return "".join(parts)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live flat in the "AI report" directory, like the benchmarks expect
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
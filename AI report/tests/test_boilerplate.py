@@ -0,0 +1,45 @@
+import random
+
+from boilerplate import cluster_near_duplicates, simhash, strip_boilerplate
+
+BODY = ("The internal audit team reviewed the procurement cycle and found that purchase orders above the "
+        "approval threshold were released without a second signature in several cases during the year, "
+        "and management agreed to enforce the dual approval control in the purchasing system by the end "
+        "of the next quarter with monthly monitoring by the finance director")
+
+
+def _section(seed: int, words: int = 300) -> str:
+    vocabulary = sorted(set(BODY.split()))
+    rng = random.Random(seed)
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def test_near_duplicate_chunks_share_a_representative():
+    text = _section(1)
+    words = text.split()
+    variant = " ".join(words[:150] + ["remediated"] + words[151:])
+    other = _section(2)
+    assert bin(simhash(text) ^ simhash(variant)).count("1") <= 3
+    assert cluster_near_duplicates([text, other, variant, text.replace(" ", "  ")]) == [0, 1, 0, 0]
+
+
+def test_short_chunks_are_not_compared():
+    assert simhash("Too short to compare.") is None
+    assert cluster_near_duplicates(["Page 1 of 9", "Page 2 of 9"]) == [0, 1]
+
+
+def test_repeated_page_lines_are_removed_after_the_first():
+    # Findings sit between three lines of distinct text, away from the page edges
+    pages = ["ACME Corp Internal Audit Report 2025\n" + "\n".join(f"Section {i}.{j} notes." for j in range(3))
+             + f"\nFinding {i}: {BODY}\n" + "\n".join(f"Reference {i}-{j}." for j in range(3)) + f"\nPage {i} of 4"
+             for i in range(1, 5)]
+    offsets, text = [], ""
+    for number, page in enumerate(pages, 1):
+        offsets.append((len(text), number))
+        text += page + "\n"
+    cleaned = strip_boilerplate(text, offsets)
+    assert cleaned.text.count("ACME Corp Internal Audit Report 2025") == 1
+    assert cleaned.text.count("of 4") == 1
+    assert all(f"Finding {i}:" in cleaned.text for i in range(1, 5))
+    assert [number for _, number in cleaned.page_offsets] == [1, 2, 3, 4]
+    assert cleaned.tokens_saved > 0
@@ -0,0 +1,47 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from chunk_export import chunk_output_path, chunk_stats, classify_risk, read_chunk_table, write_chunk_file
+from financial_figures import scan_text
+
+
+def _rows(count):
+    return [{"document": "a.pdf", "document_sha256": "ab" * 32, "generated_at": datetime(2025, 1, 1),
+             "chunk_index": i, "char_start": i * 10, "char_end": i * 10 + 10, "page_start": 1, "page_end": 1,
+             "chunk_tokens": 5, "summary_tokens": 3, "summary": f"Summary {i}", "figures": ["$1m"],
+             "figure_count": 1, "risk_label": "none"} for i in range(count)]
+
+
+def test_classify_risk_levels_and_negation():
+    assert classify_risk("A material weakness in revenue controls.") == "high"
+    assert classify_risk("No material weakness was identified.") == "none"
+    assert classify_risk("Two exceptions were noted; we recommend training.") == "medium"
+    assert classify_risk("Minor observations only.") == "low"
+
+
+def test_rewriting_a_document_replaces_its_rows(tmp_path):
+    path = chunk_output_path(str(tmp_path), "jsonl", "ab" * 32, "opts")
+    write_chunk_file(path, "jsonl", _rows(3))
+    write_chunk_file(path, "jsonl", _rows(2))
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["chunk_index"] for line in f] == [0, 1]
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+
+
+def test_parquet_files_read_back_as_one_table(tmp_path):
+    pytest.importorskip("pyarrow")
+    for sha in ("aa" * 32, "bb" * 32):
+        write_chunk_file(chunk_output_path(str(tmp_path), "parquet", sha, "opts"), "parquet", _rows(2))
+    table = read_chunk_table(str(tmp_path / "chunks_parquet"))
+    assert table.num_rows == 4
+
+
+def test_chunk_stats_places_figures_by_offset():
+    text = "Revenue was $4.2 million.\n\nCosts rose 12% to $1.1 million.\n\nNo figures here."
+    spans = [(0, 27), (27, 62), (62, len(text))]
+    stats = chunk_stats([text[start:end] for start, end in spans], spans, [(0, 1)], scan_text(text, [(0, 1)]))
+    assert [row["figures"] for row in stats] == [["$4.2 million"], ["12%", "$1.1 million"], []]
+    assert [row["page_start"] for row in stats] == [1, 1, 1]
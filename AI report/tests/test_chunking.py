@@ -0,0 +1,17 @@
+import pytest
+
+from summarizer import chunk_text_spans
+
+TEXT = "Revenue grew 12% year over year. Operating margin narrowed.\n\nCash flow improved. Debt was refinanced."
+
+
+@pytest.mark.parametrize("content_defined", [False, True])
+def test_chunk_text_spans_rejects_windows_below_two_tokens(content_defined):
+    for max_tokens in (0, 1):
+        with pytest.raises(ValueError, match="at least 2"):
+            chunk_text_spans(TEXT, max_tokens=max_tokens, content_defined=content_defined)
+
+
+def test_content_defined_chunking_with_the_smallest_window():
+    spans = chunk_text_spans(TEXT, max_tokens=2, overlap_tokens=0, content_defined=True)
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT)
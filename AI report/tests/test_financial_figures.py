@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import pytest
+
+from financial_figures import scan_text, summarize_figures
+
+
+def _money(text):
+    return [(f.value, f.currency) for f in scan_text(text) if f.kind == "money"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Revenue was $1,234.56", (Decimal("1234.56"), "USD")),
+    ("USD 3.4bn", (Decimal("3400000000"), "USD")),
+    ("€2.5 million", (Decimal("2500000"), "EUR")),
+    ("£750k", (Decimal("750000"), "GBP")),
+    ("US$12", (Decimal("12"), "USD")),
+    ("Expenses 2,000 EUR", (Decimal("2000"), "EUR")),
+    ("3.5 million dollars", (Decimal("3500000"), "USD")),
+    ("5bn euros", (Decimal("5000000000"), "EUR")),
+    ("10 pounds sterling", (Decimal("10"), "GBP")),
+    ("100 yen", (Decimal("100"), "JPY")),
+])
+def test_money_values_and_currencies(text, expected):
+    assert _money(text) == [expected]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Net loss ($120)", Decimal("-120")),
+    ("Net loss $(120)", Decimal("-120")),
+    ("Net loss -$45.5", Decimal("-45.5")),
+    ("Impairment (450) EUR", Decimal("-450")),
+    ("Adjustment -12 GBP", Decimal("-12")),
+])
+def test_negative_amounts(text, expected):
+    assert [value for value, _ in _money(text)] == [expected]
+
+
+def test_unpaired_bracket_is_not_part_of_the_figure():
+    (figure,) = scan_text("(see note: $500")
+    assert figure.raw == "$500"
+    assert figure.value == Decimal("500")
+
+
+def test_values_are_exact_decimals():
+    (figure,) = scan_text("$0.1")
+    assert figure.value == Decimal("0.1")
+
+
+def test_percentages_and_ratios():
+    figures = scan_text("Margin fell 2.5% and the current ratio is 3:2; growth of 4 per cent")
+    assert [(f.kind, f.value) for f in figures] == [
+        ("percentage", Decimal("2.5")), ("ratio", Decimal("1.5")), ("percentage", Decimal("4"))]
+
+
+def test_categories_offsets_and_pages():
+    text = "Total revenue of $5m.\nLiabilities were $2m."
+    figures = scan_text(text, page_offsets=[(0, 1), (22, 2)])
+    assert [(f.category, f.page) for f in figures] == [("revenue", 1), ("liabilities", 2)]
+    assert [text[f.offset:f.offset + len(f.raw)] for f in figures] == ["$5m", "$2m"]
+
+
+def test_summarize_figures_counts_every_kind():
+    metrics = summarize_figures(scan_text("Revenue $5m, costs 2,000 EUR, margin 12%, ratio 2:1"))
+    assert metrics["revenue"] == ["$5m"]
+    assert metrics["expenses"] == ["2,000 EUR"]
+    assert metrics["figure_counts"] == {"money": 2, "percentage": 1, "ratio": 1}
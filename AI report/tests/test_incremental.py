@@ -0,0 +1,44 @@
+import incremental
+import summarizer
+from incremental import AnalysisStore, IncrementalRun, document_series_id, failed_results
+
+
+def test_failed_results_lists_error_messages():
+    results = {
+        "summaries": ["Revenue grew.", "Error summarizing section 2: 429 RESOURCE_EXHAUSTED"],
+        "final_summary": "Error generating executive summary: 503",
+        "audit_analysis": {"analysis": "Findings."},
+        "risk_categorization": {"risk_categorization": "Error in risk categorization: timeout"},
+        "compliance_checklist": {},
+    }
+    assert failed_results(results) == ["summaries[1]", "final_summary", "risk_categorization"]
+
+
+def test_failed_results_empty_when_every_call_succeeded():
+    results = {"summaries": ["A.", "B."], "final_summary": "Summary.", "audit_analysis": {"analysis": "Error rates fell."}}
+    assert failed_results(results) == []
+
+
+def test_document_series_id_strips_version_markers():
+    assert document_series_id("Annual_Report_v7.pdf") == "annual_report"
+    assert document_series_id("audit-draft3 (2).txt") == "audit"
+
+
+def test_fake_backend_results_are_not_reused_by_gemini_runs(monkeypatch):
+    monkeypatch.setattr(summarizer, "client", None)
+    monkeypatch.setattr(incremental, "summarize_chunks_concurrently",
+                        lambda chunks, **kwargs: [f"{summarizer.active_backend_name()} summary" for _ in chunks])
+    store = AnalysisStore(":memory:")
+    chunks = ["Revenue grew 12% year over year.", "Operating margin narrowed."]
+
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    fake_run = IncrementalRun(store, "report")
+    assert fake_run.summarize(chunks, "Executive Summary", False) == ["fake summary", "fake summary"]
+    assert fake_run.memoize("final_summary", lambda **kwargs: "fake final")(summaries=chunks) == "fake final"
+
+    monkeypatch.setenv("LLM_BACKEND", "gemini")
+    gemini_run = IncrementalRun(store, "report")
+    assert gemini_run.summarize(chunks, "Executive Summary", False) == ["gemini summary", "gemini summary"]
+    assert gemini_run.reused_chunks == 0
+    assert gemini_run.memoize("final_summary", lambda **kwargs: "gemini final")(summaries=chunks) == "gemini final"
+    assert gemini_run.stages_recomputed == ["final_summary"]
@@ -0,0 +1,31 @@
+import io
+import os
+import time
+
+from jobs import FAILED, QUEUED, JobStore
+from uploads import spool_upload
+
+
+def _store_and_upload(tmp_path):
+    upload = spool_upload(io.BytesIO(b"audit text " * 100), "a.txt", "text/plain", str(tmp_path / "uploads"))
+    return JobStore(str(tmp_path / "jobs.sqlite3")), upload
+
+
+def test_jobs_refer_to_the_spooled_upload(tmp_path):
+    store, upload = _store_and_upload(tmp_path)
+    store.create("j1", upload, {}, "key", "a")
+    assert store.get_document("j1") == upload
+    assert store.document_paths() == [upload.path]
+    os.unlink(upload.path)
+    assert store.get_document("j1") is None
+
+
+def test_only_jobs_without_a_recent_heartbeat_are_failed(tmp_path):
+    store, upload = _store_and_upload(tmp_path)
+    store.create("live", upload, {}, "key", "a", owner="server-1")
+    store.create("dead", upload, {}, "key", "a", owner="server-2")
+    store._conn.execute("UPDATE jobs SET heartbeat_at = ?", (time.time() - 120,))
+    store.heartbeat("server-1")
+    assert store.fail_abandoned("stopped", timeout_seconds=60) == 1
+    assert store.get("live")["status"] == QUEUED
+    assert store.get("dead")["status"] == FAILED
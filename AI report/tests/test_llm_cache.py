@@ -0,0 +1,66 @@
+from fake_gemini import FakeGeminiClient
+from llm_backend import backend_name, create_backend
+from llm_cache import make_cache_key
+
+
+def test_gemini_key_is_unchanged_by_backend_default():
+    assert make_cache_key("m", "p") == make_cache_key("m", "p", backend="gemini")
+
+
+def test_other_backends_get_their_own_keys():
+    gemini = make_cache_key("m", "p", {"temperature": 0})
+    fake = make_cache_key("m", "p", {"temperature": 0}, backend="fake")
+    assert fake != gemini
+    assert fake == make_cache_key("m", "p", {"temperature": 0}, backend="fake")
+
+
+def test_backend_names():
+    assert backend_name(FakeGeminiClient()) == "fake"
+    assert backend_name(create_backend("fake")) == "fake"
+
+    class Custom:
+        models = None
+
+    assert backend_name(Custom()) == "Custom"
+
+
+def _cache(tmp_path, **kwargs):
+    from llm_cache import LLMResponseCache
+    return LLMResponseCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", "value")
+    assert cache.get("k") == "value"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_eviction_drops_least_recently_used_below_the_limit(tmp_path):
+    cache = _cache(tmp_path, max_bytes=1000)
+    for i in range(9):
+        cache.put(f"k{i}", "x" * 100)
+    cache.get("k0")  # most recently used now
+    cache.put("k9", "x" * 100)
+    cache.put("k10", "x" * 100)  # over the limit: evict down to 90%
+    assert cache.stats()["bytes"] <= 900
+    assert cache.get("k0") is not None
+    assert cache.get("k1") is None
+
+
+def test_size_estimate_picks_up_other_writers(tmp_path):
+    import llm_cache
+    first, second = _cache(tmp_path, max_bytes=1000), _cache(tmp_path, max_bytes=1000)
+    for i in range(10):
+        second.put(f"other{i}", "x" * 100)
+    # first's own writes never take its estimate over the limit; the periodic recount sees second's
+    for i in range(llm_cache.HOUSEKEEPING_EVERY_PUTS):
+        first.put(f"mine{i}", "y" * (1000 // llm_cache.HOUSEKEEPING_EVERY_PUTS))
+    assert first.stats()["bytes"] <= 1000
+
+
+def test_expired_entries_are_not_served(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=0)
+    cache.put("k", "value")
+    assert cache.get("k") is None
@@ -0,0 +1,187 @@
+import pytest
+
+from fake_gemini import FakeAPIError
+from rate_limiter import RequestGovernor, TokenBucket, is_retryable, retry_hint_seconds
+
+
+class FakeClock:
+    """Manual time for the bucket and governor; ``sleep`` advances it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+# -----------------------------
+# Error classification
+# -----------------------------
+
+@pytest.mark.parametrize("error, retryable", [
+    (FakeAPIError(429, "quota"), True),
+    (FakeAPIError(503, "unavailable"), True),
+    (HTTPError(400), False),
+    (HTTPError(502), True),
+    (ConnectionError("reset"), True),
+    (ValueError("bad prompt"), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_retry_hint_from_header():
+    assert retry_hint_seconds(HTTPError(429, {"Retry-After": "7"})) == 7.0
+
+
+def test_retry_hint_from_retry_info_details():
+    assert retry_hint_seconds(FakeAPIError(429, "quota", retry_delay=2.5)) == 2.5
+
+
+def test_retry_hint_from_message():
+    assert retry_hint_seconds(Exception("429 Too Many Requests. Please retry in 12.5s.")) == 12.5
+    assert retry_hint_seconds(Exception("429 quota exceeded")) is None
+
+
+def test_unparseable_header_falls_through():
+    assert retry_hint_seconds(HTTPError(429, {"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+
+
+# -----------------------------
+# Token bucket
+# -----------------------------
+
+def test_bucket_allows_a_burst_of_its_capacity_then_waits_for_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(1.0)  # 60/min refills one token a second
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_bucket_caps_requests_larger_than_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(600, capacity=10, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire(50) == 0
+    assert bucket.acquire(5) == pytest.approx(0.5)
+
+
+def test_bucket_does_not_refill_past_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=3, clock=clock, sleep=clock.sleep)
+    clock.now += 3600
+    bucket.acquire(0)
+    assert bucket.tokens == 3
+
+
+# -----------------------------
+# Request governor
+# -----------------------------
+
+def _governor(clock, **kwargs):
+    kwargs.setdefault("base_delay", 1.0)
+    return RequestGovernor(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def _failing(errors, result="ok"):
+    """A call that raises each of ``errors`` in turn, then returns ``result``."""
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+def test_retries_retryable_errors_then_succeeds():
+    clock = FakeClock()
+    governor = _governor(clock, max_retries=3)
+    retried = []
+    assert governor.call(_failing([FakeAPIError(503, "busy")] * 2), on_retry=retried.append) == "ok"
+    stats = governor.stats()
+    assert (stats["requests"], stats["retries"], stats["succeeded"], stats["failed"]) == (3, 2, 1, 0)
+    assert len(retried) == 2
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    clock = FakeClock()
+    governor = _governor(clock)
+    with pytest.raises(ValueError):
+        governor.call(_failing([ValueError("bad")]))
+    assert governor.stats()["requests"] == 1
+    assert clock.slept == []
+
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    governor = _governor(clock, max_retries=2)
+    with pytest.raises(FakeAPIError):
+        governor.call(_failing([FakeAPIError(503, "busy")] * 5))
+    assert governor.stats()["requests"] == 3
+    assert governor.stats()["failed"] == 1
+
+
+def test_backoff_uses_the_server_hint(monkeypatch):
+    monkeypatch.setattr("rate_limiter.random.uniform", lambda low, high: high)
+    governor = _governor(FakeClock(), base_delay=0.5, max_delay=30)
+    assert governor.backoff_delay(0, FakeAPIError(429, "quota", retry_delay=4)) == 4.5
+    assert governor.backoff_delay(0, FakeAPIError(429, "quota", retry_delay=120)) == 30.5
+
+
+def test_backoff_without_hint_is_capped_exponential(monkeypatch):
+    monkeypatch.setattr("rate_limiter.random.uniform", lambda low, high: high)
+    governor = _governor(FakeClock(), base_delay=1.0, max_delay=10)
+    assert [governor.backoff_delay(attempt, FakeAPIError(503, "busy")) for attempt in range(5)] == [1, 2, 4, 8, 10]
+
+
+def test_aimd_halves_on_429_once_per_interval_and_grows_additively():
+    clock = FakeClock()
+    governor = _governor(clock, max_concurrency=16, initial_concurrency=8, max_retries=3, decrease_interval=1.0,
+                         base_delay=0.0)
+    governor.call(_failing([FakeAPIError(429, "quota")]))
+    # One halving for the 429, then +1/limit for the success
+    assert governor.limit == pytest.approx(4.25)
+
+    clock.now += 10
+    limit = governor.limit
+    governor._acquire_slot()
+    governor._release_slot(throttled=True)
+    assert governor.limit == pytest.approx(limit / 2)
+    # A second 429 within decrease_interval is part of the same burst
+    governor._acquire_slot()
+    governor._release_slot(throttled=True)
+    assert governor.limit == pytest.approx(limit / 2)
+
+
+def test_aimd_limit_stays_within_bounds():
+    clock = FakeClock()
+    governor = _governor(clock, max_concurrency=4, min_concurrency=1, initial_concurrency=4)
+    for _ in range(50):
+        governor.call(lambda: None)
+    assert governor.limit == 4
+    for _ in range(10):
+        clock.now += 2
+        governor._acquire_slot()
+        governor._release_slot(throttled=True)
+    assert governor.limit == 1
+
+
+def test_request_bucket_paces_calls():
+    clock = FakeClock()
+    governor = _governor(clock, requests_per_minute=60)
+    governor.request_bucket.tokens = 0
+    governor.call(lambda: None)
+    assert governor.stats()["wait_seconds"] == pytest.approx(1.0)
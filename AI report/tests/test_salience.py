@@ -0,0 +1,40 @@
+import gc
+import weakref
+
+import salience
+from salience import rank_sentences, select_salient, split_sentences
+
+
+class Text(str):
+    """A str that can be weakly referenced."""
+
+
+def test_split_sentences_keeps_table_rows_whole():
+    text = "Revenue rose. Costs fell.\n\nItem    2024    2025\nCash    10      12"
+    assert [text[start:end] for start, end in split_sentences(text)] == [
+        "Revenue rose.", "Costs fell.", "Item    2024    2025", "Cash    10      12"]
+
+
+def test_selection_fits_the_budget_in_document_order():
+    text = " ".join(f"Sentence {i} notes that control {i} over payments failed review." for i in range(200))
+    excerpt = select_salient(text, 60)
+    assert 0 < len(excerpt) // 4 <= 60
+    lines = excerpt.split("\n")
+    assert lines == sorted(lines, key=text.index)
+
+
+def test_ranking_cache_does_not_keep_the_text_alive():
+    text = Text("The auditor found a material weakness in revenue controls this year. " * 30
+                + "Cash of $5m was reconciled every month by finance staff. " * 30)
+    released = weakref.ref(text)
+    ranking = rank_sentences(text)
+    assert rank_sentences(str(text)) is ranking
+    del text
+    gc.collect()
+    assert released() is None
+
+
+def test_ranking_cache_is_bounded():
+    for i in range(salience.RANKING_CACHE_SIZE + 3):
+        rank_sentences(f"Document {i} reports that the payroll control failed its quarterly review.")
+    assert len(salience._rankings) == salience.RANKING_CACHE_SIZE
@@ -0,0 +1,61 @@
+import pytest
+
+import pdf_backends
+import tracing
+from summarizer import iter_pdf_pages, join_pages
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def flush(self):
+        pass
+
+
+class TextBackend:
+    name = "text"
+
+    def page_count(self, pdf_file):
+        return 2
+
+    def iter_pages(self, pdf_file, start=1, stop=None):
+        for page in range(start, (stop or 2) + 1):
+            yield page, f"page {page}"
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracing.set_tracer(tracing.Tracer([exporter]))
+    yield exporter
+    tracing.set_tracer(None)
+
+
+@pytest.fixture
+def text_backend(monkeypatch):
+    # Registered for this test only; the backend registry is process-wide
+    monkeypatch.setitem(pdf_backends._BACKENDS, "text", (TextBackend, ()))
+
+
+def test_pdf_backend_attributes_land_on_the_generator_span(exporter, text_backend):
+    with tracing.span("extract") as stage:
+        text, _ = join_pages(iter_pdf_pages("report.pdf", max_workers=1, backend="text"))
+    assert text == "page 1\npage 2\n"
+    spans = {span.name: span for span in exporter.spans}
+    assert spans["iter_pdf_pages"].attributes == {"pdf.backend": "text", "pdf.backend.reason": "requested"}
+    # The generator starts when join_pages first pulls a page
+    assert spans["iter_pdf_pages"].parent_id == spans["join_pages"].span_id
+    assert "pdf.backend" not in stage.attributes
+    assert "pdf.backend" not in spans["join_pages"].attributes
+
+
+def test_closing_the_generator_early_ends_its_span(exporter, text_backend):
+    pages = iter_pdf_pages("report.pdf", max_workers=1, backend="text")
+    next(pages)
+    pages.close()
+    (span,) = exporter.spans
+    assert span.attributes["generator.closed_early"] is True
@@ -0,0 +1,41 @@
+import pytest
+
+import uploads
+from uploads import shared_extraction
+
+
+@pytest.fixture(autouse=True)
+def empty_extractions(monkeypatch):
+    monkeypatch.setattr(uploads, "_extractions", type(uploads._extractions)())
+
+
+def test_shared_extraction_runs_once_per_key():
+    calls = []
+
+    def extract():
+        calls.append(1)
+        return "text", []
+
+    assert shared_extraction(("a.pdf", "application/pdf", None), extract) == ("text", [])
+    assert shared_extraction(("a.pdf", "application/pdf", None), extract) == ("text", [])
+    assert shared_extraction(("a.pdf", "application/pdf", "pypdf"), extract) == ("text", [])
+    assert len(calls) == 2
+
+
+def test_shared_extraction_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(uploads, "SHARED_EXTRACTION_ENTRIES", 2)
+    shared_extraction(("a",), lambda: "a")
+    shared_extraction(("b",), lambda: "b")
+    shared_extraction(("a",), lambda: "stale")
+    shared_extraction(("c",), lambda: "c")
+    assert shared_extraction(("a",), lambda: "stale") == "a"
+    assert shared_extraction(("b",), lambda: "b again") == "b again"
+
+
+def test_shared_extraction_does_not_keep_failures():
+    def fail():
+        raise ValueError("unreadable")
+
+    with pytest.raises(ValueError):
+        shared_extraction(("a",), fail)
+    assert shared_extraction(("a",), lambda: "text") == "text"
@@ -0,0 +1,360 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# -----------------------------
+# Spans
+# -----------------------------
+# Tracing is off unless TRACE_EXPORTER is set. Then span() and @traced return a
+# shared no-op span after one check, so instrumented code pays next to nothing.
+# The current span travels in a context variable; the scheduler and the chunk
+# worker pool run their work in copies of the caller's context, so spans opened
+# there nest under the stage or pipeline span that started them.
+
+SERVICE_NAME = "ai-audit-summarizer"
+DEFAULT_TRACE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-audit-summarizer", "traces")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_random = random.SystemRandom()
+
+
+class Span:
+    """One timed operation with attributes, events and an error status."""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "events", "error", "thread")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{_random.getrandbits(128):032x}"
+        self.span_id = f"{_random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes)
+        self.events: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def record_exception(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+        self.add_event("exception", type=type(error).__name__, message=str(error))
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "thread": self.thread,
+            "attributes": self.attributes,
+            "events": self.events,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+# -----------------------------
+# Exporters
+# -----------------------------
+
+def _append_line(path: str, line: str) -> None:
+    # One write() per line on an O_APPEND descriptor keeps lines from concurrent threads and processes whole
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (line + "\n").encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+class JsonLinesExporter:
+    """Appends each finished span to ``path`` as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            _append_line(self.path, line)
+
+    def flush(self) -> None:
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class OtlpJsonExporter:
+    """
+    Writes spans in the OTLP/JSON encoding (one ExportTraceServiceRequest per
+    line, as the OpenTelemetry Collector's file exporter does). Spans are
+    buffered and written when a trace's root span ends or the buffer fills, so
+    the file can be replayed into any OTLP-compatible backend.
+    """
+
+    BUFFER_SPANS = 512
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            if span.parent_id is not None and len(self._buffer) < self.BUFFER_SPANS:
+                return
+            spans, self._buffer = self._buffer, []
+        self._write(spans)
+
+    def flush(self) -> None:
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if spans:
+            self._write(spans)
+
+    def _write(self, spans: List[Span]) -> None:
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": f"{self.service_name}.tracing"},
+                    "spans": [self._span(span) for span in spans],
+                }],
+            }]
+        }
+        _append_line(self.path, json.dumps(request, separators=(",", ":")))
+
+    @staticmethod
+    def _span(span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes({**span.attributes, "thread.name": span.thread}),
+            "events": [{"timeUnixNano": str(event["time_ns"]), "name": event["name"],
+                        "attributes": _otlp_attributes(event["attributes"])} for event in span.events],
+            "status": {"code": 2, "message": span.error} if span.error else {},  # ERROR or UNSET
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+
+EXPORTERS = {
+    "jsonl": (JsonLinesExporter, "spans.jsonl"),
+    "otlp": (OtlpJsonExporter, "otlp_traces.jsonl"),
+}
+
+
+# -----------------------------
+# Tracer
+# -----------------------------
+
+class Tracer:
+    """Creates spans and hands finished ones to its exporters."""
+
+    def __init__(self, exporters: List[Any]):
+        self.exporters = exporters
+
+    def start_span(self, name: str, **attributes: Any) -> Span:
+        """A span under the current one that the caller ends; it does not become current."""
+        return Span(self, name, _current_span.get(), attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except OSError:
+                pass  # a full disk or unwritable trace file must not fail the analysis
+
+    def flush(self) -> None:
+        for exporter in self.exporters:
+            exporter.flush()
+
+
+def tracer_from_env() -> Optional[Tracer]:
+    """
+    Build a tracer from TRACE_EXPORTER (``jsonl``, ``otlp`` or both, comma
+    separated) writing under TRACE_DIR. Returns None, i.e. no-op tracing, when
+    unset or when the trace directory cannot be created.
+    """
+    names = [name.strip() for name in os.getenv("TRACE_EXPORTER", "").lower().split(",") if name.strip()]
+    names = [name for name in names if name in EXPORTERS]
+    if not names:
+        return None
+    directory = os.getenv("TRACE_DIR", DEFAULT_TRACE_DIR)
+    try:
+        return Tracer([EXPORTERS[name][0](os.path.join(directory, EXPORTERS[name][1])) for name in names])
+    except OSError:
+        return None
+
+
+_UNSET = object()
+_tracer: Any = _UNSET
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    global _tracer
+    if _tracer is _UNSET:
+        with _tracer_lock:
+            if _tracer is _UNSET:
+                _tracer = tracer_from_env()
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """Use ``tracer`` (None for no-op tracing) from now on."""
+    global _tracer
+    _tracer = tracer
+
+
+def span(name: str, **attributes: Any):
+    """Context manager for a span named ``name``, nested under the current one."""
+    tracer = get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.span(name, **attributes)
+
+
+def start_span(name: str, **attributes: Any):
+    """A span the caller ends itself (e.g. around a generator); it does not become current."""
+    tracer = get_tracer()
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.start_span(name, **attributes)
+
+
+def current_span():
+    """The innermost open span, or the no-op span."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator wrapping each call in a span (by default named after the function).
+
+    For generator functions the span lasts until the generator finishes or is
+    closed. It is not made current, since the generator's body runs in whatever
+    context resumes it; work inside it nests under the consumer's span.
+    """
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        span_name = name or func.__name__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                tracer = get_tracer()
+                if tracer is None:
+                    return (yield from func(*args, **kwargs))
+                span = tracer.start_span(span_name)
+                try:
+                    return (yield from func(*args, **kwargs))
+                except GeneratorExit:
+                    span.set_attribute("generator.closed_early", True)
+                    raise
+                except Exception as e:
+                    span.record_exception(e)
+                    raise
+                finally:
+                    span.end()
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = get_tracer()
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
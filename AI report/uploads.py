@@ -0,0 +1,152 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional
+
+# -----------------------------
+# Upload spooling
+# -----------------------------
+# Uploads are copied to disk in fixed-size blocks and hashed on the way, so the
+# app never makes a second in-memory copy of a large document. Spooled files
+# are named by their SHA-256: the same upload is stored once however many times
+# it is opened, and a file's name is a safe cache key for its extracted text.
+
+DEFAULT_UPLOAD_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-audit-summarizer", "uploads")
+DEFAULT_UPLOAD_TTL_SECONDS = 24 * 3600  # 1 day since last use
+UPLOAD_BLOCK_BYTES = 1 << 20
+
+# Extracted texts kept for reuse across sessions and jobs (see shared_extraction)
+SHARED_EXTRACTION_ENTRIES = 8
+
+PDF_TYPE = "application/pdf"
+
+
+@dataclass(frozen=True)
+class SpooledUpload:
+    """An uploaded document kept on disk; ``path`` ends in .pdf or .txt to match ``type``."""
+    name: str
+    type: str
+    path: str
+    size: int
+    sha256: str
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def iter_blocks(self, block_size: int = UPLOAD_BLOCK_BYTES) -> Iterator[bytes]:
+        with self.open() as f:
+            yield from iter(lambda: f.read(block_size), b"")
+
+
+def upload_dir() -> str:
+    return os.getenv("UPLOAD_DIR", DEFAULT_UPLOAD_DIR)
+
+
+def iter_upload_blocks(upload: BinaryIO, block_size: int = UPLOAD_BLOCK_BYTES) -> Iterator[bytes]:
+    """
+    Blocks of a file-like upload. In-memory uploads (``io.BytesIO``, like
+    Streamlit's UploadedFile) are sliced through a memoryview instead of read,
+    so no copy of the whole buffer is made.
+    """
+    if hasattr(upload, "getbuffer"):
+        with upload.getbuffer() as view:
+            for start in range(0, len(view), block_size):
+                yield view[start:start + block_size]
+        return
+    upload.seek(0)
+    yield from iter(lambda: upload.read(block_size), b"")
+
+
+def spool_blocks(blocks: Iterable[bytes], name: str, file_type: str,
+                 directory: Optional[str] = None) -> SpooledUpload:
+    """Write ``blocks`` to the upload directory, hashing them as they go."""
+    directory = directory or upload_dir()
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".", suffix=".part", delete=False) as tmp_file:
+        try:
+            for block in blocks:
+                digest.update(block)
+                tmp_file.write(block)
+                size += len(block)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+    suffix = ".pdf" if file_type == PDF_TYPE else ".txt"
+    path = os.path.join(directory, digest.hexdigest() + suffix)
+    os.replace(tmp_file.name, path)
+    return SpooledUpload(name, file_type, path, size, digest.hexdigest())
+
+
+def spool_upload(upload: BinaryIO, name: str, file_type: str, directory: Optional[str] = None) -> SpooledUpload:
+    """Spool a file-like upload to disk; see ``iter_upload_blocks``."""
+    return spool_blocks(iter_upload_blocks(upload), name, file_type, directory)
+
+
+def touch(upload: SpooledUpload) -> bool:
+    """Mark a spooled upload as in use; False if it has been removed."""
+    try:
+        os.utime(upload.path)
+    except OSError:
+        return False
+    return True
+
+
+def remove_stale_uploads(directory: Optional[str] = None, ttl_seconds: float = DEFAULT_UPLOAD_TTL_SECONDS,
+                         keep: Iterable[str] = ()) -> int:
+    """
+    Delete spooled uploads not used for ``ttl_seconds``, except the paths in
+    ``keep`` (e.g. uploads of stored jobs); returns how many were removed.
+    """
+    directory = directory or upload_dir()
+    cutoff = time.time() - ttl_seconds
+    keep = {os.path.abspath(path) for path in keep}
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff and os.path.abspath(entry.path) not in keep:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+# -----------------------------
+# Shared extraction
+# -----------------------------
+# Job workers extract text outside Streamlit's script thread, where st.cache_data
+# must not be used; identical uploads share their extracted text through this
+# process-wide cache instead.
+
+_extractions: "OrderedDict[tuple, Any]" = OrderedDict()
+_extractions_lock = threading.Lock()
+
+
+def shared_extraction(key: tuple, extract: Callable[[], Any]) -> Any:
+    """
+    Result of ``extract()`` for ``key``, reused while it is among the
+    SHARED_EXTRACTION_ENTRIES most recently used. Keys start with the spooled
+    upload's path, which names its contents; failures are not kept.
+    """
+    with _extractions_lock:
+        if key in _extractions:
+            _extractions.move_to_end(key)
+            return _extractions[key]
+    value = extract()
+    with _extractions_lock:
+        _extractions[key] = value
+        _extractions.move_to_end(key)
+        while len(_extractions) > SHARED_EXTRACTION_ENTRIES:
+            _extractions.popitem(last=False)
+    return value